@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+
+def _codes(values: pd.Series, dictionary: pd.Index) -> np.ndarray:
+    """Positions of values in dictionary, -1 for missing values, and -2 for values
+    that are not in dictionary. Categorical values are looked up once per category."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        category_codes = dictionary.get_indexer(values.cat.categories)
+        category_codes[category_codes == -1] = -2
+        value_codes = values.cat.codes.to_numpy()
+        return np.where(value_codes >= 0, category_codes[value_codes], -1)
+    codes = dictionary.get_indexer(values)
+    codes[(codes == -1) & values.notna().to_numpy()] = -2
+    return codes
+
+
+def add_finalreceiver_col(swift_data: pd.DataFrame):
+    """Adds column identifying FinalReciver to SWIFT dataset inplace. Required for
+    joining to the bank data. The FinalReceiver of a transaction is the last
+    non-missing Receiver, by Timestamp, of the transactions with the same UETR. The
+    column is categorical.
+
+    See https://www.drivendata.org/competitions/105/nist-federated-learning-2-financial-crime-federated/page/589/#end-to-end-transactions
+    """
+    num_rows = len(swift_data)
+    uetr_codes, _ = pd.factorize(swift_data["UETR"])
+    receiver_codes, receivers = pd.factorize(swift_data["Receiver"])
+    # Order of timestamps, with missing timestamps last like in sort_values
+    timestamp_codes, timestamps = pd.factorize(swift_data["Timestamp"], sort=True)
+    timestamp_codes[timestamp_codes == -1] = len(timestamps)
+    # Single pass over the transactions for the latest one of each UETR, with ties
+    # broken by row order
+    is_candidate = (uetr_codes >= 0) & (receiver_codes >= 0)
+    order_keys = timestamp_codes.astype(np.int64) * num_rows + np.arange(num_rows)
+    last_rows = (
+        pd.Series(order_keys[is_candidate])
+        .groupby(uetr_codes[is_candidate])
+        .max()
+        % num_rows
+    )
+    final_receiver_codes = np.full(len(uetr_codes) + 1, -1)
+    final_receiver_codes[last_rows.index] = receiver_codes[last_rows.to_numpy()]
+    # UETR code -1 picks up the last entry, which stays missing
+    swift_data["FinalReceiver"] = pd.Categorical.from_codes(
+        final_receiver_codes[uetr_codes], categories=receivers
+    )
+    return swift_data
+
+
+class BankAccountIndex:
+    """Hash index of bank account flags by (Bank, Account) for joining them onto SWIFT
+    transactions. Build it once per bank dataset and reuse it for every join.
+
+    Bank and account names are stored once each in dictionaries, and each account is
+    indexed by an integer key combining the positions of its bank and account names.
+    """
+
+    def __init__(self, bank_df: pd.DataFrame):
+        bank_codes, self.banks = pd.factorize(bank_df["Bank"])
+        account_codes, self.accounts = pd.factorize(bank_df["Account"])
+        self.keys = pd.Index(self._keys(bank_codes, account_codes))
+        self.flags = bank_df["Flags"].array
+        # Accounts that are listed more than once match more than one transaction
+        # row. Use a regular merge for these, which duplicates transactions.
+        self.bank_df = None if self.keys.is_unique else bank_df
+
+    def _keys(self, bank_codes: np.ndarray, account_codes: np.ndarray) -> np.ndarray:
+        # Shift codes by one so that missing values (-1) also get keys, since merges
+        # match missing values with each other
+        return (bank_codes.astype(np.int64) + 1) * (len(self.accounts) + 1) + (
+            account_codes + 1
+        )
+
+    def join_flags(self, swift_df: pd.DataFrame) -> pd.DataFrame:
+        """Join BeneficiaryFlags column onto SWIFT dataset, by FinalReceiver and
+        BeneficiaryAccount. Flags are missing for transactions without a matching
+        account."""
+        if self.bank_df is not None:
+            return _merge_flags(swift_df, self.bank_df)
+        bank_codes = _codes(swift_df["FinalReceiver"], self.banks)
+        account_codes = _codes(swift_df["BeneficiaryAccount"], self.accounts)
+        positions = self.keys.get_indexer(self._keys(bank_codes, account_codes))
+        positions[(bank_codes == -2) | (account_codes == -2)] = -1
+        return swift_df.assign(
+            BeneficiaryFlags=self.flags.take(positions, allow_fill=True)
+        )
+
+
+def _merge_flags(swift_df: pd.DataFrame, bank_df: pd.DataFrame):
+    return (
+        swift_df.reset_index()
+        .merge(
+            right=bank_df[["Bank", "Account", "Flags"]].rename(
+                columns={"Flags": "BeneficiaryFlags"}
+            ),
+            how="left",
+            left_on=["FinalReceiver", "BeneficiaryAccount"],
+            right_on=["Bank", "Account"],
+        )
+        .set_index("MessageId")
+    )
+
+
+def join_flags_to_swift_data(swift_df: pd.DataFrame, bank_df: pd.DataFrame):
+    """Join BeneficiaryFlags columns onto SWIFT dataset. To join several SWIFT datasets
+    with the same bank dataset, build a BankAccountIndex once instead."""
+    return BankAccountIndex(bank_df).join_flags(swift_df)
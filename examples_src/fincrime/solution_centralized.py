@@ -3,12 +3,8 @@ from pathlib import Path
 from loguru import logger
 import pandas as pd
 
-from .model import (
-    SwiftModel,
-    BankModel,
-    add_finalreceiver_col,
-    join_flags_to_swift_data,
-)
+from .features import BankAccountIndex, add_finalreceiver_col
+from .model import SwiftModel, BankModel
 
 
 def fit(swift_data_path: Path, bank_data_path: Path, model_dir: Path):
@@ -17,10 +13,7 @@ def fit(swift_data_path: Path, bank_data_path: Path, model_dir: Path):
 
     logger.info("Preparing train data...")
     swift_df = add_finalreceiver_col(swift_df)
-    swift_df = join_flags_to_swift_data(
-        swift_df=swift_df,
-        bank_df=bank_df,
-    )
+    swift_df = BankAccountIndex(bank_df).join_flags(swift_df)
 
     # Train SWIFT model
     logger.info("Fitting SWIFT model...")
@@ -50,10 +43,7 @@ def predict(
 
     logger.info("Preparing test data...")
     swift_df = add_finalreceiver_col(swift_df)
-    swift_df = join_flags_to_swift_data(
-        swift_df=swift_df,
-        bank_df=bank_df,
-    )
+    swift_df = BankAccountIndex(bank_df).join_flags(swift_df)
 
     logger.info("Loading models...")
     swift_model = SwiftModel.load(model_dir / "swift_model.joblib")
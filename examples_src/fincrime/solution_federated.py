@@ -8,18 +8,71 @@ from flwr.server.client_proxy import ClientProxy
 from loguru import logger
 import numpy as np
 import pandas as pd
-
-from .model import (
-    SwiftModel,
-    BankModel,
-    add_finalreceiver_col,
-    join_flags_to_swift_data,
+from aggregation import ConcatAggregator
+from parameters_codec import (
+    NumPyClientAdapter,
+    ndarrays_to_parameters,
+    parameters_to_ndarrays,
 )
 
+from .features import BankAccountIndex, add_finalreceiver_col
+from .model import SwiftModel, BankModel
+
+
+# SWIFT data and bank predictions sent between clients are compressed with the
+# runtime's lossless codecs
+COMPRESSION = "auto"
+
 
 def empty_parameters() -> Parameters:
     """Utility function that generates empty Flower Parameters dataclass instance."""
-    return fl.common.ndarrays_to_parameters([])
+    return ndarrays_to_parameters([])
+
+
+def strings_to_ndarrays(values: np.ndarray) -> List[np.ndarray]:
+    """Utility function that encodes an array of strings like Arrow's string arrays: as
+    int64 offsets and the concatenated UTF-8 bytes of the strings. Unlike
+    .astype("U"), this doesn't pad every string to the longest one in fixed-width
+    UTF-32, and unlike 'object' arrays, it doesn't need pickle to serialize."""
+    if len(values) == 0:
+        return [np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.uint8)]
+    encoded = np.char.encode(np.asarray(values, dtype=str), "utf-8")
+    lengths = np.char.str_len(encoded)
+    width = encoded.dtype.itemsize
+    chars = encoded.view(np.uint8).reshape(len(encoded), width)
+    data = chars[np.arange(width) < lengths[:, None]]
+    offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    return [offsets, data]
+
+
+def ndarrays_to_strings(offsets: np.ndarray, data: np.ndarray) -> np.ndarray:
+    """Utility function that decodes strings encoded by strings_to_ndarrays."""
+    lengths = np.diff(offsets)
+    width = max(lengths.max(initial=0), 1)
+    chars = np.zeros((len(lengths), width), dtype=np.uint8)
+    chars[np.arange(width) < lengths[:, None]] = data
+    return np.char.decode(chars.view(f"S{width}").ravel(), "utf-8")
+
+
+def dictionary_encode(values: pd.Series) -> List[np.ndarray]:
+    """Utility function that dictionary-encodes a column of strings as int32 codes,
+    with -1 for missing values, and its dictionary of unique strings encoded by
+    strings_to_ndarrays."""
+    codes, uniques = pd.factorize(values)
+    return [codes.astype(np.int32), *strings_to_ndarrays(uniques)]
+
+
+def dictionary_decode(
+    codes: np.ndarray, offsets: np.ndarray, data: np.ndarray
+) -> pd.Categorical:
+    """Utility function that decodes a column encoded by dictionary_encode into a
+    pandas categorical."""
+    return pd.Categorical.from_codes(
+        codes, categories=ndarrays_to_strings(offsets, data)
+    )
+
+
+SWIFT_ACCOUNT_COLS = ["FinalReceiver", "BeneficiaryAccount"]
 
 
 def swift_df_to_ndarrays(
@@ -27,40 +80,151 @@ def swift_df_to_ndarrays(
 ) -> List[np.ndarray]:
     """Utility function that converts a pandas DataFrame of SWIFT data to a list of
     numpy arrays, which the expected format for communication between a Flower
-    NumPyClient and a Flower Strategy."""
-    cols = [
-        "FinalReceiver",
-        "BeneficiaryAccount",
-    ]
+    NumPyClient and a Flower Strategy.
+
+    The MessageId index is encoded with strings_to_ndarrays. The join key columns
+    repeat few distinct values, so they are dictionary-encoded. Labels are sent as
+    int8."""
+    # Index
+    ndarrays = strings_to_ndarrays(swift_df.index.values)
+    # Transactions: Join keys and label
+    for col in SWIFT_ACCOUNT_COLS:
+        ndarrays += dictionary_encode(swift_df[col])
     if labels:
-        cols.append("Label")
-    # Need .astype("U") because pandas uses 'object' for string columns by default
-    # 'object' arrays are not serializable without pickle.
-    return [
-        # Index
-        swift_df.index.values.astype("U"),
-        # Transactions: Join keys and label
-        swift_df[cols].values.astype("U"),
-    ]
+        ndarrays.append(swift_df["Label"].to_numpy(dtype=np.int8))
+    return ndarrays
 
 
 def ndarrays_to_swift_df(
-    swift_index: np.ndarray, swift_transactions: np.ndarray, labels: bool = True
+    ndarrays: List[np.ndarray], labels: bool = True
 ) -> pd.DataFrame:
     """Utility function that converts a list of numpy arrays, which the expected format
     for communication between a Flower NumPyClient and a Flower Strategy, back to a
-    pandas DataFrame"""
-    cols = [
-        "FinalReceiver",
-        "BeneficiaryAccount",
-    ]
+    pandas DataFrame. Join key columns are decoded as categoricals."""
+    index_offsets, index_data, *col_ndarrays = ndarrays
+    data = {
+        col: dictionary_decode(*col_ndarrays[3 * i : 3 * i + 3])
+        for i, col in enumerate(SWIFT_ACCOUNT_COLS)
+    }
     if labels:
-        cols.append("Label")
-    return pd.DataFrame(
-        data=swift_transactions,
-        index=pd.Series(swift_index, name="MessageId"),
-        columns=cols,
+        data["Label"] = col_ndarrays[3 * len(SWIFT_ACCOUNT_COLS)]
+    index = ndarrays_to_strings(index_offsets, index_data)
+    return pd.DataFrame(data=data, index=pd.Index(index, name="MessageId"))
+
+
+def _take_strings(
+    offsets: np.ndarray, data: np.ndarray, rows: np.ndarray
+) -> List[np.ndarray]:
+    """Select rows of strings encoded by strings_to_ndarrays."""
+    lengths = np.diff(offsets)[rows]
+    taken_offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    # Position in data of each byte of the selected strings
+    positions = np.repeat(
+        offsets[:-1][rows] - offsets[0] - taken_offsets[:-1], lengths
+    ) + np.arange(taken_offsets[-1])
+    return [taken_offsets, data[positions]]
+
+
+def take_swift_rows(swift_ndarrays: List[np.ndarray], rows: np.ndarray):
+    """Utility function that selects rows of SWIFT data encoded by
+    swift_df_to_ndarrays. Dictionaries are shared with the original data."""
+    index_offsets, index_data, *col_ndarrays = swift_ndarrays
+    taken = _take_strings(index_offsets, index_data, rows)
+    for i in range(len(SWIFT_ACCOUNT_COLS)):
+        codes, dictionary_offsets, dictionary_data = col_ndarrays[3 * i : 3 * i + 3]
+        taken += [codes[rows], dictionary_offsets, dictionary_data]
+    # Labels
+    taken += [values[rows] for values in col_ndarrays[3 * len(SWIFT_ACCOUNT_COLS) :]]
+    return taken
+
+
+def slice_swift_rows(swift_ndarrays: List[np.ndarray], start: int, stop: int):
+    """Utility function that slices rows start to stop of SWIFT data encoded by
+    swift_df_to_ndarrays. All arrays are views of the original arrays."""
+    index_offsets, index_data, *col_ndarrays = swift_ndarrays
+    # String offsets don't need to start at 0, since strings are decoded from their
+    # differences
+    base = index_offsets[0]
+    sliced = [
+        index_offsets[start : stop + 1],
+        index_data[index_offsets[start] - base : index_offsets[stop] - base],
+    ]
+    for i in range(len(SWIFT_ACCOUNT_COLS)):
+        codes, dictionary_offsets, dictionary_data = col_ndarrays[3 * i : 3 * i + 3]
+        sliced += [codes[start:stop], dictionary_offsets, dictionary_data]
+    # Labels
+    sliced += [
+        values[start:stop] for values in col_ndarrays[3 * len(SWIFT_ACCOUNT_COLS) :]
+    ]
+    return sliced
+
+
+def compact_swift_dictionaries(swift_ndarrays: List[np.ndarray]) -> List[np.ndarray]:
+    """Utility function that drops the dictionary entries of SWIFT data encoded by
+    swift_df_to_ndarrays that none of its rows use, and remaps the codes, e.g., so
+    that a client's data only includes its own banks and accounts."""
+    index_offsets, index_data, *col_ndarrays = swift_ndarrays
+    compacted = [index_offsets, index_data]
+    for i in range(len(SWIFT_ACCOUNT_COLS)):
+        codes, dictionary_offsets, dictionary_data = col_ndarrays[3 * i : 3 * i + 3]
+        is_present = codes >= 0
+        used, used_codes = np.unique(codes[is_present], return_inverse=True)
+        compact_codes = np.full(len(codes), -1, dtype=codes.dtype)
+        compact_codes[is_present] = used_codes
+        compacted += [
+            compact_codes,
+            *_take_strings(dictionary_offsets, dictionary_data, used),
+        ]
+    # Labels
+    compacted += col_ndarrays[3 * len(SWIFT_ACCOUNT_COLS) :]
+    return compacted
+
+
+def partition_swift_ndarrays(
+    swift_ndarrays: List[np.ndarray], banks_dict: Dict[str, np.ndarray]
+) -> Dict[str, List[np.ndarray]]:
+    """Utility function that splits SWIFT data encoded by swift_df_to_ndarrays into the
+    transactions for each bank client, i.e., those with a FinalReceiver among the
+    client's banks. Rows are grouped by client once, so that each client's data are
+    views of a contiguous slice of the grouped arrays. This takes time linear in the
+    number of transactions, regardless of the number of clients. Each client's
+    dictionaries are compacted to the banks and accounts of its own transactions."""
+    _, _, receiver_codes, receiver_offsets, receiver_data, *_ = swift_ndarrays
+    receivers = ndarrays_to_strings(receiver_offsets, receiver_data)
+    cids = list(banks_dict)
+    # Index of the client of each receiver, with an extra last entry that missing
+    # receivers (code -1) pick up. Receivers of no client get len(cids).
+    receiver_clients = np.full(len(receivers) + 1, len(cids))
+    for i, cid in enumerate(cids):
+        is_client_receiver = np.isin(receivers, banks_dict[cid])
+        if (receiver_clients[:-1][is_client_receiver] != len(cids)).any():
+            # A bank is in more than one client's partition, so clients' rows
+            # overlap. Select each client's rows separately instead.
+            return {
+                cid: compact_swift_dictionaries(
+                    take_swift_rows(
+                        swift_ndarrays,
+                        np.flatnonzero(
+                            np.append(np.isin(receivers, banks), False)[receiver_codes]
+                        ),
+                    )
+                )
+                for cid, banks in banks_dict.items()
+            }
+        receiver_clients[:-1][is_client_receiver] = i
+
+    row_clients = receiver_clients[receiver_codes]
+    # Stable sort keeps the original order of each client's rows
+    grouped = take_swift_rows(swift_ndarrays, np.argsort(row_clients, kind="stable"))
+    bounds = np.concatenate(
+        [[0], np.cumsum(np.bincount(row_clients, minlength=len(cids) + 1))]
     )
+    return {
+        cid: compact_swift_dictionaries(
+            slice_swift_rows(grouped, bounds[i], bounds[i + 1])
+        )
+        for i, cid in enumerate(cids)
+    }
 
 
 # TRAIN PROCEDURE:
@@ -82,6 +246,16 @@ def train_setup(server_dir: Path, client_dirs_dict: Dict[str, Path]):
     logger.info("Hello from train_setup")
 
 
+def client_resources(cid: str) -> Dict[str, float]:
+    """
+    Optional: Declare the resources that a client needs, as a dictionary with keys
+    "num_cpus", "num_gpus", and "memory" (bytes). Only used when clients are scheduled
+    concurrently with SUPERVISOR_CLIENT_SCHEDULING=packed. If you don't need this, then
+    don't define this function.
+    """
+    return {"num_cpus": 1}
+
+
 class TrainingSwiftClient(fl.client.NumPyClient):
     def __init__(
         self, cid: str, swift_df: pd.DataFrame, model: SwiftModel, client_dir: Path
@@ -117,6 +291,8 @@ class TrainingBankClient(fl.client.NumPyClient):
         self.bank_df = bank_df
         self.model = model
         self.client_dir = client_dir
+        # Built on first use, since only round 2 joins bank flags
+        self.bank_index: Optional[BankAccountIndex] = None
 
     def fit(
         self, parameters: List[np.ndarray], config: dict
@@ -128,11 +304,12 @@ class TrainingBankClient(fl.client.NumPyClient):
         elif config["round"] == 2:
             logger.info(f"{self.cid} : Received SWIFT labels...")
             # parameters contains label data from SWIFT, reform into dataframe
-            swift_index, swift_transactions = parameters
-            swift_df = ndarrays_to_swift_df(swift_index, swift_transactions)
+            swift_df = ndarrays_to_swift_df(parameters)
             # Join ordering account flags
             logger.info(f"{self.cid} : Joining bank flags to SWIFT labels...")
-            swift_df = join_flags_to_swift_data(swift_df, self.bank_df)
+            if self.bank_index is None:
+                self.bank_index = BankAccountIndex(self.bank_df)
+            swift_df = self.bank_index.join_flags(swift_df)
             if swift_df.shape[0] == 0:
                 # It may be the case that there are no rows, because this bank
                 # doesn't contain any beneficiary accounts
@@ -159,15 +336,21 @@ def train_client_factory(cid, data_path: Path, client_dir: Path):
         logger.info("Initializing SWIFT client for {}", cid)
         swift_df = pd.read_csv(data_path, index_col="MessageId")
         model = SwiftModel()
-        return TrainingSwiftClient(
-            cid, swift_df=swift_df, model=model, client_dir=client_dir
+        return NumPyClientAdapter(
+            TrainingSwiftClient(
+                cid, swift_df=swift_df, model=model, client_dir=client_dir
+            ),
+            compression=COMPRESSION,
         )
     else:
         logger.info("Initializing bank client for {}", cid)
         bank_df = pd.read_csv(data_path, dtype=pd.StringDtype())
         model = BankModel()
-        return TrainingBankClient(
-            cid, bank_df=bank_df, model=model, client_dir=client_dir
+        return NumPyClientAdapter(
+            TrainingBankClient(
+                cid, bank_df=bank_df, model=model, client_dir=client_dir
+            ),
+            compression=COMPRESSION,
         )
 
 
@@ -176,6 +359,9 @@ class TrainStrategy(fl.server.strategy.Strategy):
         self.server_dir = server_dir
         self.swift_labels_for_banks = None
         self.banks_dict = {}
+        self.swift_labels_by_client = {}
+        # Last round whose results were passed to accumulate_fit
+        self.accumulated_round = 0
         super().__init__()
 
     def initialize_parameters(self, client_manager: ClientManager) -> Parameters:
@@ -200,43 +386,49 @@ class TrainStrategy(fl.server.strategy.Strategy):
             return fit_config
         elif server_round == 2:
             # Configure bank clients to fit on labels sent from SWIFT
-            # Turn stashed swift labels into dataframe
-            swift_index, swift_transactions = self.swift_labels_for_banks
-            swift_df = ndarrays_to_swift_df(
-                swift_index=swift_index, swift_transactions=swift_transactions
-            )
             # Banks get sent labels to fit models
             bank_cids = [cid for cid in client_dict.keys() if cid != "swift"]
             fit_config = []
             for cid in bank_cids:
-                # Subset swift labels to banks present for this client
-                this_bank_swift_df = swift_df[
-                    swift_df["FinalReceiver"].isin(self.banks_dict[cid])
-                ]
-                # Convert dataframe to parameters
+                # Swift labels for banks present for this client, partitioned in
+                # round 1
                 this_bank_fit_ins = FitIns(
-                    parameters=fl.common.ndarrays_to_parameters(
-                        swift_df_to_ndarrays(this_bank_swift_df)
+                    parameters=ndarrays_to_parameters(
+                        self.swift_labels_by_client[cid], compression=COMPRESSION
                     ),
                     config=config_dict,
                 )
                 fit_config.append((client_dict[cid], this_bank_fit_ins))
             return fit_config
 
+    def accumulate_fit(
+        self, server_round: int, client: ClientProxy, result: FitRes
+    ) -> None:
+        """Stash each client's results as they arrive."""
+        self.accumulated_round = server_round
+        if server_round == 1:
+            result_ndarrays = parameters_to_ndarrays(result.parameters)
+            if client.cid == "swift":
+                # This is SWIFT client's results. Stash for later
+                self.swift_labels_for_banks = result_ndarrays
+            else:
+                # This is a bank client. Stash which banks are present
+                self.banks_dict[client.cid] = result_ndarrays[0]
+
     def aggregate_fit(
         self, server_round: int, results: List[Tuple[ClientProxy, FitRes]], failures
     ) -> Tuple[Optional[Parameters], dict]:
         if (n_failures := len(failures)) > 0:
             raise Exception(f"Had {n_failures} failures in round {server_round}")
-        if server_round == 1:
+        if self.accumulated_round != server_round:
+            # Servers other than the runtime's don't call accumulate_fit
             for client, result in results:
-                result_ndarrays = fl.common.parameters_to_ndarrays(result.parameters)
-                if client.cid == "swift":
-                    # This is SWIFT client's results. Stash for later
-                    self.swift_labels_for_banks = result_ndarrays
-                else:
-                    # This is a bank client. Stash which banks are present
-                    self.banks_dict[client.cid] = result_ndarrays[0]
+                self.accumulate_fit(server_round, client, result)
+        if server_round == 1:
+            # Partition swift labels by bank client once
+            self.swift_labels_by_client = partition_swift_ndarrays(
+                self.swift_labels_for_banks, self.banks_dict
+            )
         return None, {}
 
     def configure_evaluate(self, server_round, parameters, client_manager):
@@ -289,17 +481,23 @@ def test_client_factory(
     if cid == "swift":
         logger.info("Initializing SWIFT client for {}", cid)
         swift_df = pd.read_csv(data_path, index_col="MessageId")
-        return TestSwiftClient(
-            cid,
-            swift_df=swift_df,
-            client_dir=client_dir,
-            preds_format_path=preds_format_path,
-            preds_dest_path=preds_dest_path,
+        return NumPyClientAdapter(
+            TestSwiftClient(
+                cid,
+                swift_df=swift_df,
+                client_dir=client_dir,
+                preds_format_path=preds_format_path,
+                preds_dest_path=preds_dest_path,
+            ),
+            compression=COMPRESSION,
         )
     else:
         logger.info("Initializing bank client for {}", cid)
         bank_df = pd.read_csv(data_path, dtype=pd.StringDtype())
-        return TestBankClient(cid, bank_df=bank_df, client_dir=client_dir)
+        return NumPyClientAdapter(
+            TestBankClient(cid, bank_df=bank_df, client_dir=client_dir),
+            compression=COMPRESSION,
+        )
 
 
 class TestSwiftClient(fl.client.NumPyClient):
@@ -354,6 +552,8 @@ class TestBankClient(fl.client.NumPyClient):
         self.cid = cid
         self.bank_df = bank_df
         self.client_dir = client_dir
+        # Built on first use, since only round 2 joins bank flags
+        self.bank_index: Optional[BankAccountIndex] = None
 
     def fit(
         self, parameters: List[np.ndarray], config: dict
@@ -365,13 +565,12 @@ class TestBankClient(fl.client.NumPyClient):
         elif config["round"] == 2:
             logger.info(f"{self.cid} : Received SWIFT transactions...")
             # parameters contains account data from SWIFT, reform into dataframe
-            swift_index, swift_transactions = parameters
-            swift_df = ndarrays_to_swift_df(
-                swift_index, swift_transactions, labels=False
-            )
+            swift_df = ndarrays_to_swift_df(parameters, labels=False)
             # Join ordering account flags
             logger.info(f"{self.cid} : Joining bank flags to SWIFT transactions...")
-            swift_df = join_flags_to_swift_data(swift_df, self.bank_df)
+            if self.bank_index is None:
+                self.bank_index = BankAccountIndex(self.bank_df)
+            swift_df = self.bank_index.join_flags(swift_df)
             if swift_df.shape[0] == 0:
                 # It may be the case that there are no rows, because this bank
                 # doesn't contain any beneficiary accounts
@@ -407,6 +606,10 @@ class TestStrategy(fl.server.strategy.Strategy):
         self.server_dir = server_dir
         self.swift_transactions_for_banks = None
         self.banks_dict = {}
+        self.swift_transactions_by_client = {}
+        # Last round whose results were passed to accumulate_fit
+        self.accumulated_round = 0
+        self.bank_predictions = ConcatAggregator()
         super().__init__()
 
     def initialize_parameters(self, client_manager: ClientManager) -> Parameters:
@@ -424,25 +627,15 @@ class TestStrategy(fl.server.strategy.Strategy):
             return [(client, fit_ins) for client in client_dict.values()]
         elif server_round == 2:
             ## Send swift transactions with account info to bank clients
-            # Turn stashed swift labels into dataframe
-            swift_index, swift_transactions = self.swift_transactions_for_banks
-            swift_df = ndarrays_to_swift_df(
-                swift_index=swift_index,
-                swift_transactions=swift_transactions,
-                labels=False,
-            )
             # Banks get sent transaction account info to predict on
             bank_cids = [cid for cid in client_dict.keys() if cid != "swift"]
             fit_config = []
             for cid in bank_cids:
-                # Subset swift labels to banks present for this client
-                this_bank_swift_df = swift_df[
-                    swift_df["FinalReceiver"].isin(self.banks_dict[cid])
-                ]
-                # Convert dataframe to parameters
+                # Swift transactions for banks present for this client, partitioned
+                # in round 1
                 this_bank_fit_ins = FitIns(
-                    parameters=fl.common.ndarrays_to_parameters(
-                        swift_df_to_ndarrays(this_bank_swift_df, labels=False)
+                    parameters=ndarrays_to_parameters(
+                        self.swift_transactions_by_client[cid], compression=COMPRESSION
                     ),
                     config=config_dict,
                 )
@@ -451,40 +644,49 @@ class TestStrategy(fl.server.strategy.Strategy):
         elif server_round == 3:
             ## Send bank predictions back to SWIFT
             fit_ins = FitIns(
-                parameters=fl.common.ndarrays_to_parameters(
-                    [self.bank_indices, self.bank_preds]
+                parameters=ndarrays_to_parameters(
+                    [self.bank_indices, self.bank_preds], compression=COMPRESSION
                 ),
                 config=config_dict,
             )
             return [(client_dict["swift"], fit_ins)]
 
+    def accumulate_fit(
+        self, server_round: int, client: ClientProxy, result: FitRes
+    ) -> None:
+        """Stash each client's results as they arrive."""
+        self.accumulated_round = server_round
+        if server_round == 1:
+            result_ndarrays = parameters_to_ndarrays(result.parameters)
+            if client.cid == "swift":
+                # This is SWIFT client's results. Stash for later
+                self.swift_transactions_for_banks = result_ndarrays
+            else:
+                # This is a bank client. Stash which banks are present
+                self.banks_dict[client.cid] = result_ndarrays[0]
+        elif server_round == 2:
+            # Banks sent back predictions
+            # result.parameters is (index, preds)
+            self.bank_predictions.add_fit_res(result)
+
     def aggregate_fit(
         self, server_round: int, results: List[Tuple[ClientProxy, FitRes]], failures
     ) -> Tuple[Optional[Parameters], dict]:
         """Do not fit during test."""
         if (n_failures := len(failures)) > 0:
             raise Exception(f"Had {n_failures} failures in round {server_round}")
-        if server_round == 1:
+        if self.accumulated_round != server_round:
+            # Servers other than the runtime's don't call accumulate_fit
             for client, result in results:
-                result_ndarrays = fl.common.parameters_to_ndarrays(result.parameters)
-                if client.cid == "swift":
-                    # This is SWIFT client's results. Stash for later
-                    self.swift_transactions_for_banks = result_ndarrays
-                else:
-                    # This is a bank client. Stash which banks are present
-                    self.banks_dict[client.cid] = result_ndarrays[0]
-        elif server_round == 2:
-            # Banks sent back predictions
-            # result.parameters is (index, preds)
-            client_bank_indices, client_bank_preds = zip(
-                *(
-                    fl.common.parameters_to_ndarrays(result.parameters)
-                    for _, result in results
-                )
+                self.accumulate_fit(server_round, client, result)
+        if server_round == 1:
+            # Partition swift transactions by bank client once
+            self.swift_transactions_by_client = partition_swift_ndarrays(
+                self.swift_transactions_for_banks, self.banks_dict
             )
-            # Stash to send back to SWIFT client
-            self.bank_indices = np.concatenate(client_bank_indices)
-            self.bank_preds = np.concatenate(client_bank_preds)
+        elif server_round == 2:
+            # Stash concatenated predictions to send back to SWIFT client
+            self.bank_indices, self.bank_preds = self.bank_predictions.result()
         return None, {}
 
     def configure_evaluate(self, server_round, parameters, client_manager):
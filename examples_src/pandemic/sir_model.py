@@ -1,10 +1,121 @@
 import json
 from pathlib import Path
+from typing import Iterable, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
 
+class DiseaseOutcomeCounts:
+    """Per-day disease state counts and the day of the first infection of each
+    individual, accumulated over chunks of a disease outcome time series. Memory use
+    depends on the number of days and the population size, and not on the number of
+    rows. Days and pids must be non-negative integers.
+
+    Attributes:
+        s_counts (np.ndarray): Number of S individuals, indexed by day.
+        i_counts (np.ndarray): Number of I individuals, indexed by day.
+        n_counts (np.ndarray): Number of individuals, indexed by day.
+        first_infection_days (np.ndarray): Day of the first I state, indexed by pid.
+            NO_INFECTION for individuals that were never infected.
+        num_rows (int): Number of rows added to the counts.
+    """
+
+    NO_INFECTION = np.iinfo(np.int32).max
+
+    def __init__(self):
+        self.s_counts = np.zeros(0, dtype=np.int64)
+        self.i_counts = np.zeros(0, dtype=np.int64)
+        self.n_counts = np.zeros(0, dtype=np.int64)
+        self.first_infection_days = np.zeros(0, dtype=np.int32)
+        self.num_rows = 0
+
+    @property
+    def days(self) -> np.ndarray:
+        """Sorted days with disease outcome data."""
+        return np.flatnonzero(self.n_counts)
+
+    @property
+    def last_day(self) -> Optional[int]:
+        """Last day with disease outcome data, or None if there is none."""
+        days = self.days
+        return int(days[-1]) if len(days) > 0 else None
+
+    @property
+    def infection_days(self) -> np.ndarray:
+        """Day of the first infection of each individual that was ever infected."""
+        return self.first_infection_days[
+            self.first_infection_days != self.NO_INFECTION
+        ]
+
+    def update(self, disease_outcome_df: pd.DataFrame):
+        """Add a chunk of the disease outcome time series to the counts."""
+        if len(disease_outcome_df) == 0:
+            return
+        self.num_rows += len(disease_outcome_df)
+        days = disease_outcome_df["day"].to_numpy(dtype=np.int64)
+        states = disease_outcome_df["state"].to_numpy()
+        is_infected = states == "I"
+        num_days = max(len(self.n_counts), days.max() + 1)
+        for attr, chunk_days in (
+            ("s_counts", days[states == "S"]),
+            ("i_counts", days[is_infected]),
+            ("n_counts", days),
+        ):
+            counts = np.bincount(chunk_days, minlength=num_days)
+            previous_counts = getattr(self, attr)
+            counts[: len(previous_counts)] += previous_counts
+            setattr(self, attr, counts)
+
+        chunk_infection_days = (
+            disease_outcome_df.loc[is_infected].groupby("pid")["day"].min()
+        )
+        if len(chunk_infection_days) == 0:
+            return
+        pids = chunk_infection_days.index.to_numpy(dtype=np.int64)
+        if pids.max() >= len(self.first_infection_days):
+            # Grow geometrically so that pids increasing over chunks don't cause a
+            # copy per chunk
+            size = max(pids.max() + 1, 2 * len(self.first_infection_days))
+            self.first_infection_days = np.pad(
+                self.first_infection_days,
+                (0, size - len(self.first_infection_days)),
+                constant_values=self.NO_INFECTION,
+            )
+        self.first_infection_days[pids] = np.minimum(
+            self.first_infection_days[pids], chunk_infection_days.to_numpy()
+        )
+
+    def drop_days(self, days: np.ndarray):
+        """Drop the state counts of the given days. First infection days are kept."""
+        for counts in (self.s_counts, self.i_counts, self.n_counts):
+            counts[days] = 0
+
+    def save(self, counts_path: Path):
+        """Save counts to disk."""
+        with counts_path.open("wb") as fp:
+            np.savez(
+                fp,
+                s_counts=self.s_counts,
+                i_counts=self.i_counts,
+                n_counts=self.n_counts,
+                first_infection_days=self.first_infection_days,
+                num_rows=self.num_rows,
+            )
+
+    @classmethod
+    def load(cls, counts_path: Path) -> "DiseaseOutcomeCounts":
+        """Load counts from disk."""
+        counts = cls()
+        with np.load(counts_path) as arrays:
+            counts.s_counts = arrays["s_counts"]
+            counts.i_counts = arrays["i_counts"]
+            counts.n_counts = arrays["n_counts"]
+            counts.first_infection_days = arrays["first_infection_days"]
+            counts.num_rows = int(arrays["num_rows"])
+        return counts
+
+
 class SirModel:
     """A simplistic risk model based on the discrete-time version of the SIR disease
     model. This model estimates the parameter beta from the SIR equations, which is the
@@ -59,39 +170,162 @@ class SirModel:
         # Case where individual is I on first day doesn't matter, because it won't get
         # counted in any lookahead windows later
         logger.info("Identifying infection events...")
-        infection_events_df = (
-            disease_outcome_df[disease_outcome_df["state"] == "I"]
-            .sort_values(["day", "pid"])
-            .drop_duplicates("pid", keep="first")
+        states = disease_outcome_df["state"].to_numpy()
+        is_infected = states == "I"
+        infection_days = (
+            disease_outcome_df.loc[is_infected].groupby("pid")["day"].min().to_numpy()
         )
 
         # Get S, I, R counts per day
         logger.info("Counting disease states per day...")
-        day_df = disease_outcome_df.groupby("day").agg(
-            S=("state", lambda ser: (ser == "S").sum()),
-            I=("state", lambda ser: (ser == "I").sum()),
-            N=("pid", "size"),
+        days, day_index = np.unique(
+            disease_outcome_df["day"].to_numpy(), return_inverse=True
+        )
+        self.numerator, self.denominator = self._beta_sums(
+            days=days,
+            s_counts=np.bincount(day_index[states == "S"], minlength=len(days)),
+            i_counts=np.bincount(day_index[is_infected], minlength=len(days)),
+            n_counts=np.bincount(day_index, minlength=len(days)),
+            infection_days=infection_days,
         )
 
-        def count_infection_events(day: int):
-            window_events_df = infection_events_df[
-                (day < infection_events_df["day"])
-                & (infection_events_df["day"] <= day + self.lookahead)
-            ]
-            return window_events_df.shape[0]
+    def fit_chunks(
+        self, disease_outcome_chunks: Iterable[pd.DataFrame]
+    ) -> DiseaseOutcomeCounts:
+        """Estimates the beta parameter of the SIR Model from a disease outcome time
+        series in chunks, e.g., from pd.read_csv with chunksize, without holding the
+        whole time series in memory. Gives the same estimate as fit on the concatenated
+        chunks. Rows of the same day may be in different chunks.
 
-        # Get count of new infections over the lookahead period
-        logger.info("Counting infection events in lookahead window...")
-        day_df["next_infections"] = day_df.index.map(count_infection_events)
+        Args:
+            disease_outcome_chunks (Iterable[pd.DataFrame]): Chunks of the disease
+                outcome time series dataframe
 
-        day_df = day_df.iloc[: -self.lookahead]
+        Returns:
+            (DiseaseOutcomeCounts): Counts accumulated over all chunks
+        """
+        from loguru import logger
+
+        logger.info("Counting disease states and infection events per day...")
+        counts = DiseaseOutcomeCounts()
+        for chunk in disease_outcome_chunks:
+            counts.update(chunk)
+        days = counts.days
+        self.numerator, self.denominator = self._beta_sums(
+            days=days,
+            s_counts=counts.s_counts[days],
+            i_counts=counts.i_counts[days],
+            n_counts=counts.n_counts[days],
+            infection_days=counts.infection_days,
+        )
+        return counts
+
+    def partial_fit(
+        self,
+        disease_outcome_chunks: Iterable[pd.DataFrame],
+        carry_over: Optional[DiseaseOutcomeCounts] = None,
+    ) -> DiseaseOutcomeCounts:
+        """Updates the running sums of the beta estimate with newly arrived days of a
+        disease outcome time series, without processing earlier days again. The last
+        lookahead days of the time series don't have complete lookahead windows yet, so
+        their state counts are carried over to the next call, together with the first
+        infection day of each individual. Repeated calls on consecutive days give the
+        same estimate as fit on all days, up to floating point rounding.
+
+        Args:
+            disease_outcome_chunks (Iterable[pd.DataFrame]): Chunks of the disease
+                outcome time series dataframe, for days after all days of previous calls
+            carry_over (Optional[DiseaseOutcomeCounts]): Carry-over state returned by
+                the previous call. Updated in place. None for the first call.
+
+        Returns:
+            (DiseaseOutcomeCounts): Carry-over state for the next call
+        """
+        from loguru import logger
+
+        logger.info("Counting disease states and infection events of new days...")
+        counts = carry_over if carry_over is not None else DiseaseOutcomeCounts()
+        last_day = counts.last_day
+        for chunk in disease_outcome_chunks:
+            if last_day is not None and (chunk["day"] <= last_day).any():
+                raise ValueError(
+                    f"Disease outcome data must be for days after day {last_day}, "
+                    "the last day of previous updates."
+                )
+            counts.update(chunk)
+        days = counts.days
+        if len(days) == 0:
+            return counts
+
+        # Infection events before the first carried-over day are not in any of the
+        # remaining lookahead windows
+        infection_days = counts.infection_days
+        numerator, denominator = self._beta_sums(
+            days=days,
+            s_counts=counts.s_counts[days],
+            i_counts=counts.i_counts[days],
+            n_counts=counts.n_counts[days],
+            infection_days=infection_days[infection_days >= days[0]],
+        )
+        if self.numerator is None:
+            self.numerator, self.denominator = numerator, denominator
+        else:
+            self.numerator += numerator
+            self.denominator += denominator
+
+        # Days with complete lookahead windows are now included in the running sums
+        counts.drop_days(days[: max(len(days) - self.lookahead, 0)])
+        return counts
+
+    def _beta_sums(
+        self,
+        days: np.ndarray,
+        s_counts: np.ndarray,
+        i_counts: np.ndarray,
+        n_counts: np.ndarray,
+        infection_days: np.ndarray,
+    ) -> Tuple[float, float]:
+        """Numerator and denominator of the beta estimate from per-day state counts.
+        The last lookahead days are not included.
+
+        Args:
+            days (np.ndarray): Sorted days with disease outcome data
+            s_counts (np.ndarray): Number of S individuals on each day
+            i_counts (np.ndarray): Number of I individuals on each day
+            n_counts (np.ndarray): Number of individuals on each day
+            infection_days (np.ndarray): Day of the infection event of each individual
+                that was ever infected
+
+        Returns:
+            (Tuple[float, float]): Numerator and denominator of the beta estimate
+        """
+        from loguru import logger
+
+        # Get count of new infections over the lookahead period, i.e., with
+        # day < infection day <= day + lookahead, from the cumulative count of
+        # infection events up to each day
+        logger.info("Counting infection events in lookahead window...")
+        days = days.astype(np.int64)
+        first_day = days[0]
+        num_days = days[-1] - first_day + 1
+        events_per_day = np.bincount(
+            infection_days.astype(np.int64) - first_day, minlength=num_days
+        )
+        # cumulative_events[k] is the number of infection events before day
+        # first_day + k
+        cumulative_events = np.concatenate([[0], np.cumsum(events_per_day)])
+        window_end = np.minimum(
+            days - first_day + self.lookahead + 1, len(cumulative_events) - 1
+        )
+        next_infections = (
+            cumulative_events[window_end] - cumulative_events[days - first_day + 1]
+        )
 
-        y = day_df["next_infections"]
-        x = day_df["I"] * day_df["S"] / day_df["N"]
+        y = next_infections[: -self.lookahead]
+        x = (i_counts * s_counts / n_counts)[: -self.lookahead]
 
         # Calculate numerator and denominator for beta estimator
-        self.numerator = np.dot(x.values, y.values)
-        self.denominator = np.dot(x.values, x.values)
+        return np.dot(x, y), np.dot(x, x)
 
     def predict(self, disease_outcome_df: pd.DataFrame) -> pd.Series:
         if self.beta is None:
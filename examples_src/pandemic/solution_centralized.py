@@ -20,9 +20,12 @@ def fit(
     model_dir: Path,
 ):
     logger.info("Running fit...")
-    disease_outcome_df = pd.read_csv(disease_outcome_data_path)
     model = SirModel(lookahead=LOOKAHEAD)
-    model.fit(disease_outcome_df)
+    # Stream the disease outcome data in chunks instead of loading it all into memory
+    disease_outcome_chunks = disease_outcome_data_path.dataset().iter_batches(
+        columns=["pid", "day", "state"]
+    )
+    model.fit_chunks(disease_outcome_chunks)
     logger.info("...done running fit")
     logger.info("Saving model checkpoint...")
     model.save(model_dir / "model.json")
@@ -9,7 +9,7 @@ from loguru import logger
 import numpy as np
 import pandas as pd
 
-from src.sir_model import SirModel
+from src.sir_model import DiseaseOutcomeCounts, SirModel
 
 
 LOOKAHEAD = 7
@@ -26,6 +26,16 @@ def train_setup(server_dir: Path, client_dirs_dict: Dict[str, Path]):
     logger.info("Hello from train_setup")
 
 
+def client_resources(cid: str) -> Dict[str, float]:
+    """
+    Optional: Declare the resources that a client needs, as a dictionary with keys
+    "num_cpus", "num_gpus", and "memory" (bytes). Only used when clients are scheduled
+    concurrently with SUPERVISOR_CLIENT_SCHEDULING=packed. If you don't need this, then
+    don't define this function.
+    """
+    return {"num_cpus": 1}
+
+
 def to_parameters_ndarrays(numerator: float, denominator: float) -> List[np.ndarray]:
     """Utility function to convert SirModel parameters to List[np.ndarray] used by
     Flower's NumPyClient for transferring model parameters.
@@ -57,19 +67,47 @@ def set_model_parameters(model: SirModel, parameters: List[np.ndarray]) -> SirMo
 
 
 class TrainingClient(fl.client.NumPyClient):
-    def __init__(self, cid: str, model: SirModel, disease_outcome_df: pd.DataFrame):
+    def __init__(
+        self,
+        cid: str,
+        model: SirModel,
+        disease_outcome_data_path: Path,
+        client_dir: Path,
+    ):
         super().__init__()
         self.cid = cid
         self.model = model
-        self.disease_outcome_df = disease_outcome_df
+        self.disease_outcome_data_path = disease_outcome_data_path
+        self.model_path = client_dir / "model.json"
+        self.counts_path = client_dir / "disease_outcome_counts.npz"
 
     def fit(
         self, parameters: List[np.ndarray], config: dict
     ) -> Tuple[List[np.ndarray], int, dict]:
         """Fit model on partitioned dataset. Server is not passing any meaningful
-        parameters or configuration. Returned fitted model parameters back to server."""
-        self.model.fit(self.disease_outcome_df)
-        return get_model_parameters(self.model), self.disease_outcome_df.shape[0], {}
+        parameters or configuration. Returned fitted model parameters back to server.
+
+        The model is updated incrementally: from round 2 on, the running sums and the
+        carry-over state of previous rounds are loaded from the client directory, and
+        only days of the disease outcome data after the days of previous rounds are
+        read, in chunks. Round 1 starts from scratch, so that state left in the client
+        directory by an earlier run is never reused."""
+        carry_over = None
+        filters = None
+        if config.get("server_round", 1) > 1 and self.counts_path.exists():
+            self.model = SirModel.load(self.model_path)
+            carry_over = DiseaseOutcomeCounts.load(self.counts_path)
+            if carry_over.last_day is not None:
+                filters = [("day", ">", carry_over.last_day)]
+        counts = self.model.partial_fit(
+            self.disease_outcome_data_path.dataset().iter_batches(
+                columns=["pid", "day", "state"], filters=filters
+            ),
+            carry_over=carry_over,
+        )
+        self.model.save(self.model_path)
+        counts.save(self.counts_path)
+        return get_model_parameters(self.model), counts.num_rows, {}
 
 
 def train_client_factory(
@@ -115,9 +153,13 @@ def train_client_factory(
     Returns:
         (Union[Client, NumPyClient]): Instance of Flower Client or NumPyClient.
     """
-    disease_outcome_df = pd.read_csv(disease_outcome_data_path)
     model = SirModel(lookahead=LOOKAHEAD)
-    return TrainingClient(cid=cid, model=model, disease_outcome_df=disease_outcome_df)
+    return TrainingClient(
+        cid=cid,
+        model=model,
+        disease_outcome_data_path=disease_outcome_data_path,
+        client_dir=client_dir,
+    )
 
 
 class TrainStrategy(fl.server.strategy.Strategy):
@@ -136,11 +178,14 @@ class TrainStrategy(fl.server.strategy.Strategy):
     ) -> List[Tuple[ClientProxy, FitIns]]:
         """Fit all clients."""
         logger.info(f"Configuring fit for round {server_round}...")
-        # Fit every client once. Don't need to pass any initial parameters or config.
+        # Fit every client. Don't need to pass any initial parameters. Clients reuse
+        # their incremental state after the first round.
         clients = list(client_manager.all().values())
-        empty_fit_ins = fl.common.FitIns(fl.common.ndarrays_to_parameters([]), {})
+        fit_ins = fl.common.FitIns(
+            fl.common.ndarrays_to_parameters([]), {"server_round": server_round}
+        )
         logger.info(f"...done configuring fit for round {server_round}")
-        return [(client, empty_fit_ins) for client in clients]
+        return [(client, fit_ins) for client in clients]
 
     def aggregate_fit(
         self, server_round: int, results: List[Tuple[ClientProxy, FitRes]], failures
@@ -218,6 +263,8 @@ def train_strategy_factory(
         (int): Number of federated learning rounds to execute.
     """
     training_strategy = TrainStrategy(server_dir=server_dir)
+    # Clients would update their models incrementally in later rounds, with the days of
+    # disease outcome data that arrived since, but data doesn't change within a stage
     num_rounds = 1
     return training_strategy, num_rounds
 
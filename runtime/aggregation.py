@@ -0,0 +1,172 @@
+"""Streaming aggregation of fit results in strategies.
+
+Strategies receive all fit results of a round at once in aggregate_fit, so decoding
+and reducing them there holds every client's parameters in server memory at the same
+time. A strategy that defines accumulate_fit instead gets each fit result as soon as
+its client finishes, and the server releases the result's parameters once
+accumulate_fit returns. aggregate_fit is still called at the end of the round, with
+the same results but empty parameters, for their numbers of examples and metrics.
+
+The aggregators here fold fit results into a running reduction, so that server memory
+doesn't grow with the number of clients (except for concatenation):
+
+    class MyStrategy(fl.server.strategy.Strategy):
+        def configure_fit(self, server_round, parameters, client_manager):
+            self.aggregator = FedAvgAggregator()
+            ...
+
+        def accumulate_fit(self, server_round, client_proxy, fit_res):
+            self.aggregator.add_fit_res(fit_res)
+
+        def aggregate_fit(self, server_round, results, failures):
+            return ndarrays_to_parameters(self.aggregator.result()), {}
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from flwr.common.typing import FitRes
+import numpy as np
+
+from parameters_codec import NDArrays
+from update_compression import decode_parameters
+
+
+class StreamingAggregator(ABC):
+    """Running reduction of lists of arrays, position by position. Subclasses
+    implement _add, _result, and _reset."""
+
+    def __init__(self):
+        self.num_results = 0
+        self.num_arrays = 0
+
+    def add(self, ndarrays: NDArrays, weight: float = 1.0):
+        """Fold the arrays of one result into the reduction."""
+        if self.num_results > 0 and len(ndarrays) != self.num_arrays:
+            raise ValueError(
+                f"Expected {self.num_arrays} arrays like the previous results, got "
+                f"{len(ndarrays)}."
+            )
+        self.num_arrays = len(ndarrays)
+        self._add(ndarrays, weight)
+        self.num_results += 1
+
+    def add_fit_res(self, fit_res: FitRes):
+        """Fold a fit result's parameters into the reduction, weighted by its number
+        of examples. Parameters may be compressed with parameters_codec or
+        update_compression."""
+        self.add(decode_parameters(fit_res.parameters), weight=fit_res.num_examples)
+
+    def result(self) -> NDArrays:
+        """Reduced arrays, or an empty list if no results were added. The aggregator is
+        reset."""
+        ndarrays = self._result() if self.num_results > 0 else []
+        self.reset()
+        return ndarrays
+
+    def reset(self):
+        self.num_results = 0
+        self._reset()
+
+    @abstractmethod
+    def _add(self, ndarrays: NDArrays, weight: float):
+        """Fold arrays into the reduction."""
+
+    @abstractmethod
+    def _result(self) -> NDArrays:
+        """Reduced arrays of at least one result."""
+
+    @abstractmethod
+    def _reset(self):
+        """Clear the reduction's state."""
+
+
+def _accumulator_dtype(dtype: np.dtype) -> np.dtype:
+    return np.dtype(np.float64) if dtype.kind in "fc" else np.dtype(np.int64)
+
+
+class SumAggregator(StreamingAggregator):
+    """Sum of the arrays, ignoring weights, in 64-bit precision."""
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self.totals: List[np.ndarray] = []
+
+    def _add(self, ndarrays: NDArrays, weight: float):
+        if not self.totals:
+            self.totals = [
+                np.array(ndarray, dtype=_accumulator_dtype(np.asarray(ndarray).dtype))
+                for ndarray in ndarrays
+            ]
+            return
+        for total, ndarray in zip(self.totals, ndarrays):
+            np.add(total, ndarray, out=total, casting="unsafe")
+
+    def _result(self) -> NDArrays:
+        return self.totals
+
+
+class FedAvgAggregator(StreamingAggregator):
+    """Weighted mean of the arrays, like FedAvg, accumulated in float64. Means have the
+    dtype of the first result's arrays if it is a float dtype, and float64
+    otherwise."""
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self.totals: List[np.ndarray] = []
+        self.dtypes: List[np.dtype] = []
+        self.total_weight = 0.0
+
+    def _add(self, ndarrays: NDArrays, weight: float):
+        if not self.totals:
+            self.dtypes = [np.asarray(ndarray).dtype for ndarray in ndarrays]
+            self.totals = [
+                np.multiply(ndarray, weight, dtype=np.float64) for ndarray in ndarrays
+            ]
+        else:
+            for total, ndarray in zip(self.totals, ndarrays):
+                total += np.multiply(ndarray, weight, dtype=np.float64)
+        self.total_weight += weight
+
+    def _result(self) -> NDArrays:
+        if self.total_weight == 0:
+            raise ValueError("Can't average results with a total weight of zero.")
+        return [
+            (total / self.total_weight).astype(
+                dtype if dtype.kind == "f" else np.float64, copy=False
+            )
+            for total, dtype in zip(self.totals, self.dtypes)
+        ]
+
+
+class ConcatAggregator(StreamingAggregator):
+    """Concatenation of the arrays along axis, in the order that results are added.
+    Arrays are kept as they are until the result is requested, so decoded arrays that
+    are views of their tensors keep only the tensors alive and not the fit results."""
+
+    def __init__(self, axis: Optional[int] = 0):
+        super().__init__()
+        self.axis = axis
+        self._reset()
+
+    def _reset(self):
+        self.parts: List[NDArrays] = []
+
+    def _add(self, ndarrays: NDArrays, weight: float):
+        if not self.parts:
+            self.parts = [[] for _ in ndarrays]
+        for parts, ndarray in zip(self.parts, ndarrays):
+            parts.append(ndarray)
+
+    def _result(self) -> NDArrays:
+        ndarrays = []
+        while self.parts:
+            # Release each position's parts as soon as they are concatenated
+            ndarrays.append(np.concatenate(self.parts.pop(0), axis=self.axis))
+        return ndarrays
@@ -0,0 +1,276 @@
+"""Compact contact graph of a population network edge list.
+
+The population network data file lists one row per contact between two people. A
+ContactGraph aggregates the contacts of each pair of people into one edge of a
+symmetric CSR adjacency, with int32 node indices, the number of contacts as edge
+weights, and the total contact duration. The graph is built once from the CSV file and
+cached as .npy files that are memory-mapped when loaded, e.g., in a client directory:
+
+    graph = ContactGraph.from_network_file(
+        population_network_data_path, cache_dir=client_dir / "contact_graph"
+    )
+    infected_contacts = graph.infected_contacts_by_day(disease_outcome_df)
+"""
+
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+NETWORK_COLUMNS = ["pid1", "pid2", "duration"]
+CHUNK_SIZE = 5_000_000
+EDGE_VALUES = ("weights", "durations")
+CACHE_ARRAYS = ("pids", "indptr", "indices", "weights", "durations")
+
+# Edge keys pack the source pid in the high and the target pid in the low 32 bits
+MAX_PID = 2**31 - 1
+PID_BITS = 32
+
+EdgeRun = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _iter_network_chunks(network_path: Path) -> Iterator[pd.DataFrame]:
+    # Read the CSV file directly, even for data paths passed to solutions, since their
+    # Arrow cache would be a full uncompressed copy of the file that is only read once
+    yield from pd.read_csv(
+        Path(network_path), usecols=NETWORK_COLUMNS, chunksize=CHUNK_SIZE
+    )
+
+
+def _aggregate_edges(keys: np.ndarray, weights: np.ndarray, durations: np.ndarray):
+    """Sum the weights and durations of edges with the same key. Keys must be
+    sorted."""
+    if len(keys) == 0:
+        return keys, weights, durations
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return (
+        keys[starts],
+        np.add.reduceat(weights, starts),
+        np.add.reduceat(durations, starts),
+    )
+
+
+def _merge_runs(a: EdgeRun, b: EdgeRun) -> EdgeRun:
+    keys, weights, durations = (np.concatenate([x, y]) for x, y in zip(a, b))
+    # Stable sorting detects the two sorted runs, so merging is close to linear
+    order = np.argsort(keys, kind="stable")
+    return _aggregate_edges(keys[order], weights[order], durations[order])
+
+
+def _chunk_edges(chunk: pd.DataFrame) -> EdgeRun:
+    """Aggregated edges in both directions of the contacts in a chunk."""
+    pid1 = chunk["pid1"].to_numpy(dtype=np.int64)
+    pid2 = chunk["pid2"].to_numpy(dtype=np.int64)
+    if len(pid1) > 0 and (
+        min(pid1.min(), pid2.min()) < 0 or max(pid1.max(), pid2.max()) > MAX_PID
+    ):
+        raise ValueError(f"Contact graph pids must be between 0 and {MAX_PID}.")
+    durations = chunk["duration"].to_numpy(dtype=np.float64)
+    # A person's contacts with themselves are not edges
+    is_edge = pid1 != pid2
+    pid1, pid2, durations = pid1[is_edge], pid2[is_edge], durations[is_edge]
+    keys = np.concatenate([(pid1 << PID_BITS) | pid2, (pid2 << PID_BITS) | pid1])
+    durations = np.concatenate([durations, durations])
+    order = np.argsort(keys)
+    return _aggregate_edges(
+        keys[order], np.ones(len(keys), dtype=np.int32), durations[order]
+    )
+
+
+class ContactGraph:
+    """Undirected contact graph in CSR format over node indices 0, ..., num_nodes - 1.
+    Only people with at least one contact are nodes.
+
+    Attributes:
+        pids (np.ndarray): Sorted pid of each node.
+        indptr (np.ndarray): CSR row pointers. The neighbors of node i are
+            indices[indptr[i]:indptr[i + 1]].
+        indices (np.ndarray): Node indices of the neighbors of each node, as int32.
+        weights (np.ndarray): Number of contacts of each edge.
+        durations (np.ndarray): Total duration of the contacts of each edge.
+    """
+
+    def __init__(
+        self,
+        pids: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+        durations: np.ndarray,
+    ):
+        self.pids = pids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.durations = durations
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(num_nodes={self.num_nodes}, "
+            f"num_edges={self.num_edges})"
+        )
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.pids)
+
+    @property
+    def num_edges(self) -> int:
+        """Number of undirected edges."""
+        return len(self.indices) // 2
+
+    @classmethod
+    def from_edges(cls, network_chunks: Iterator[pd.DataFrame]) -> "ContactGraph":
+        """Build the graph in memory from chunks of the population network table.
+        Memory use depends on the number of distinct pairs of people in contact and
+        not on the number of contacts."""
+        # Aggregated edges of chunks are merged like in a log-structured merge tree,
+        # so that each edge is merged O(log(number of chunks)) times
+        runs: List[EdgeRun] = []
+        for chunk in network_chunks:
+            runs.append(_chunk_edges(chunk))
+            while len(runs) > 1 and len(runs[-2][0]) <= 2 * len(runs[-1][0]):
+                runs.append(_merge_runs(runs.pop(-2), runs.pop()))
+        while len(runs) > 1:
+            runs.append(_merge_runs(runs.pop(-2), runs.pop()))
+        if runs:
+            keys, weights, durations = runs[0]
+        else:
+            keys = np.zeros(0, dtype=np.int64)
+            weights = np.zeros(0, dtype=np.int32)
+            durations = np.zeros(0, dtype=np.float64)
+
+        source_pids = keys >> PID_BITS
+        target_pids = keys & ((1 << PID_BITS) - 1)
+        pids, degrees = np.unique(source_pids, return_counts=True)
+        indptr = np.concatenate([[0], np.cumsum(degrees)])
+        return cls(
+            pids=pids,
+            indptr=indptr.astype(np.int32 if len(keys) <= MAX_PID else np.int64),
+            indices=np.searchsorted(pids, target_pids).astype(np.int32),
+            weights=weights.astype(np.int32),
+            durations=durations.astype(np.float32),
+        )
+
+    @classmethod
+    def from_network_file(
+        cls, network_path: Path, cache_dir: Optional[Path] = None
+    ) -> "ContactGraph":
+        """Load the graph of a population network data file. If cache_dir is given,
+        the graph is built once and cached there, keyed by the data file's path, size,
+        and modification time, and the cached arrays are memory-mapped."""
+        if cache_dir is None:
+            return cls.from_edges(_iter_network_chunks(network_path))
+        path = Path(network_path)
+        stat = path.stat()
+        key = f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        graph_dir = Path(cache_dir) / f"{path.name.split('.')[0]}-{digest}"
+        if not graph_dir.exists():
+            cls.from_edges(_iter_network_chunks(path)).save(graph_dir)
+        return cls.load(graph_dir)
+
+    def save(self, graph_dir: Path):
+        """Save the graph's arrays as .npy files in graph_dir."""
+        graph_dir = Path(graph_dir)
+        graph_dir.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary directory first so that concurrent readers never see a
+        # partially written graph
+        tmp_dir = graph_dir.with_name(
+            f"{graph_dir.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp_dir.mkdir()
+        try:
+            for name in CACHE_ARRAYS:
+                np.save(tmp_dir / f"{name}.npy", getattr(self, name))
+            try:
+                os.replace(tmp_dir, graph_dir)
+            except OSError:
+                # Saved by another process in the meantime
+                if not graph_dir.exists():
+                    raise
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir)
+
+    @classmethod
+    def load(cls, graph_dir: Path) -> "ContactGraph":
+        """Load a saved graph with memory-mapped arrays."""
+        return cls(
+            **{
+                name: np.load(Path(graph_dir) / f"{name}.npy", mmap_mode="r")
+                for name in CACHE_ARRAYS
+            }
+        )
+
+    def node_index(self, pids: np.ndarray) -> np.ndarray:
+        """Node index of each pid, or -1 for pids without contacts."""
+        pids = np.asarray(pids)
+        if self.num_nodes == 0:
+            return np.full(pids.shape, -1, dtype=np.int32)
+        index = np.searchsorted(self.pids, pids)
+        index[index == self.num_nodes] = 0
+        return np.where(self.pids[index] == pids, index, -1).astype(np.int32)
+
+    def adjacency(self, edge_values: Optional[str] = None):
+        """Adjacency matrix as a scipy.sparse.csr_matrix that shares the graph's
+        arrays. Entries are 1 for each pair of people in contact, or the edge weights
+        or durations if edge_values is "weights" or "durations"."""
+        from scipy import sparse
+
+        if edge_values is None:
+            data = np.ones(len(self.indices), dtype=np.float32)
+        elif edge_values in EDGE_VALUES:
+            data = getattr(self, edge_values)
+        else:
+            raise ValueError(
+                f"Edge values must be None or one of {EDGE_VALUES}, got {edge_values}"
+            )
+        return sparse.csr_matrix(
+            (data, self.indices, self.indptr),
+            shape=(self.num_nodes, self.num_nodes),
+            copy=False,
+        )
+
+    def neighbor_sum(
+        self, node_values: np.ndarray, edge_values: Optional[str] = None
+    ) -> np.ndarray:
+        """Sum of node_values over the neighbors of each node, weighted by
+        edge_values as in adjacency. node_values may have one column per feature."""
+        return self.adjacency(edge_values) @ node_values
+
+    def infected_contacts_by_day(
+        self,
+        disease_outcome_df: pd.DataFrame,
+        edge_values: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Number of infected contacts of each person on each day of the disease
+        outcome time series, or their total number of contacts or contact duration
+        with edge_values "weights" or "durations". Returns a DataFrame indexed by the
+        graph's pids with one column per day. Filter the time series to the days of
+        interest first to limit memory use."""
+        from scipy import sparse
+
+        days = np.sort(disease_outcome_df["day"].unique())
+        infected_df = disease_outcome_df[disease_outcome_df["state"] == "I"]
+        nodes = self.node_index(infected_df["pid"].to_numpy())
+        day_positions = np.searchsorted(days, infected_df["day"].to_numpy())
+        has_contacts = nodes >= 0
+        infected = sparse.csr_matrix(
+            (
+                np.ones(has_contacts.sum(), dtype=np.float32),
+                (nodes[has_contacts], day_positions[has_contacts]),
+            ),
+            shape=(self.num_nodes, len(days)),
+        )
+        counts = (self.adjacency(edge_values) @ infected).toarray()
+        return pd.DataFrame(
+            counts,
+            index=pd.Index(np.asarray(self.pids), name="pid"),
+            columns=pd.Index(days, name="day"),
+        )
@@ -0,0 +1,437 @@
+import functools
+import hashlib
+import operator
+import os
+from pathlib import Path
+import threading
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# pyarrow is only installed as a dependency of other packages. Without it, cached data
+# paths fall back to reading the CSV file with pandas.
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pragma: no cover
+    pa = None
+
+# Block size for streaming CSV conversion. Column types are inferred from the first
+# block, so it should be large enough to be representative of the whole file.
+CSV_BLOCK_SIZE = 64 * 2**20
+
+# Same strings that pandas.read_csv treats as missing values by default
+PANDAS_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "n/a",
+    "nan",
+    "null",
+]
+
+
+def _convert_options(column_types=None):
+    return pa_csv.ConvertOptions(
+        column_types=column_types,
+        null_values=PANDAS_NA_VALUES,
+        strings_can_be_null=True,
+    )
+
+
+def _string_column_types(schema) -> dict:
+    """Keep dates and timestamps as strings, like pandas.read_csv does by default."""
+    return {
+        field.name: pa.string()
+        for field in schema
+        if pa.types.is_temporal(field.type)
+    }
+
+
+# Row filters are in disjunctive normal form, like the filters argument of
+# pandas.read_parquet: a list of (column, op, value) tuples that must all be true, or a
+# list of such lists, any of which must be true.
+Filter = Tuple[str, str, Any]
+Filters = Union[List[Filter], List[List[Filter]]]
+
+FILTER_OPS = ("==", "!=", "<", "<=", ">", ">=", "in", "not in")
+
+
+def _normalize_filters(filters: Optional[Filters]) -> Optional[List[List[Filter]]]:
+    if not filters:
+        return None
+    if isinstance(filters[0], tuple):
+        filters = [filters]
+    for conjunction in filters:
+        for column, op, value in conjunction:
+            if op not in FILTER_OPS:
+                raise ValueError(f"Filter op must be one of {FILTER_OPS}, got {op}")
+    return [list(conjunction) for conjunction in filters]
+
+
+def _filter_columns(filters: Optional[List[List[Filter]]]) -> List[str]:
+    if filters is None:
+        return []
+    return list(dict.fromkeys(f[0] for conjunction in filters for f in conjunction))
+
+
+def _arrow_filter_mask(table: "pa.Table", filters: List[List[Filter]]) -> "pa.Array":
+    arrow_ops = {
+        "==": pc.equal,
+        "!=": pc.not_equal,
+        "<": pc.less,
+        "<=": pc.less_equal,
+        ">": pc.greater,
+        ">=": pc.greater_equal,
+    }
+    mask = None
+    for conjunction in filters:
+        conjunction_mask = None
+        for column, op, value in conjunction:
+            if op in ("in", "not in"):
+                term = pc.is_in(table[column], value_set=pa.array(list(value)))
+                if op == "not in":
+                    # Missing values are neither in nor not in the values, as in pandas
+                    term = pc.and_(pc.invert(term), pc.is_valid(table[column]))
+            else:
+                term = arrow_ops[op](table[column], value)
+            # Comparisons with missing values are null, which only makes a conjunction
+            # null, and a disjunction null if no other term is true
+            conjunction_mask = (
+                term
+                if conjunction_mask is None
+                else pc.and_kleene(conjunction_mask, term)
+            )
+        mask = (
+            conjunction_mask if mask is None else pc.or_kleene(mask, conjunction_mask)
+        )
+    return mask
+
+
+def _pandas_filter_mask(df: pd.DataFrame, filters: List[List[Filter]]) -> np.ndarray:
+    pandas_ops = {
+        "==": operator.eq,
+        "!=": operator.ne,
+        "<": operator.lt,
+        "<=": operator.le,
+        ">": operator.gt,
+        ">=": operator.ge,
+    }
+    mask = np.zeros(len(df), dtype=bool)
+    for conjunction in filters:
+        conjunction_mask = np.ones(len(df), dtype=bool)
+        for column, op, value in conjunction:
+            if op in ("in", "not in"):
+                term = df[column].isin(list(value)).to_numpy()
+                if op == "not in":
+                    term = ~term & df[column].notna().to_numpy()
+            else:
+                # Comparisons with missing values are false, including !=, like in
+                # Arrow
+                term = (
+                    pandas_ops[op](df[column], value) & df[column].notna()
+                ).to_numpy()
+            conjunction_mask &= term.astype(bool)
+        mask |= conjunction_mask
+    return mask
+
+
+def _select_and_filter(
+    table: "pa.Table",
+    columns: Optional[Sequence[str]],
+    filters: Optional[List[List[Filter]]],
+) -> "pa.Table":
+    """Rows of table that match filters, with only the selected columns. Filters are
+    evaluated on their own columns, and only the selected columns of matching rows are
+    copied, so other columns of a memory-mapped table are never read."""
+    mask = None
+    if filters is not None:
+        mask = _arrow_filter_mask(table.select(_filter_columns(filters)), filters)
+    if columns is not None:
+        table = table.select(list(columns))
+    if mask is not None:
+        table = table.filter(mask)
+    return table
+
+
+@functools.lru_cache(maxsize=32)
+def _open_cache_file(cache_path: Path) -> "pa.Table":
+    """Memory-mapped table of a cache file. Memoized, so each cache file is only
+    opened once per process. Memoizing costs only address space, not memory."""
+    return pa_ipc.open_file(pa.memory_map(str(cache_path), "r")).read_all()
+
+
+class DatasetHandle:
+    """Lazy handle to a data file. Nothing is read until read or iter_batches is
+    called, and then only the requested columns and rows are loaded into memory.
+
+    Reads come from the memory-mapped columnar cache of the data file, which is shared
+    between stages and memoized within a process. If pyarrow is not available, reads
+    fall back to parsing the CSV file with pandas.
+    """
+
+    def __init__(self, path: "CachedDataPath"):
+        self.path = path
+
+    def __repr__(self):
+        return f"DatasetHandle({str(self.path)!r})"
+
+    @property
+    def cached(self) -> bool:
+        return self.path.cache_path is not None
+
+    @property
+    def columns(self) -> List[str]:
+        if self.cached:
+            return list(self._table().column_names)
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def _table(self) -> "pa.Table":
+        return _open_cache_file(self.path.build_cache())
+
+    def read_table(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Filters] = None,
+    ) -> "pa.Table":
+        """Read the selected columns and rows as an Arrow table. Requires pyarrow."""
+        if pa is None:
+            raise ImportError("pyarrow is required to read data as an Arrow table.")
+        if not self.cached:
+            return pa.Table.from_pandas(
+                self.read(columns=columns, filters=filters), preserve_index=False
+            )
+        return _select_and_filter(self._table(), columns, _normalize_filters(filters))
+
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Filters] = None,
+        index_col: Optional[Union[str, List[str]]] = None,
+    ) -> pd.DataFrame:
+        """Read the selected columns and rows as a pandas DataFrame.
+
+        Args:
+            columns (Optional[Sequence[str]]): Columns to read. Reads all columns if
+                None. Index columns are added if necessary.
+            filters (Optional[Filters]): Row filters in disjunctive normal form, e.g.,
+                [("state", "==", "I"), ("date", ">=", 10)] or
+                [[("cid", "in", ["a", "b"])], [("x", ">", 0)]].
+            index_col (Optional[Union[str, List[str]]]): Columns to set as the index.
+        """
+        if columns is not None and index_col is not None:
+            index_cols = [index_col] if isinstance(index_col, str) else index_col
+            columns = list(columns) + [c for c in index_cols if c not in columns]
+        if self.cached:
+            df = self.read_table(columns=columns, filters=filters).to_pandas()
+        else:
+            df = next(self._iter_csv_chunks(columns=columns, filters=filters))
+        if index_col is not None:
+            df = df.set_index(index_col)
+        return df
+
+    def iter_batches(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Filters] = None,
+        batch_size: int = 1_000_000,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterate over the selected columns and rows in DataFrames of at most
+        batch_size rows, so that the whole file is never in memory at once. Batches
+        are not guaranteed to have exactly batch_size rows. With the cache, filters
+        only read their own columns, and batches without matching rows are skipped."""
+        if not self.cached:
+            yield from self._iter_csv_chunks(
+                columns=columns, filters=filters, chunksize=batch_size
+            )
+            return
+        table = self._table()
+        filters = _normalize_filters(filters)
+        for batch in table.to_batches(max_chunksize=batch_size):
+            batch_table = _select_and_filter(
+                pa.Table.from_batches([batch]), columns, filters
+            )
+            # Batches without matching rows, e.g., of days before an incremental
+            # update, are skipped without converting them to pandas
+            if batch_table.num_rows > 0 or filters is None:
+                yield batch_table.to_pandas()
+
+    def _iter_csv_chunks(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Filters] = None,
+        chunksize: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Read the CSV file with pandas, in one chunk if chunksize is None."""
+        filters = _normalize_filters(filters)
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys(list(columns) + _filter_columns(filters)))
+        if chunksize is None:
+            chunks = [pd.read_csv(self.path, usecols=usecols)]
+        else:
+            chunks = pd.read_csv(self.path, usecols=usecols, chunksize=chunksize)
+        for chunk in chunks:
+            if filters is not None:
+                chunk = chunk[_pandas_filter_mask(chunk, filters)]
+            if columns is not None:
+                chunk = chunk[list(columns)]
+            yield chunk.reset_index(drop=True)
+
+
+def _rebuild_cached_data_path(path: str, cache_dir: Optional[str]):
+    return CachedDataPath(path, cache_dir=cache_dir)
+
+
+class CachedDataPath(type(Path())):
+    """Path to a CSV data file that is also backed by a typed Arrow IPC cache file.
+
+    Behaves like a regular Path, so existing code can keep reading the original file,
+    e.g., with pandas.read_csv. The read_table and read_pandas methods instead read the
+    cache, which is created on first use by converting the CSV file in a streaming
+    fashion. Cache files are memory-mapped when read, so later reads, including in
+    other stages and processes, don't parse the CSV file again.
+
+    Cache files are keyed by the original file's path, size, and modification time.
+
+    Subclassing the concrete Path class relies on pathlib internals before Python 3.12,
+    which the runtime uses: constructor arguments are handled in __new__ alone, and
+    derived paths are created without calling __new__. Python 3.12 passes constructor
+    arguments to __init__ and creates derived paths with with_segments, so this class
+    would need both to take cache_dir there.
+    """
+
+    # Paths derived from this path, e.g., with .parent, are also of this class but
+    # have no cache directory. Reads then fall back to the original file.
+    cache_dir: Optional[Path] = None
+
+    def __new__(cls, *args, cache_dir: Optional[Union[str, Path]] = None):
+        self = super().__new__(cls, *args)
+        if cache_dir is not None:
+            self.cache_dir = Path(cache_dir)
+        return self
+
+    def __reduce__(self):
+        return (
+            _rebuild_cached_data_path,
+            (str(self), None if self.cache_dir is None else str(self.cache_dir)),
+        )
+
+    @property
+    def cache_path(self) -> Optional[Path]:
+        """Path of the cache file for the current version of the original file, or
+        None if caching is not available."""
+        if pa is None or self.cache_dir is None:
+            return None
+        stat = self.stat()
+        key = f"{self.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        name = self.name.split(".")[0]
+        return self.cache_dir / f"{name}-{digest}.arrow"
+
+    def build_cache(self) -> Optional[Path]:
+        """Create the cache file if it doesn't exist yet and return its path."""
+        cache_path = self.cache_path
+        if cache_path is None or cache_path.exists():
+            return cache_path
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that concurrent readers never see a
+        # partial cache file
+        tmp_path = cache_path.with_name(
+            f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            try:
+                self._write_cache_streaming(tmp_path)
+            except pa.ArrowInvalid:
+                # Column types inferred from the first block don't fit a later block.
+                # Read the whole file instead, which infers types over all blocks.
+                self._write_cache_full(tmp_path)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return cache_path
+
+    def _write_cache_streaming(self, tmp_path: Path):
+        read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+        reader = pa_csv.open_csv(
+            str(self), read_options=read_options, convert_options=_convert_options()
+        )
+        column_types = _string_column_types(reader.schema)
+        if column_types:
+            reader = pa_csv.open_csv(
+                str(self),
+                read_options=read_options,
+                convert_options=_convert_options(column_types),
+            )
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa_ipc.new_file(sink, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+
+    def _write_cache_full(self, tmp_path: Path):
+        table = pa_csv.read_csv(
+            str(self),
+            read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            convert_options=_convert_options(),
+        )
+        column_types = _string_column_types(table.schema)
+        if column_types:
+            table = table.cast(
+                pa.schema(
+                    [
+                        field.with_type(column_types.get(field.name, field.type))
+                        for field in table.schema
+                    ]
+                )
+            )
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa_ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def read_table(self, columns: Optional[List[str]] = None) -> "pa.Table":
+        """Read the data as an Arrow table backed by the memory-mapped cache file.
+        Requires pyarrow."""
+        if pa is None:
+            raise ImportError("pyarrow is required to read data as an Arrow table.")
+        cache_path = self.build_cache()
+        if cache_path is None:
+            table = pa_csv.read_csv(
+                str(self),
+                read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+                convert_options=_convert_options(),
+            )
+        else:
+            table = _open_cache_file(cache_path)
+        if columns is not None:
+            table = table.select(columns)
+        return table
+
+    def dataset(self) -> DatasetHandle:
+        """Lazy handle for reading selected columns and rows of this data file."""
+        return DatasetHandle(self)
+
+    def read_pandas(
+        self,
+        columns: Optional[List[str]] = None,
+        index_col: Optional[Union[str, List[str]]] = None,
+    ) -> pd.DataFrame:
+        """Read the data as a pandas DataFrame, from the cache file if possible. Column
+        types match pandas.read_csv with default arguments."""
+        return self.dataset().read(columns=columns, index_col=index_col)
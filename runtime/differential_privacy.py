@@ -0,0 +1,251 @@
+"""Vectorized clipping and noise for differentially private updates, with a privacy
+accountant.
+
+The functions here work on lists of arrays like the ones that clients return from
+fit, with one norm and one noise draw for the whole list instead of one per array. A
+client of DP-FedAvg clips its update and the server adds noise to the sum, or a
+client privatizes its own update (local DP):
+
+    update = [new - old for new, old in zip(new_weights, received_weights)]
+    update, norm = clip_update(update, max_norm=1.0)
+    noisy_update = add_gaussian_noise(update, stddev=noise_multiplier * 1.0)
+
+For DP-SGD, clipped_sum_per_example clips the gradients of each example of a batch
+and sums them. Discrete Gaussian noise keeps values on a grid, e.g., the fixed-point
+grid of secure_aggregation with granularity 2**-FRACTIONAL_BITS, so that clients can
+add their share of the noise before masking. A PrivacyAccountant tracks the epsilon
+spent after each round of the Gaussian mechanism, with Rényi differential privacy.
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.special import gammaln, logsumexp
+
+from parameters_codec import NDArrays
+
+# Rényi divergence orders of the accountant
+DEFAULT_ORDERS = tuple(range(2, 65)) + (80, 96, 128, 256)
+
+
+def _float_dtype(ndarrays: NDArrays) -> np.dtype:
+    """float32 if all float arrays are float32 or narrower, and float64 otherwise."""
+    dtypes = [np.asarray(ndarray).dtype for ndarray in ndarrays]
+    if dtypes and all(dtype.kind == "f" and dtype.itemsize <= 4 for dtype in dtypes):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def _result_dtype(ndarray: np.ndarray) -> np.dtype:
+    return ndarray.dtype if ndarray.dtype.kind == "f" else np.dtype(np.float64)
+
+
+def global_norm(ndarrays: NDArrays) -> float:
+    """L2 norm of all values of ndarrays together."""
+    total = 0.0
+    for ndarray in ndarrays:
+        flat = np.ravel(ndarray)
+        total += float(np.dot(flat, flat))
+    return math.sqrt(total)
+
+
+def clip_update(ndarrays: NDArrays, max_norm: float) -> Tuple[NDArrays, float]:
+    """Arrays scaled so that their global L2 norm is at most max_norm, and their norm
+    before clipping. Arrays that don't need clipping are returned as they are."""
+    norm = global_norm(ndarrays)
+    if norm <= max_norm:
+        return list(ndarrays), norm
+    factor = max_norm / norm
+    return [
+        np.multiply(ndarray, factor, dtype=_result_dtype(np.asarray(ndarray)))
+        for ndarray in ndarrays
+    ], norm
+
+
+def clipped_sum_per_example(
+    batch_ndarrays: NDArrays, max_norm: float
+) -> Tuple[NDArrays, np.ndarray]:
+    """Sum over the first axis of each array of values clipped per example, and the norm
+    of each example before clipping. The first axis of every array indexes the
+    examples of a batch, e.g., per-example gradients, and each example's values are
+    scaled so that their L2 norm over all arrays is at most max_norm."""
+    if not batch_ndarrays:
+        return [], np.zeros(0)
+    batch_size = len(batch_ndarrays[0])
+    squared_norms = np.zeros(batch_size)
+    for ndarray in batch_ndarrays:
+        if len(ndarray) != batch_size:
+            raise ValueError(
+                f"Expected {batch_size} examples like the first array, got "
+                f"{len(ndarray)}."
+            )
+        flat = np.reshape(ndarray, (batch_size, -1))
+        squared_norms += np.einsum("ij,ij->i", flat, flat)
+    norms = np.sqrt(squared_norms)
+    factors = max_norm / np.maximum(norms, max_norm)
+    return [
+        np.tensordot(factors.astype(_result_dtype(ndarray)), ndarray, axes=1)
+        for ndarray in map(np.asarray, batch_ndarrays)
+    ], norms
+
+
+def _split_like(flat: np.ndarray, ndarrays: NDArrays) -> List[np.ndarray]:
+    parts = []
+    offset = 0
+    for ndarray in ndarrays:
+        size = np.size(ndarray)
+        parts.append(flat[offset : offset + size].reshape(np.shape(ndarray)))
+        offset += size
+    return parts
+
+
+def add_gaussian_noise(
+    ndarrays: NDArrays, stddev: float, rng: Optional[np.random.Generator] = None
+) -> NDArrays:
+    """Arrays with Gaussian noise of standard deviation stddev added to every value.
+    The noise for all arrays is drawn at once, in float32 if all arrays are float32.
+    Non-float arrays are returned as float64."""
+    rng = np.random.default_rng() if rng is None else rng
+    size = sum(np.size(ndarray) for ndarray in ndarrays)
+    noise = rng.standard_normal(size, dtype=_float_dtype(ndarrays))
+    noise *= stddev
+    noisy = []
+    for ndarray, part in zip(ndarrays, _split_like(noise, ndarrays)):
+        # Add into the noise, which isn't needed afterwards
+        noisy.append(
+            np.add(ndarray, part, out=part)
+            if _result_dtype(np.asarray(ndarray)) == part.dtype
+            else np.add(ndarray, part, dtype=_result_dtype(np.asarray(ndarray)))
+        )
+    return noisy
+
+
+def discrete_gaussian(
+    size: int, sigma: float, rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
+    """Samples of the discrete Gaussian distribution over the integers with parameter
+    sigma, as int64, by rejection sampling from the discrete Laplace distribution in
+    batches (Canonne, Kamath, and Steinke, "The Discrete Gaussian for Differential
+    Privacy", 2020)."""
+    rng = np.random.default_rng() if rng is None else rng
+    samples = np.zeros(size, dtype=np.int64)
+    if sigma == 0 or size == 0:
+        return samples
+    scale = math.floor(sigma) + 1
+    success = -math.expm1(-1 / scale)
+    filled = 0
+    while filled < size:
+        # At least half of the candidates are accepted
+        num_candidates = 2 * (size - filled) + 16
+        # The difference of two geometric variables is discrete Laplace
+        candidates = rng.geometric(success, num_candidates) - rng.geometric(
+            success, num_candidates
+        )
+        log_accept = -((np.abs(candidates) - sigma**2 / scale) ** 2) / (2 * sigma**2)
+        accepted = candidates[np.log(rng.random(num_candidates)) < log_accept]
+        accepted = accepted[: size - filled]
+        samples[filled : filled + len(accepted)] = accepted
+        filled += len(accepted)
+    return samples
+
+
+def add_discrete_gaussian_noise(
+    ndarrays: NDArrays,
+    stddev: float,
+    granularity: float,
+    rng: Optional[np.random.Generator] = None,
+) -> NDArrays:
+    """Arrays rounded to multiples of granularity with discrete Gaussian noise of scale
+    stddev on the same grid added to every value. The noise for all arrays is drawn at
+    once."""
+    size = sum(np.size(ndarray) for ndarray in ndarrays)
+    noise = discrete_gaussian(size, stddev / granularity, rng)
+    noisy = []
+    for ndarray, part in zip(ndarrays, _split_like(noise, ndarrays)):
+        steps = np.rint(np.divide(ndarray, granularity)) + part
+        noisy.append(
+            np.multiply(steps, granularity).astype(
+                _result_dtype(np.asarray(ndarray)), copy=False
+            )
+        )
+    return noisy
+
+
+def gaussian_rdp(
+    noise_multiplier: float,
+    sampling_rate: float = 1.0,
+    orders: Sequence[int] = DEFAULT_ORDERS,
+) -> np.ndarray:
+    """Rényi differential privacy of one step of the Gaussian mechanism with noise
+    multiplier noise_multiplier (noise stddev over L2 sensitivity) at integer orders,
+    with Poisson subsampling at sampling_rate (Mironov, Talwar, and Zhang, "Rényi
+    Differential Privacy of the Sampled Gaussian Mechanism", 2019)."""
+    orders = np.asarray(orders)
+    if not 0 <= sampling_rate <= 1:
+        raise ValueError(f"Sampling rate must be between 0 and 1, got {sampling_rate}.")
+    if sampling_rate == 0:
+        return np.zeros(len(orders))
+    if noise_multiplier == 0:
+        return np.full(len(orders), np.inf)
+    variance = noise_multiplier**2
+    if sampling_rate == 1:
+        return orders / (2 * variance)
+    rdp = np.empty(len(orders))
+    for i, order in enumerate(orders):
+        k = np.arange(order + 1)
+        log_terms = (
+            gammaln(order + 1)
+            - gammaln(k + 1)
+            - gammaln(order - k + 1)
+            + k * math.log(sampling_rate)
+            + (order - k) * math.log1p(-sampling_rate)
+            + (k * k - k) / (2 * variance)
+        )
+        rdp[i] = logsumexp(log_terms) / (order - 1)
+    return rdp
+
+
+def rdp_to_epsilon(
+    rdp: np.ndarray, delta: float, orders: Sequence[int] = DEFAULT_ORDERS
+) -> float:
+    """Smallest epsilon of (epsilon, delta)-differential privacy implied by the Rényi
+    differential privacy rdp at orders (Canonne, Kamath, and Steinke, 2020)."""
+    orders = np.asarray(orders, dtype=np.float64)
+    epsilons = (
+        rdp + np.log1p(-1 / orders) - (math.log(delta) + np.log(orders)) / (orders - 1)
+    )
+    return max(float(np.min(epsilons)), 0.0)
+
+
+class PrivacyAccountant:
+    """Privacy spent over the rounds of a training run, as epsilon for a fixed delta.
+    Each round composes one or more steps of the (subsampled) Gaussian mechanism.
+
+    Attributes:
+        epsilons (List[float]): Epsilon spent after each recorded round.
+    """
+
+    def __init__(self, delta: float, orders: Sequence[int] = DEFAULT_ORDERS):
+        self.delta = delta
+        self.orders = tuple(orders)
+        self.rdp = np.zeros(len(self.orders))
+        self.epsilons: List[float] = []
+
+    @property
+    def epsilon(self) -> float:
+        """Epsilon spent so far."""
+        return self.epsilons[-1] if self.epsilons else 0.0
+
+    def step(
+        self, noise_multiplier: float, sampling_rate: float = 1.0, steps: int = 1
+    ) -> float:
+        """Record a round of steps releases with noise multiplier noise_multiplier,
+        e.g., the fraction of clients sampled with DP-FedAvg, or the local steps of
+        DP-SGD with the batch sampling rate. Returns the epsilon spent so far. Discrete
+        Gaussian noise is accounted like Gaussian noise with the same stddev."""
+        self.rdp = self.rdp + steps * gaussian_rdp(
+            noise_multiplier, sampling_rate, self.orders
+        )
+        self.epsilons.append(rdp_to_epsilon(self.rdp, self.delta, self.orders))
+        return self.epsilon
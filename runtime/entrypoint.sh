@@ -2,27 +2,13 @@
 
 set -euxo pipefail
 
-mon () {
-    date +%Y-%m-%dT%H:%M:%S
-    top -b -n 1 -w 512 -c -u ${2} | awk "NR==2 || / ${1}$/"
-    echo
-}
-
-export -f mon
-
 monitor () {
     setsid "$@" &
     PID=$!
 
-    MONITOR_INTERVAL=1
-
-    # monitor command and other processes in its process group
-    TERM=linux watch --interval $MONITOR_INTERVAL --precise -x bash -c "mon $PID appuser >> process_metrics.log" >/dev/null 2>&1 &
-    WATCH_PID=$!
-
-    # monitor system resources using sysstat's sar command
-    sar -o system_metrics.sar -ru $MONITOR_INTERVAL >/dev/null 2>&1 &
-    SYSSTAT_PID=$!
+    # sample memory and CPU usage of the system and of the command's session
+    ${CONDA_DIR}/envs/${CONDA_ENV}/bin/python resource_monitor.py --session $PID --output resource_metrics.bin &
+    MONITOR_PID=$!
 
     # monitor gpu usage
     if command -v nvidia-smi &> /dev/null
@@ -32,7 +18,8 @@ monitor () {
     fi
 
     wait $PID
-    kill -s TERM $WATCH_PID $SYSSTAT_PID || true
+    kill -s TERM $MONITOR_PID || true
+    wait $MONITOR_PID || true
 
     if [[ -v NVIDIASMI_PID ]]
        then
@@ -86,6 +73,7 @@ main () {
         echo "================ START CENTRALIZED TEST ================"
         monitor conda run --no-capture-output -n condaenv python main_centralized_test.py
         echo "================ END CENTRALIZED TEST ================"
+        rm -rf /code_execution/cache
     elif [ $submission_type = federated ]; then
         while read scenario; do
             echo "================ START FEDERATED TRAIN FOR $scenario ================"
@@ -94,14 +82,12 @@ main () {
             echo "================ START FEDERATED TEST FOR $scenario ================"
             monitor conda run --no-capture-output -n condaenv python main_federated_test.py /code_execution/data/$scenario/test/partitions.json
             echo "================ END FEDERATED TEST FOR $scenario ================"
+            # Data cache is shared by a scenario's stages only
+            rm -rf /code_execution/cache
         done </code_execution/data/scenarios.txt
     fi
 
-    gzip process_metrics.log
-    sadf system_metrics.sar -d -- -u | gzip > cpu_metrics.csv.gz
-    sadf system_metrics.sar -d -- -r | gzip > memory_metrics.csv.gz
-    gzip system_metrics.sar
-    mv process_metrics.log.gz cpu_metrics.csv.gz memory_metrics.csv.gz system_metrics.sar.gz submission
+    mv resource_metrics.bin submission
 
     if [[ -f gpu_metrics.log ]]; then
         gzip gpu_metrics.log
@@ -6,11 +6,12 @@ import flwr as fl
 
 from loguru import logger
 from supervisor import (
-    create_supervisor_logger,
     FederatedSupervisor,
+    flush_capture_writer,
     FederatedWrapperStrategy,
     wrap_train_client_factory,
 )
+from simulation import get_client_resources, start_simulation
 
 import src.solution_federated as solution_federated
 
@@ -34,12 +35,11 @@ if __name__ == "__main__":
     )
 
     supervisor = FederatedSupervisor(partition_config_path=Path(sys.argv[1]))
+    supervisor.start_log_collector()
 
     # Run optional train_setup function
     if hasattr(solution_federated, "train_setup"):
-        supervisor_logger, log_handler_id = create_supervisor_logger(
-            logger=logger, log_path=supervisor.supervisor_log_path
-        )
+        supervisor_logger = supervisor.get_supervisor_logger(logger)
         supervisor_logger.info(
             "train_setup found. Running...",
             cid="setup",
@@ -59,8 +59,6 @@ if __name__ == "__main__":
             method="train_setup",
             event="end",
         )
-        supervisor_logger.complete()
-        supervisor_logger.remove(log_handler_id)
 
     wrapped_client_factory = wrap_train_client_factory(
         solution_federated.train_client_factory, supervisor
@@ -73,16 +71,38 @@ if __name__ == "__main__":
     )
     server_config = fl.server.ServerConfig(num_rounds=num_rounds)
 
-    # Set CPUs more than half of available to prevent multiple clients from running
-    # concurrently. Only used for scheduling—will not limit actual CPU usage.
-    client_resources = {
-        "num_cpus": int(os.cpu_count() / 2) + 1,
-    }
-    if os.getenv("CPU_OR_GPU", "") == "gpu":
-        client_resources["num_gpus"] = 1
+    # With "serial" scheduling (default), each client declares more than half of the
+    # CPUs to prevent multiple clients from running concurrently. With "packed"
+    # scheduling, clients declare their resources with the optional client_resources
+    # function and run concurrently within the resource budget. Only used for
+    # scheduling—will not limit actual CPU or memory usage.
+    scheduling = os.getenv("SUPERVISOR_CLIENT_SCHEDULING", "serial")
+    client_resources = get_client_resources(
+        scheduling=scheduling,
+        clients_ids=supervisor.get_client_ids(),
+        client_resources_fn=getattr(solution_federated, "client_resources", None),
+    )
+    supervisor_logger = supervisor.get_supervisor_logger(logger)
+    for cid, resources in client_resources.items():
+        supervisor_logger.info(
+            f"Client scheduled with {scheduling} scheduling.",
+            cid=cid,
+            method="client_resources",
+            event="scheduled",
+            resources=resources,
+        )
+
+    # Backend "ray" runs clients in Ray workers. Backend "inprocess" runs clients in
+    # this process.
+    backend = os.getenv("SUPERVISOR_SIMULATION_BACKEND", "ray")
+    max_workers = os.getenv("SUPERVISOR_INPROCESS_MAX_WORKERS")
+    if max_workers is not None:
+        max_workers = int(max_workers)
 
     # start simulation
-    fl.simulation.start_simulation(
+    start_simulation(
+        backend=backend,
+        scheduling=scheduling,
         client_fn=wrapped_client_factory,
         clients_ids=supervisor.get_client_ids(),
         client_resources=client_resources,
@@ -92,4 +112,7 @@ if __name__ == "__main__":
             "ignore_reinit_error": True,
             "include_dashboard": False,
         },
+        max_workers=max_workers,
     )
+    flush_capture_writer()
+    supervisor.stop_log_collector()
@@ -0,0 +1,458 @@
+"""Zero-copy conversion between NumPy arrays and Flower Parameters, with optional
+lossless compression.
+
+flwr.common.ndarrays_to_parameters and parameters_to_ndarrays round-trip each array
+through np.save and np.load with an in-memory file, which copies the array data more
+than once on each end. The functions here produce and read the same tensor format,
+the .npy format with tensor_type "numpy.ndarray", so that they are interchangeable
+with Flower's functions, but each array's data is copied exactly once when encoding
+and not at all when decoding:
+
+    from parameters_codec import ndarrays_to_parameters, parameters_to_ndarrays
+
+    parameters = ndarrays_to_parameters([weights, bias])
+    weights, bias = parameters_to_ndarrays(parameters)
+
+Decoded arrays are read-only views of the tensor bytes, and keep the bytes alive for
+as long as they are referenced. Pass writable=True to get copies that can be modified
+in place. Tensors are plain bytes, so the supervisor captures and accounts for them
+like any other Parameters.
+
+Pass compression to ndarrays_to_parameters to compress each tensor with one of the
+lossless codecs in CODECS, e.g., compression="zlib", or with compression="auto" to
+pick the codec that gives the smallest tensor for each array. Compressed Parameters
+have tensor_type "numpy.ndarray+codec" and are decoded by parameters_to_ndarrays as
+usual. Each compressed tensor records the size of its uncompressed tensor, which the
+supervisor's capture manifest reports as raw_num_bytes next to num_bytes.
+"""
+
+import io
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+import zlib
+
+import flwr as fl
+from flwr.common.typing import (
+    EvaluateIns,
+    EvaluateRes,
+    FitIns,
+    FitRes,
+    GetParametersIns,
+    GetParametersRes,
+    GetPropertiesIns,
+    GetPropertiesRes,
+    Parameters,
+    Status,
+)
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+TENSOR_TYPE = "numpy.ndarray"
+COMPRESSED_TENSOR_TYPE = "numpy.ndarray+codec"
+
+# Compressed tensors start with a frame header: magic, codec name, and the size of the
+# uncompressed .npy tensor
+FRAME_MAGIC = b"\x93NPCODEC"
+FRAME_HEADER = struct.Struct("<8sB15sQ")
+
+NDArrays = List[np.ndarray]
+Buffers = Sequence[bytes]
+
+
+def npy_header(ndarray: np.ndarray) -> bytes:
+    """.npy format header of an array."""
+    if ndarray.dtype.hasobject:
+        raise ValueError("Arrays with Python objects can't be serialized.")
+    header_fp = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header_fp, np.lib.format.header_data_from_array_1_0(ndarray)
+    )
+    return header_fp.getvalue()
+
+
+def npy_data(ndarray: np.ndarray) -> np.ndarray:
+    """Bytes of an array's data in the order of its .npy header."""
+    # ravel with order="A" matches the header's fortran_order and is a view of
+    # contiguous arrays
+    return ndarray.ravel(order="A").view(np.uint8)
+
+
+def read_npy_header(buffer: memoryview) -> Tuple[tuple, bool, np.dtype, int]:
+    """Shape, fortran_order, and dtype of the .npy data in buffer, and the offset of
+    the array data. Only the header is copied."""
+    magic_len = np.lib.format.MAGIC_LEN
+    prefix = bytes(buffer[: magic_len + 4])
+    version = np.lib.format.read_magic(io.BytesIO(prefix))
+    length_size = 2 if version == (1, 0) else 4
+    header_len = int.from_bytes(prefix[magic_len : magic_len + length_size], "little")
+    data_offset = magic_len + length_size + header_len
+    fp = io.BytesIO(bytes(buffer[:data_offset]))
+    np.lib.format.read_magic(fp)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+    if dtype.hasobject:
+        raise ValueError("Arrays with Python objects can't be deserialized.")
+    return shape, fortran_order, dtype, data_offset
+
+
+def _ndarray_from_buffer(buffer: memoryview, writable: bool) -> np.ndarray:
+    shape, fortran_order, dtype, data_offset = read_npy_header(buffer)
+    ndarray = np.frombuffer(
+        buffer, dtype=dtype, count=int(np.prod(shape)), offset=data_offset
+    ).reshape(shape, order="F" if fortran_order else "C")
+    return ndarray.copy(order="K") if writable else ndarray
+
+
+def ndarray_to_bytes(ndarray: np.ndarray) -> bytes:
+    """Serialize an array in .npy format with a single copy of its data. C- and
+    Fortran-contiguous arrays are written in their memory order."""
+    ndarray = np.asanyarray(ndarray)
+    return b"".join([npy_header(ndarray), npy_data(ndarray)])
+
+
+def bytes_to_ndarray(tensor: bytes, writable: bool = False) -> np.ndarray:
+    """Deserialize an array in .npy format. The array is a read-only view of tensor
+    unless writable is True."""
+    return _ndarray_from_buffer(memoryview(tensor), writable=writable)
+
+
+class Codec:
+    """Lossless encoding of an array as a sequence of buffers, which are joined into
+    the tensor after the frame header."""
+
+    name = ""
+
+    def accepts(self, ndarray: np.ndarray) -> bool:
+        return True
+
+    def encode(self, ndarray: np.ndarray) -> Buffers:
+        raise NotImplementedError
+
+    def decode(self, payload: memoryview) -> np.ndarray:
+        raise NotImplementedError
+
+
+class NoneCodec(Codec):
+    """Uncompressed .npy tensor."""
+
+    name = "none"
+
+    def encode(self, ndarray: np.ndarray) -> Buffers:
+        return [npy_header(ndarray), npy_data(ndarray)]
+
+    def decode(self, payload: memoryview) -> np.ndarray:
+        return _ndarray_from_buffer(payload, writable=False)
+
+
+class StreamCodec(Codec):
+    """.npy tensor compressed with a general-purpose streaming compressor. The array
+    data is compressed in place, without first copying it into a .npy tensor."""
+
+    def compressobj(self):
+        raise NotImplementedError
+
+    def decompress(self, payload: memoryview) -> bytes:
+        raise NotImplementedError
+
+    def encode(self, ndarray: np.ndarray) -> Buffers:
+        compressor = self.compressobj()
+        return [
+            compressor.compress(npy_header(ndarray)),
+            compressor.compress(npy_data(ndarray)),
+            compressor.flush(),
+        ]
+
+    def decode(self, payload: memoryview) -> np.ndarray:
+        return bytes_to_ndarray(self.decompress(payload))
+
+
+class ZlibCodec(StreamCodec):
+    name = "zlib"
+
+    def __init__(self, level: int = 1):
+        self.level = level
+
+    def compressobj(self):
+        return zlib.compressobj(self.level)
+
+    def decompress(self, payload: memoryview) -> bytes:
+        return zlib.decompress(payload)
+
+
+class ZstdCodec(StreamCodec):
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        self.level = level
+
+    def compressobj(self):
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def decompress(self, payload: memoryview) -> bytes:
+        # Streamed frames don't record their content size, so decompress as a stream
+        return zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+
+
+class Lz4Codec(StreamCodec):
+    name = "lz4"
+
+    def compressobj(self):
+        return _Lz4Compressor()
+
+    def decompress(self, payload: memoryview) -> bytes:
+        return lz4.frame.decompress(payload)
+
+
+class _Lz4Compressor:
+    """zlib-style compressobj interface for an LZ4 frame."""
+
+    def __init__(self):
+        self.compressor = lz4.frame.LZ4FrameCompressor()
+        self.started = False
+
+    def compress(self, data) -> bytes:
+        chunks = []
+        if not self.started:
+            chunks.append(self.compressor.begin())
+            self.started = True
+        chunks.append(self.compressor.compress(data))
+        return b"".join(chunks)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+
+def varint_encode(values: np.ndarray) -> np.ndarray:
+    """LEB128 encoding of uint64 values, 7 bits per byte with the high bit set on all
+    but the last byte of each value."""
+    num_bytes = np.ones(len(values), dtype=np.int64)
+    remaining = values >> np.uint64(7)
+    while remaining.any():
+        num_bytes += remaining > 0
+        remaining >>= np.uint64(7)
+    ends = np.cumsum(num_bytes)
+    starts = ends - num_bytes
+    encoded = np.empty(ends[-1] if len(ends) else 0, dtype=np.uint8)
+    shifted = values.copy()
+    for k in range(int(num_bytes.max(initial=0))):
+        has_byte = num_bytes > k
+        groups = (shifted[has_byte] & np.uint64(0x7F)).astype(np.uint8)
+        groups[num_bytes[has_byte] > k + 1] |= 0x80
+        encoded[starts[has_byte] + k] = groups
+        shifted >>= np.uint64(7)
+    return encoded
+
+
+def varint_decode(encoded: np.ndarray) -> np.ndarray:
+    if len(encoded) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    is_last = encoded < 0x80
+    if not is_last[-1]:
+        raise ValueError("Truncated varint data.")
+    ends = np.flatnonzero(is_last)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    groups = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = (7 * (np.arange(len(encoded)) - starts[groups])).astype(np.uint64)
+    # Groups of 7 bits don't overlap, so adding them is the same as or-ing them
+    return np.add.reduceat((encoded & 0x7F).astype(np.uint64) << shifts, starts)
+
+
+class DeltaVarintCodec(Codec):
+    """Integer array stored as the differences between consecutive values, in memory
+    order, zigzag- and varint-encoded after the .npy header. Sorted arrays and arrays
+    of small values take one or two bytes per value."""
+
+    name = "delta-varint"
+
+    def accepts(self, ndarray: np.ndarray) -> bool:
+        return ndarray.dtype.kind in "iu"
+
+    def encode(self, ndarray: np.ndarray) -> Buffers:
+        # Differences wrap around in int64, and so does the cumulative sum that
+        # decodes them
+        values = ndarray.ravel(order="A").astype(np.int64)
+        deltas = np.diff(values, prepend=np.int64(0))
+        zigzag = (deltas << 1) ^ (deltas >> 63)
+        return [npy_header(ndarray), varint_encode(zigzag.view(np.uint64))]
+
+    def decode(self, payload: memoryview) -> np.ndarray:
+        shape, fortran_order, dtype, data_offset = read_npy_header(payload)
+        zigzag = varint_decode(np.frombuffer(payload, np.uint8, offset=data_offset))
+        deltas = (zigzag >> np.uint64(1)) ^ (np.uint64(0) - (zigzag & np.uint64(1)))
+        values = np.cumsum(deltas.view(np.int64))
+        if len(values) != int(np.prod(shape)):
+            raise ValueError("Varint data doesn't match the array's shape.")
+        return values.astype(dtype).reshape(shape, order="F" if fortran_order else "C")
+
+
+CODECS: Dict[str, Codec] = {
+    codec.name: codec
+    for codec in [NoneCodec(), ZlibCodec(), DeltaVarintCodec()]
+    + ([ZstdCodec()] if zstandard is not None else [])
+    + ([Lz4Codec()] if lz4 is not None else [])
+}
+
+
+def frame_tensor(codec: Codec, raw_size: int, buffers: Buffers) -> bytes:
+    """Compressed tensor of a codec's encoded buffers."""
+    header = FRAME_HEADER.pack(
+        FRAME_MAGIC, len(codec.name), codec.name.encode(), raw_size
+    )
+    return b"".join([header, *buffers])
+
+
+def npy_size(ndarray: np.ndarray) -> int:
+    """Size of an array's uncompressed tensor."""
+    return len(npy_header(ndarray)) + ndarray.nbytes
+
+
+def compress_ndarray(ndarray: np.ndarray, compression: str) -> bytes:
+    """Encode an array as a compressed tensor. With compression "auto", every codec
+    that accepts the array is tried and the smallest tensor is kept."""
+    ndarray = np.asanyarray(ndarray)
+    raw_size = npy_size(ndarray)
+    if compression == "auto":
+        candidates = [
+            codec
+            for name, codec in CODECS.items()
+            if name != NoneCodec.name and codec.accepts(ndarray)
+        ]
+        best_codec, best_buffers = CODECS[NoneCodec.name], None
+        best_size = raw_size
+        for codec in candidates:
+            buffers = codec.encode(ndarray)
+            size = sum(memoryview(buffer).nbytes for buffer in buffers)
+            if size < best_size:
+                best_codec, best_buffers, best_size = codec, buffers, size
+        if best_buffers is None:
+            best_buffers = best_codec.encode(ndarray)
+        return frame_tensor(best_codec, raw_size, best_buffers)
+    if compression not in CODECS:
+        raise ValueError(
+            f"Unknown or unavailable compression {compression}. Available "
+            f"compressions are 'auto' and {', '.join(map(repr, CODECS))}."
+        )
+    codec = CODECS[compression]
+    if not codec.accepts(ndarray):
+        raise ValueError(
+            f"Compression {compression} doesn't accept arrays of dtype {ndarray.dtype}."
+        )
+    return frame_tensor(codec, raw_size, codec.encode(ndarray))
+
+
+def read_frame(tensor: bytes) -> Tuple[str, int, memoryview]:
+    """Codec name, uncompressed size, and encoded payload of a compressed tensor."""
+    buffer = memoryview(tensor)
+    if len(buffer) < FRAME_HEADER.size:
+        raise ValueError("Tensor is too short to be a compressed tensor.")
+    magic, name_len, name, raw_size = FRAME_HEADER.unpack(buffer[: FRAME_HEADER.size])
+    if magic != FRAME_MAGIC:
+        raise ValueError("Tensor is not a compressed tensor.")
+    return name[:name_len].decode(), raw_size, buffer[FRAME_HEADER.size :]
+
+
+def decompress_ndarray(tensor: bytes, writable: bool = False) -> np.ndarray:
+    """Decode a compressed tensor. The array is read-only unless writable is True."""
+    name, _, payload = read_frame(tensor)
+    if name not in CODECS:
+        raise ValueError(f"Tensor is compressed with unavailable compression {name}.")
+    ndarray = CODECS[name].decode(payload)
+    if writable and not ndarray.flags.writeable:
+        ndarray = ndarray.copy(order="K")
+    return ndarray
+
+
+def raw_tensor_sizes(parameters: Parameters) -> List[int]:
+    """Size of each of the parameters' tensors before compression."""
+    if parameters.tensor_type != COMPRESSED_TENSOR_TYPE:
+        return [len(tensor) for tensor in parameters.tensors]
+    return [read_frame(tensor)[1] for tensor in parameters.tensors]
+
+
+def ndarrays_to_parameters(
+    ndarrays: NDArrays, compression: Optional[str] = None
+) -> Parameters:
+    """Convert NumPy arrays to Parameters, optionally compressing each tensor."""
+    if compression is None:
+        tensors = [ndarray_to_bytes(ndarray) for ndarray in ndarrays]
+        return Parameters(tensors=tensors, tensor_type=TENSOR_TYPE)
+    tensors = [compress_ndarray(ndarray, compression) for ndarray in ndarrays]
+    return Parameters(tensors=tensors, tensor_type=COMPRESSED_TENSOR_TYPE)
+
+
+def parameters_to_ndarrays(parameters: Parameters, writable: bool = False) -> NDArrays:
+    """Convert Parameters, compressed or not, to NumPy arrays, which are read-only
+    unless writable is True. Uncompressed arrays are views of the tensors."""
+    if parameters.tensor_type == COMPRESSED_TENSOR_TYPE:
+        return [
+            decompress_ndarray(tensor, writable=writable)
+            for tensor in parameters.tensors
+        ]
+    return [
+        bytes_to_ndarray(tensor, writable=writable) for tensor in parameters.tensors
+    ]
+
+
+class NumPyClientAdapter(fl.client.Client):
+    """Flower client that runs a NumPyClient with the zero-copy conversions instead of
+    Flower's. Return it from a client factory in place of the NumPyClient:
+
+        return NumPyClientAdapter(MyNumPyClient(...))
+
+    The NumPyClient receives read-only arrays unless writable is True. Parameters that
+    it returns are compressed with compression, if given.
+    """
+
+    def __init__(
+        self,
+        numpy_client: fl.client.NumPyClient,
+        writable: bool = False,
+        compression: Optional[str] = None,
+    ):
+        self.numpy_client = numpy_client
+        self.writable = writable
+        self.compression = compression
+
+    def _ok(self) -> Status:
+        return Status(code=fl.common.Code.OK, message="Success")
+
+    def get_properties(self, ins: GetPropertiesIns) -> GetPropertiesRes:
+        properties = self.numpy_client.get_properties(config=ins.config)
+        return GetPropertiesRes(status=self._ok(), properties=properties)
+
+    def get_parameters(self, ins: GetParametersIns) -> GetParametersRes:
+        parameters = self.numpy_client.get_parameters(config=ins.config)
+        return GetParametersRes(
+            status=self._ok(),
+            parameters=ndarrays_to_parameters(parameters, self.compression),
+        )
+
+    def fit(self, ins: FitIns) -> FitRes:
+        parameters = parameters_to_ndarrays(ins.parameters, writable=self.writable)
+        parameters_prime, num_examples, metrics = self.numpy_client.fit(
+            parameters, ins.config
+        )
+        return FitRes(
+            status=self._ok(),
+            parameters=ndarrays_to_parameters(parameters_prime, self.compression),
+            num_examples=num_examples,
+            metrics=metrics,
+        )
+
+    def evaluate(self, ins: EvaluateIns) -> EvaluateRes:
+        parameters = parameters_to_ndarrays(ins.parameters, writable=self.writable)
+        loss, num_examples, metrics = self.numpy_client.evaluate(parameters, ins.config)
+        return EvaluateRes(
+            status=self._ok(), loss=loss, num_examples=num_examples, metrics=metrics
+        )
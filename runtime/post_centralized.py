@@ -5,19 +5,18 @@ import shutil
 from loguru import logger
 import pandas as pd
 
+from resource_monitor import peak_committed_memory_kb
 from supervisor import CentralizedSupervisor
 
 
 INPUT_FILE = Path("/code_execution/submission/predictions/centralized/predictions.csv")
 OUTPUT_FILE = Path("/code_execution/submission/scoring_payload/predictions.csv")
+RESOURCE_METRICS_PATH = Path("/code_execution/submission/resource_metrics.bin")
 
 if __name__ == "__main__":
     # Initialize metrics dict
     metrics = {}
 
-    # Load memory data
-    mem_df = pd.read_csv("submission/memory_metrics.csv.gz", delimiter=";")
-
     logger.info(f"Performing post-run for centralized...")
     train_supervisor = CentralizedSupervisor("train", root_logger=logger)
 
@@ -28,7 +27,9 @@ if __name__ == "__main__":
     timestamps = pd.to_datetime(logs_df["timestamp"])
     start, end = timestamps.min().tz_localize("utc"), timestamps.max().tz_localize("utc")
     duration = (end-start).total_seconds()
-    peak_mem = mem_df[pd.to_datetime(mem_df["timestamp"]).between(start, end)]["kbcommit"].max()
+    peak_mem = peak_committed_memory_kb(
+        RESOURCE_METRICS_PATH, start.timestamp(), end.timestamp()
+    )
     metrics[f"total_training_time_centralized"] = float(duration)
     metrics[f"peak_training_memory_kb_centralized"] = float(peak_mem)
 
@@ -5,11 +5,52 @@ import tarfile
 from loguru import logger
 import pandas as pd
 
+from resource_monitor import (
+    load_resource_metrics,
+    load_supervisor_calls,
+    peak_committed_memory_kb,
+    tag_resource_metrics,
+)
 from supervisor import FederatedSupervisor
+from trace_export import export_trace
 
 
 OUTPUT_DIR = Path("/code_execution/submission/scoring_payload/")
 OUTPUT_TAR = Path("/code_execution/submission/scoring_payload.tar.gz")
+RESOURCE_METRICS_PATH = Path("/code_execution/submission/resource_metrics.bin")
+
+
+def summarize_calls(calls_df: pd.DataFrame) -> dict:
+    """Breakdown of supervised calls by client and method, with wall time by round.
+    Measurements that weren't recorded for every call of a method are left out, e.g.,
+    CPU time and peak RSS when calls ran concurrently in the same process."""
+    aggregations = {
+        "wall_time": "sum",
+        "user_cpu_time": "sum",
+        "system_cpu_time": "sum",
+        "peak_rss_delta_kb": "max",
+        "request_bytes": "sum",
+        "response_bytes": "sum",
+    }
+    summary = {}
+    for (cid, method), group in calls_df.groupby(["cid", "method"], sort=False):
+        method_summary = {"num_calls": int(group.shape[0])}
+        for field, aggregation in aggregations.items():
+            values = group[field].dropna()
+            if len(values) == len(group):
+                name = "max_" + field if aggregation == "max" else field
+                method_summary[name] = float(values.agg(aggregation))
+        rounds = group.dropna(subset=["round", "wall_time"])
+        if not rounds.empty:
+            method_summary["wall_time_by_round"] = {
+                str(int(server_round)): float(wall_time)
+                for server_round, wall_time in rounds.groupby("round")[
+                    "wall_time"
+                ].sum().items()
+            }
+        summary.setdefault(cid, {})[method] = method_summary
+    return summary
+
 
 if __name__ == "__main__":
     OUTPUT_DIR.mkdir(exist_ok=True)
@@ -17,9 +58,6 @@ if __name__ == "__main__":
     # Initialize metrics dict
     metrics = {}
 
-    # Load memory data
-    mem_df = pd.read_csv("submission/memory_metrics.csv.gz", delimiter=";")
-
     with Path("/code_execution/data/scenarios.txt").open("r") as fp:
         scenarios = [line.strip() for line in fp if line.strip()]
     for scenario in scenarios:
@@ -44,19 +82,69 @@ if __name__ == "__main__":
         timestamps = pd.to_datetime(logs_df["timestamp"])
         start, end = timestamps.min().tz_localize("utc"), timestamps.max().tz_localize("utc")
         duration = (end-start).total_seconds()
-        peak_mem = mem_df[pd.to_datetime(mem_df["timestamp"]).between(start, end)]["kbcommit"].max()
+        peak_mem = peak_committed_memory_kb(
+            RESOURCE_METRICS_PATH, start.timestamp(), end.timestamp()
+        )
         metrics[f"total_training_time_{scenario}"] = float(duration)
         metrics[f"peak_training_memory_kb_{scenario}"] = float(peak_mem)
 
+        # Breakdown of training time by client, method, and round
+        train_calls_df = load_supervisor_calls(train_supervisor.supervisor_log_path)
+        metrics[f"training_call_breakdown_{scenario}"] = summarize_calls(
+            train_calls_df
+        )
+
+        # Tag resource samples with the client, method, and round that were active
+        resource_metrics_df = load_resource_metrics(RESOURCE_METRICS_PATH)
+        for supervisor in [train_supervisor, test_supervisor]:
+            log_path = supervisor.supervisor_log_path
+            calls_df = load_supervisor_calls(log_path)
+            tagged_df = tag_resource_metrics(resource_metrics_df, calls_df)
+            tagged_df = tagged_df[
+                tagged_df["timestamp"].between(
+                    calls_df["start"].min(), calls_df["end"].max()
+                )
+            ]
+            tagged_df.to_csv(
+                log_path.with_name(f"{log_path.stem}-resource_metrics.csv.gz"),
+                index=False,
+            )
+
+        # Export Chrome traces of the federated runs
+        logger.info(f"Exporting traces for {scenario}...")
+        for supervisor in [train_supervisor, test_supervisor]:
+            log_path = supervisor.supervisor_log_path
+            export_trace(
+                log_path,
+                log_path.with_name(f"{log_path.stem}-trace.json"),
+                manifest_path=supervisor.get_captured_manifest_path(),
+            )
+
         # Calculate network overheard metrics
         logger.info(f"Aggregating network overheard metrics for {scenario}...")
-        num_files = 0
-        total_disk = 0.0
-        for captured_file in train_supervisor.base_captured_dir.glob("*.pb"):
-            num_files += 1
-            total_disk += captured_file.stat().st_size / 1024.0
+        manifest_path = train_supervisor.get_captured_manifest_path()
+        if manifest_path.exists():
+            # Manifest has the serialized size of every captured message, including
+            # those not written to disk in accounting mode. Messages that map to the
+            # same file name overwrite each other on disk, so keep only the last.
+            manifest_df = pd.read_json(manifest_path, lines=True).drop_duplicates(
+                "path", keep="last"
+            )
+            num_files = manifest_df.shape[0]
+            total_disk = float((manifest_df["num_bytes"] / 1024.0).sum())
+            # Volume if compressed Parameters had been sent uncompressed
+            raw_num_bytes = manifest_df.get("raw_num_bytes", manifest_df["num_bytes"])
+            total_raw = float((raw_num_bytes / 1024.0).sum())
+        else:
+            num_files = 0
+            total_disk = 0.0
+            for captured_file in train_supervisor.base_captured_dir.glob("*.pb"):
+                num_files += 1
+                total_disk += captured_file.stat().st_size / 1024.0
+            total_raw = total_disk
         metrics[f"network_file_volume_{scenario}"] = num_files
         metrics[f"network_disk_volume_{scenario}"] = total_disk
+        metrics[f"network_raw_volume_{scenario}"] = total_raw
 
     logger.info(f"Metrics summary:\n{json.dumps(metrics, indent=2)}")
     with Path("submission/metrics.json").open("w") as fp:
@@ -0,0 +1,287 @@
+"""Lightweight resource sampler for submission runs.
+
+Samples system, cgroup, and process-session resource usage from /proc and
+/sys/fs/cgroup at a fixed interval, without forking any processes, and appends
+fixed-size binary records to a file. Run it alongside the monitored command:
+
+    python resource_monitor.py --session PID --output resource_metrics.bin
+
+and stop it with SIGTERM or SIGINT. Use load_resource_metrics to read the records
+into a DataFrame, and tag_resource_metrics to tag samples with the client, method, and
+round that were active according to the supervisor log.
+"""
+
+import argparse
+import os
+from pathlib import Path
+import signal
+import struct
+import threading
+import time
+from typing import Dict, Tuple
+
+MAGIC = b"SUPMON01"
+
+# Fields of each sample record, in order, with their struct format characters
+RECORD_FIELDS = (
+    ("timestamp", "d"),  # Unix time in seconds
+    ("mem_total_kb", "Q"),  # MemTotal from /proc/meminfo
+    ("mem_used_kb", "Q"),  # MemTotal - MemAvailable
+    ("committed_as_kb", "Q"),  # Committed_AS from /proc/meminfo, same as sar's kbcommit
+    ("cgroup_memory_bytes", "Q"),  # Memory usage of the container's cgroup
+    ("session_rss_kb", "Q"),  # Total RSS of processes in the monitored session
+    ("session_cpu_seconds", "d"),  # Total user + system CPU time of those processes
+    ("session_num_procs", "I"),  # Number of processes in the monitored session
+    ("system_cpu_busy", "d"),  # Fraction of all CPUs busy since the previous sample
+)
+RECORD = struct.Struct("<" + "".join(fmt for _, fmt in RECORD_FIELDS))
+NUMPY_FORMATS = {"d": "<f8", "Q": "<u8", "I": "<u4"}
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+CGROUP_MEMORY_PATHS = (
+    Path("/sys/fs/cgroup/memory.current"),  # cgroup v2
+    Path("/sys/fs/cgroup/memory/memory.usage_in_bytes"),  # cgroup v1
+)
+
+
+def read_meminfo() -> Dict[str, int]:
+    meminfo = {}
+    with open("/proc/meminfo", "r") as fp:
+        for line in fp:
+            key, value = line.split(":", 1)
+            meminfo[key] = int(value.split()[0])
+    return meminfo
+
+
+def read_cgroup_memory() -> int:
+    for path in CGROUP_MEMORY_PATHS:
+        try:
+            return int(path.read_text())
+        except (OSError, ValueError):
+            continue
+    return 0
+
+
+def read_cpu_times() -> Tuple[int, int]:
+    """Total and busy jiffies of all CPUs, from /proc/stat."""
+    with open("/proc/stat", "r") as fp:
+        values = [int(v) for v in fp.readline().split()[1:]]
+    idle = values[3] + values[4]  # idle + iowait
+    total = sum(values[:8])  # guest time is already included in user and nice
+    return total, total - idle
+
+
+def read_session_usage(session_id: int) -> Tuple[int, float, int]:
+    """Total RSS in kB, total CPU seconds, and number of processes in the session."""
+    rss_kb = 0
+    cpu_ticks = 0
+    num_procs = 0
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as fp:
+                stat = fp.read()
+        except OSError:
+            # Process exited
+            continue
+        # The command name is in parentheses and may contain spaces
+        fields = stat[stat.rindex(b")") + 2 :].split()
+        if int(fields[3]) != session_id:
+            continue
+        num_procs += 1
+        cpu_ticks += int(fields[11]) + int(fields[12])  # utime + stime
+        rss_kb += int(fields[21]) * PAGE_SIZE_KB
+    return rss_kb, cpu_ticks / CLOCK_TICKS, num_procs
+
+
+class ResourceMonitor:
+    """Samples resource usage every interval seconds and appends records to
+    output_path. Records are flushed to disk about once per second."""
+
+    def __init__(self, output_path: Path, session_id: int, interval: float = 0.1):
+        self.output_path = Path(output_path)
+        self.session_id = session_id
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def sample(self, previous_cpu: Tuple[int, int]) -> Tuple[bytes, Tuple[int, int]]:
+        meminfo = read_meminfo()
+        cpu = read_cpu_times()
+        total_delta = cpu[0] - previous_cpu[0]
+        busy = (cpu[1] - previous_cpu[1]) / total_delta if total_delta > 0 else 0.0
+        rss_kb, cpu_seconds, num_procs = read_session_usage(self.session_id)
+        record = RECORD.pack(
+            time.time(),
+            meminfo["MemTotal"],
+            meminfo["MemTotal"] - meminfo.get("MemAvailable", meminfo["MemFree"]),
+            meminfo["Committed_AS"],
+            read_cgroup_memory(),
+            rss_kb,
+            cpu_seconds,
+            num_procs,
+            busy,
+        )
+        return record, cpu
+
+    def run(self):
+        is_new = not self.output_path.exists() or self.output_path.stat().st_size == 0
+        with self.output_path.open("ab") as fp:
+            if is_new:
+                fp.write(MAGIC)
+            cpu = read_cpu_times()
+            last_flush = time.monotonic()
+            next_sample = time.monotonic()
+            while not self.stop_event.is_set():
+                record, cpu = self.sample(cpu)
+                fp.write(record)
+                now = time.monotonic()
+                if now - last_flush >= 1.0:
+                    fp.flush()
+                    last_flush = now
+                # Sample on a fixed schedule, skipping samples if we fall behind
+                next_sample += self.interval
+                if next_sample < now:
+                    next_sample = now + self.interval
+                self.stop_event.wait(next_sample - now)
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+
+def load_resource_metrics(path: Path):
+    """Load resource metrics records into a pandas DataFrame."""
+    import numpy as np
+    import pandas as pd
+
+    dtype = np.dtype([(name, NUMPY_FORMATS[fmt]) for name, fmt in RECORD_FIELDS])
+    raw = Path(path).read_bytes()
+    if not raw.startswith(MAGIC):
+        raise ValueError(f"{path} is not a resource metrics file")
+    body = raw[len(MAGIC) :]
+    # Ignore a partially written last record
+    num_records = len(body) // RECORD.size
+    records = np.frombuffer(body, dtype=dtype, count=num_records)
+    return pd.DataFrame.from_records(records)
+
+
+# Per-call measurements in the end records of the supervisor log
+CALL_METRIC_FIELDS = (
+    "wall_time",
+    "user_cpu_time",
+    "system_cpu_time",
+    "peak_rss_delta_kb",
+    "request_bytes",
+    "response_bytes",
+)
+
+
+def load_supervisor_calls(log_path: Path):
+    """Intervals of client and strategy method calls from a supervisor log, with the
+    server round that each call belongs to and the call's measurements."""
+    import pandas as pd
+
+    # Client IDs like "0" would otherwise be parsed as numbers
+    logs_df = pd.read_json(
+        log_path, lines=True, convert_dates=False, dtype={"cid": str}
+    )
+    for column in ("round",) + CALL_METRIC_FIELDS:
+        if column not in logs_df:
+            logs_df[column] = None
+    logs_df = logs_df[logs_df["event"].isin(["start", "end"])].sort_values(
+        "timestamp", kind="stable"
+    )
+    calls = []
+    open_calls = {}
+    current_round = None
+    for record in logs_df.itertuples(index=False):
+        if record.cid == "server" and pd.notna(record.round):
+            current_round = int(record.round)
+        key = (record.cid, record.method)
+        if record.event == "start":
+            open_calls[key] = (record.timestamp, current_round)
+        elif key in open_calls:
+            start, call_round = open_calls.pop(key)
+            calls.append(
+                {
+                    "cid": record.cid,
+                    "method": record.method,
+                    "round": call_round,
+                    "start": start,
+                    "end": record.timestamp,
+                    **{field: getattr(record, field) for field in CALL_METRIC_FIELDS},
+                }
+            )
+    return pd.DataFrame(
+        calls, columns=["cid", "method", "round", "start", "end", *CALL_METRIC_FIELDS]
+    )
+
+
+def tag_resource_metrics(metrics_df, calls_df):
+    """Tag each resource sample with the cid, method, and round of the active call. If
+    several calls are active at once, a client call takes precedence over a strategy
+    call and the most recently started call takes precedence otherwise."""
+    import numpy as np
+
+    metrics_df = metrics_df.copy()
+    timestamps = metrics_df["timestamp"].to_numpy()
+    cids = np.full(len(metrics_df), None, dtype=object)
+    methods = np.full(len(metrics_df), None, dtype=object)
+    rounds = np.full(len(metrics_df), np.nan)
+    ordered = calls_df.assign(is_client=calls_df["cid"] != "server").sort_values(
+        ["is_client", "start"], kind="stable"
+    )
+    for call in ordered.itertuples(index=False):
+        lo = np.searchsorted(timestamps, call.start, side="left")
+        hi = np.searchsorted(timestamps, call.end, side="right")
+        cids[lo:hi] = call.cid
+        methods[lo:hi] = call.method
+        rounds[lo:hi] = np.nan if call.round is None else call.round
+    metrics_df["cid"] = cids
+    metrics_df["method"] = methods
+    metrics_df["round"] = rounds
+    return metrics_df
+
+
+def peak_committed_memory_kb(metrics_path: Path, start: float, end: float) -> float:
+    """Peak committed memory (kbcommit) between the start and end Unix timestamps,
+    including the samples just before start and just after end so that windows shorter
+    than the sampling interval still get a value. NaN if there are no samples."""
+    import numpy as np
+
+    metrics_df = load_resource_metrics(metrics_path).sort_values("timestamp")
+    timestamps = metrics_df["timestamp"].to_numpy()
+    lo = max(np.searchsorted(timestamps, start, side="right") - 1, 0)
+    hi = np.searchsorted(timestamps, end, side="left") + 1
+    return float(metrics_df["committed_as_kb"].iloc[lo:hi].max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--session",
+        type=int,
+        required=True,
+        help="Session ID of the monitored processes, e.g., the PID of a setsid command",
+    )
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=float(os.environ.get("SUPERVISOR_MONITOR_INTERVAL", 0.1)),
+        help="Sampling interval in seconds",
+    )
+    args = parser.parse_args()
+
+    monitor = ResourceMonitor(
+        output_path=args.output, session_id=args.session, interval=args.interval
+    )
+    signal.signal(signal.SIGTERM, monitor.stop)
+    signal.signal(signal.SIGINT, monitor.stop)
+    monitor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import concurrent.futures
+from contextlib import contextmanager
+from logging import DEBUG, INFO
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import flwr as fl
+from flwr.client.client import (
+    maybe_call_evaluate,
+    maybe_call_fit,
+    maybe_call_get_parameters,
+    maybe_call_get_properties,
+)
+from flwr.common import Code
+from flwr.common.logger import log
+from flwr.common.typing import (
+    DisconnectRes,
+    EvaluateIns,
+    EvaluateRes,
+    FitIns,
+    FitRes,
+    GetParametersIns,
+    GetParametersRes,
+    GetPropertiesIns,
+    GetPropertiesRes,
+    Parameters,
+    ReconnectIns,
+)
+from flwr.server.app import _fl, _init_defaults
+from flwr.server.client_manager import SimpleClientManager
+from flwr.server.client_proxy import ClientProxy
+from flwr.server.history import History
+from flwr.server.server import fit_client
+
+SIMULATION_BACKENDS = ("ray", "inprocess")
+CLIENT_SCHEDULING_MODES = ("serial", "packed")
+CLIENT_RESOURCE_KEYS = ("num_cpus", "num_gpus", "memory")
+
+# Ray custom resource used to schedule clients within the memory budget. Declared in
+# megabytes because Ray stores resource quantities with limited precision.
+RAY_MEMORY_RESOURCE = "client_memory_mb"
+
+
+def get_resource_budget() -> Dict[str, float]:
+    """Total resources that concurrently running clients may declare. CPUs default to
+    all CPUs of the machine and memory defaults to its total physical memory. GPUs are
+    only part of the budget when running on GPU."""
+    budget = {
+        "num_cpus": float(os.getenv("SUPERVISOR_CPU_BUDGET", os.cpu_count())),
+        "memory": float(
+            os.getenv(
+                "SUPERVISOR_MEMORY_BUDGET_BYTES",
+                os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"),
+            )
+        ),
+    }
+    if os.getenv("CPU_OR_GPU", "") == "gpu":
+        budget["num_gpus"] = float(os.getenv("SUPERVISOR_GPU_BUDGET", 1))
+    return budget
+
+
+def get_client_resources(
+    scheduling: str,
+    clients_ids: List[str],
+    client_resources_fn: Optional[Callable[[str], Dict[str, float]]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Resources declared by each client, keyed by client ID.
+
+    With "serial" scheduling, every client declares more than half of the CPUs so that
+    only one client runs at a time. With "packed" scheduling, every client declares one
+    CPU unless the solution's optional client_resources(cid) function declares
+    otherwise, and clients run concurrently as long as the sum of their declared
+    resources fits in the resource budget.
+    """
+    if scheduling not in CLIENT_SCHEDULING_MODES:
+        raise ValueError(
+            f"Client scheduling must be one of {CLIENT_SCHEDULING_MODES}, "
+            f"got {scheduling}"
+        )
+    budget = get_resource_budget()
+    client_resources = {}
+    for cid in clients_ids:
+        if scheduling == "serial":
+            resources = {"num_cpus": int(os.cpu_count() / 2) + 1}
+        else:
+            resources = {"num_cpus": 1}
+            if client_resources_fn is not None:
+                resources.update(client_resources_fn(cid))
+        if "num_gpus" in budget:
+            resources.setdefault("num_gpus", 1)
+        for key, value in resources.items():
+            if key not in CLIENT_RESOURCE_KEYS:
+                raise ValueError(
+                    f"Client {cid} declared unknown resource {key}. "
+                    f"Resources must be one of {CLIENT_RESOURCE_KEYS}."
+                )
+            if scheduling == "packed" and value > budget.get(key, 0):
+                raise ValueError(
+                    f"Client {cid} declared {key}={value}, which exceeds the resource "
+                    f"budget of {budget.get(key, 0)}."
+                )
+        client_resources[cid] = resources
+    return client_resources
+
+
+def to_ray_options(resources: Dict[str, float]) -> Dict[str, Any]:
+    """Convert declared client resources to Ray remote task options."""
+    options = {
+        key: resources[key] for key in ("num_cpus", "num_gpus") if key in resources
+    }
+    if "memory" in resources:
+        options["resources"] = {
+            RAY_MEMORY_RESOURCE: math.ceil(resources["memory"] / 2**20)
+        }
+    return options
+
+
+class ResourcePool:
+    """Resource budget shared by clients running in the current process. A client
+    waits until its declared resources are available before it runs."""
+
+    def __init__(self, budget: Dict[str, float]):
+        self.budget = budget
+        self.available = dict(budget)
+        self.condition = threading.Condition()
+
+    def _fits(self, resources: Dict[str, float]) -> bool:
+        return all(
+            value <= self.available[key]
+            for key, value in resources.items()
+            if key in self.available
+        )
+
+    @contextmanager
+    def reserve(self, resources: Dict[str, float]) -> Iterator[None]:
+        with self.condition:
+            self.condition.wait_for(lambda: self._fits(resources))
+            for key, value in resources.items():
+                if key in self.available:
+                    self.available[key] -= value
+        try:
+            yield
+        finally:
+            with self.condition:
+                for key, value in resources.items():
+                    if key in self.available:
+                        self.available[key] += value
+                self.condition.notify_all()
+
+
+class InProcessClientProxy(ClientProxy):
+    """Flower client proxy that runs the client in the current process instead of in a
+    Ray worker. Like Flower's RayClientProxy, a new client instance is created with
+    client_fn for every call and is released when the call returns. If a resource pool
+    is given, the call waits until the client's declared resources are available."""
+
+    def __init__(
+        self,
+        client_fn: Callable[[str], fl.client.Client],
+        cid: str,
+        resources: Optional[Dict[str, float]] = None,
+        resource_pool: Optional[ResourcePool] = None,
+    ):
+        super().__init__(cid)
+        self.client_fn = client_fn
+        self.resources = resources or {}
+        self.resource_pool = resource_pool
+
+    def _create_client(self) -> fl.client.Client:
+        return fl.client.to_client(self.client_fn(self.cid))
+
+    def _call(self, maybe_call_fn: Callable, **kwargs):
+        if self.resource_pool is None:
+            return maybe_call_fn(client=self._create_client(), **kwargs)
+        with self.resource_pool.reserve(self.resources):
+            return maybe_call_fn(client=self._create_client(), **kwargs)
+
+    def get_properties(
+        self, ins: GetPropertiesIns, timeout: Optional[float]
+    ) -> GetPropertiesRes:
+        return self._call(maybe_call_get_properties, get_properties_ins=ins)
+
+    def get_parameters(
+        self, ins: GetParametersIns, timeout: Optional[float]
+    ) -> GetParametersRes:
+        return self._call(maybe_call_get_parameters, get_parameters_ins=ins)
+
+    def fit(self, ins: FitIns, timeout: Optional[float]) -> FitRes:
+        return self._call(maybe_call_fit, fit_ins=ins)
+
+    def evaluate(self, ins: EvaluateIns, timeout: Optional[float]) -> EvaluateRes:
+        return self._call(maybe_call_evaluate, evaluate_ins=ins)
+
+    def reconnect(self, ins: ReconnectIns, timeout: Optional[float]) -> DisconnectRes:
+        return DisconnectRes(reason="")
+
+
+def accumulates_fit(strategy: fl.server.strategy.Strategy) -> bool:
+    """Whether the strategy takes fit results one at a time with accumulate_fit. A
+    wrapper strategy, like the supervisor's, takes them if the solution strategy that
+    it wraps does."""
+    strategy = getattr(strategy, "solution_strategy", strategy)
+    return callable(getattr(strategy, "accumulate_fit", None))
+
+
+class StreamingServer(fl.server.Server):
+    """Flower server that, if the strategy has an accumulate_fit method, passes each
+    fit result to it as soon as the client's fit call returns, and then releases the
+    result's parameters. aggregate_fit is called at the end of the round with the
+    results' parameters emptied. Rounds of other strategies run like Flower's
+    Server's."""
+
+    def fit_round(self, server_round: int, timeout: Optional[float]):
+        if not accumulates_fit(self.strategy):
+            return super().fit_round(server_round, timeout)
+
+        client_instructions = self.strategy.configure_fit(
+            server_round=server_round,
+            parameters=self.parameters,
+            client_manager=self._client_manager,
+        )
+        if not client_instructions:
+            log(INFO, "fit_round %s: no clients selected, cancel", server_round)
+            return None
+        log(
+            DEBUG,
+            "fit_round %s: strategy sampled %s clients (out of %s)",
+            server_round,
+            len(client_instructions),
+            self._client_manager.num_available(),
+        )
+
+        results: List[Tuple[ClientProxy, FitRes]] = []
+        failures: List[Union[Tuple[ClientProxy, FitRes], BaseException]] = []
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            submitted_fs = [
+                executor.submit(fit_client, client_proxy, ins, timeout)
+                for client_proxy, ins in client_instructions
+            ]
+            # Results are accumulated in this thread, one at a time, while other
+            # clients are still fitting
+            for future in concurrent.futures.as_completed(submitted_fs):
+                failure = future.exception()
+                if failure is not None:
+                    failures.append(failure)
+                    continue
+                client_proxy, fit_res = future.result()
+                if fit_res.status.code != Code.OK:
+                    failures.append((client_proxy, fit_res))
+                    continue
+                self.strategy.accumulate_fit(server_round, client_proxy, fit_res)
+                fit_res.parameters = Parameters(
+                    tensors=[], tensor_type=fit_res.parameters.tensor_type
+                )
+                results.append((client_proxy, fit_res))
+        log(
+            DEBUG,
+            "fit_round %s received %s results and %s failures",
+            server_round,
+            len(results),
+            len(failures),
+        )
+
+        parameters_aggregated, metrics_aggregated = self.strategy.aggregate_fit(
+            server_round, results, failures
+        )
+        return parameters_aggregated, metrics_aggregated, (results, failures)
+
+
+def start_inprocess_simulation(
+    *,
+    client_fn: Callable[[str], fl.client.Client],
+    clients_ids: List[str],
+    client_resources: Dict[str, Dict[str, float]],
+    config: fl.server.ServerConfig,
+    strategy: fl.server.strategy.Strategy,
+    resource_budget: Optional[Dict[str, float]] = None,
+    max_workers: Optional[int] = None,
+) -> History:
+    """Run a Flower simulation without Ray. Clients run in the current process, in a
+    thread pool of max_workers threads. Without a resource budget, max_workers defaults
+    to one and client calls in a round run sequentially. With a resource budget,
+    max_workers defaults to the number of clients and clients are scheduled by their
+    declared resources."""
+    resource_pool = None
+    if resource_budget is not None:
+        resource_pool = ResourcePool(resource_budget)
+    if max_workers is None:
+        max_workers = len(clients_ids) if resource_pool is not None else 1
+    server = StreamingServer(client_manager=SimpleClientManager(), strategy=strategy)
+    server.set_max_workers(max_workers)
+    for cid in clients_ids:
+        server.client_manager().register(
+            client=InProcessClientProxy(
+                client_fn=client_fn,
+                cid=cid,
+                resources=client_resources[cid],
+                resource_pool=resource_pool,
+            )
+        )
+    history = server.fit(num_rounds=config.num_rounds, timeout=config.round_timeout)
+    server.disconnect_all_clients(timeout=config.round_timeout)
+    return history
+
+
+def start_ray_simulation(
+    *,
+    client_fn: Callable[[str], fl.client.Client],
+    clients_ids: List[str],
+    client_resources: Dict[str, Dict[str, float]],
+    config: fl.server.ServerConfig,
+    strategy: fl.server.strategy.Strategy,
+    ray_init_args: Dict[str, Any],
+    resource_budget: Optional[Dict[str, float]] = None,
+) -> History:
+    """Run a Flower simulation with Ray. Same as flwr.simulation.start_simulation, except
+    that each client is scheduled with its own declared resources and that Ray's
+    resources are limited to the resource budget, if one is given."""
+    # Ray is only imported when the Ray backend is used
+    import ray
+    from flwr.simulation.ray_transport.ray_client_proxy import RayClientProxy
+
+    server, config = _init_defaults(
+        server=StreamingServer(client_manager=SimpleClientManager(), strategy=strategy),
+        config=config,
+        strategy=None,
+        client_manager=None,
+    )
+    ray_init_args = dict(ray_init_args)
+    if resource_budget is not None:
+        ray_init_args["num_cpus"] = int(resource_budget["num_cpus"])
+        if "num_gpus" in resource_budget:
+            ray_init_args["num_gpus"] = int(resource_budget["num_gpus"])
+        ray_init_args["resources"] = {
+            RAY_MEMORY_RESOURCE: math.floor(resource_budget["memory"] / 2**20)
+        }
+    if ray.is_initialized():
+        ray.shutdown()
+    ray.init(**ray_init_args)
+    for cid in clients_ids:
+        server.client_manager().register(
+            client=RayClientProxy(
+                client_fn=client_fn,
+                cid=cid,
+                resources=to_ray_options(client_resources[cid]),
+            )
+        )
+    return _fl(server=server, config=config)
+
+
+def start_simulation(
+    *,
+    backend: str,
+    scheduling: str,
+    client_fn: Callable[[str], fl.client.Client],
+    clients_ids: List[str],
+    client_resources: Dict[str, Dict[str, float]],
+    config: fl.server.ServerConfig,
+    strategy: fl.server.strategy.Strategy,
+    ray_init_args: Dict[str, Any],
+    max_workers: Optional[int] = None,
+) -> History:
+    """Run a Flower simulation with the selected backend. "ray" uses Flower's Ray-based
+    simulation engine. "inprocess" drives the same clients and strategy in the current
+    process, which avoids Ray's startup and object store overhead for small numbers of
+    clients. client_resources are the declared resources of each client, from
+    get_client_resources. With "packed" scheduling, clients run concurrently within
+    the resource budget. ray_init_args are only used by the "ray" backend, and
+    max_workers only by the "inprocess" backend."""
+    if scheduling not in CLIENT_SCHEDULING_MODES:
+        raise ValueError(
+            f"Client scheduling must be one of {CLIENT_SCHEDULING_MODES}, "
+            f"got {scheduling}"
+        )
+    resource_budget = get_resource_budget() if scheduling == "packed" else None
+    if backend == "ray":
+        return start_ray_simulation(
+            client_fn=client_fn,
+            clients_ids=clients_ids,
+            client_resources=client_resources,
+            config=config,
+            strategy=strategy,
+            ray_init_args=ray_init_args,
+            resource_budget=resource_budget,
+        )
+    elif backend == "inprocess":
+        return start_inprocess_simulation(
+            client_fn=client_fn,
+            clients_ids=clients_ids,
+            client_resources=client_resources,
+            config=config,
+            strategy=strategy,
+            resource_budget=resource_budget,
+            max_workers=max_workers,
+        )
+    else:
+        raise ValueError(
+            f"Simulation backend must be one of {SIMULATION_BACKENDS}, got {backend}"
+        )
@@ -1,10 +1,22 @@
+import atexit
+from collections import OrderedDict
+import dataclasses
 from datetime import datetime
 import functools
+import gc
+import heapq
 import inspect
 import json
+from multiprocessing.connection import Client, Listener, wait
 import os
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Tuple, Union
+import queue
+import resource
+import secrets
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
 
 import flwr as fl
 from flwr.common.typing import (
@@ -21,6 +33,10 @@ from flwr.common.typing import (
 )
 from flwr.server import ClientManager
 from flwr.server.client_proxy import ClientProxy
+from google.protobuf.message import Message
+
+from dataset_cache import CachedDataPath
+from parameters_codec import raw_tensor_sizes
 
 # Can't import loguru's root logger in global scope
 # This causes problems with multiprocessing
@@ -41,6 +57,14 @@ def serialize(record):
         "event": record["extra"].get("event"),
         "captured_class": record["extra"].get("captured_class"),
         "captured_path": record["extra"].get("captured_path"),
+        "resources": record["extra"].get("resources"),
+        "round": record["extra"].get("round"),
+        "wall_time": record["extra"].get("wall_time"),
+        "user_cpu_time": record["extra"].get("user_cpu_time"),
+        "system_cpu_time": record["extra"].get("system_cpu_time"),
+        "peak_rss_delta_kb": record["extra"].get("peak_rss_delta_kb"),
+        "request_bytes": record["extra"].get("request_bytes"),
+        "response_bytes": record["extra"].get("response_bytes"),
     }
     return json.dumps(subset)
 
@@ -65,10 +89,470 @@ def create_supervisor_logger(logger: Logger, log_path: Path):
     return supervisor_logger, handler_id
 
 
+class SupervisorLogCollector:
+    """Single collector of supervisor log records for a simulation. Every process,
+    including Ray workers, sends its records over a local socket, and the collector
+    writes them to the supervisor log file in batches ordered by timestamp. Records are
+    held for flush_interval seconds before being written so that records sent from
+    different processes around the same time can be put in order."""
+
+    poll_interval = 0.1
+
+    def __init__(self, log_path: Path, flush_interval: float = 0.5) -> None:
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self.authkey = secrets.token_bytes(32)
+        self._listener = Listener(family="AF_UNIX", authkey=self.authkey)
+        self.address = self._listener.address
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._buffer: List[Tuple[float, int, bytes]] = []
+        self._received = 0
+        self._stopping = threading.Event()
+        self._accept_thread = threading.Thread(
+            target=self._accept, name="supervisor-log-accept", daemon=True
+        )
+        self._collect_thread = threading.Thread(
+            target=self._collect, name="supervisor-log-collect", daemon=True
+        )
+        self._accept_thread.start()
+        self._collect_thread.start()
+        atexit.register(self.stop)
+
+    def _accept(self):
+        while not self._stopping.is_set():
+            try:
+                connection = self._listener.accept()
+            except Exception:
+                # Listener closed on stop, or a client failed to authenticate
+                continue
+            with self._connections_lock:
+                self._connections.append(connection)
+
+    def _receive(self, timeout: float) -> int:
+        """Receive available records into the buffer. Returns number received."""
+        with self._connections_lock:
+            connections = list(self._connections)
+        if not connections:
+            time.sleep(timeout)
+            return 0
+        received = 0
+        for connection in wait(connections, timeout=timeout):
+            try:
+                data = connection.recv_bytes()
+            except (EOFError, OSError):
+                with self._connections_lock:
+                    self._connections.remove(connection)
+                continue
+            (timestamp,) = struct.unpack_from("<d", data)
+            # Counter keeps arrival order for records with identical timestamps
+            heapq.heappush(self._buffer, (timestamp, self._received, data[8:]))
+            self._received += 1
+            received += 1
+        return received
+
+    def _write(self, watermark: float):
+        """Write buffered records with timestamps up to watermark to the log file."""
+        lines = []
+        while self._buffer and self._buffer[0][0] <= watermark:
+            lines.append(heapq.heappop(self._buffer)[2])
+        if lines:
+            with self.log_path.open("ab") as fp:
+                fp.write(b"".join(lines))
+
+    def _collect(self):
+        while not self._stopping.is_set():
+            self._receive(timeout=self.poll_interval)
+            self._write(watermark=time.time() - self.flush_interval)
+
+    def stop(self):
+        """Drain records still in flight and write everything to the log file."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._collect_thread.join()
+        while self._receive(timeout=self.poll_interval) > 0:
+            pass
+        self._write(watermark=float("inf"))
+        self._listener.close()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+class _LogCollectorSink:
+    """Loguru sink that sends supervisor log records to a SupervisorLogCollector. Falls
+    back to appending to the log file directly if the collector is not reachable, e.g.,
+    during interpreter shutdown after the collector has stopped."""
+
+    def __init__(self, address: str, authkey: bytes, log_path: Path) -> None:
+        self.address = address
+        self.authkey = authkey
+        self.log_path = log_path
+        self._connection = None
+
+    def __call__(self, message):
+        data = message.encode()
+        try:
+            if self._connection is None:
+                self._connection = Client(
+                    self.address, family="AF_UNIX", authkey=self.authkey
+                )
+            self._connection.send_bytes(
+                struct.pack("<d", message.record["time"].timestamp()) + data
+            )
+        except (OSError, EOFError):
+            self._connection = None
+            with self.log_path.open("ab") as fp:
+                fp.write(data)
+
+
+_supervisor_handler_ids: Dict[Tuple[int, str], int] = {}
+_supervisor_handler_lock = threading.Lock()
+
+
+def get_shared_supervisor_logger(
+    logger: Logger,
+    log_path: Path,
+    collector_address: Optional[str] = None,
+    collector_authkey: Optional[bytes] = None,
+) -> Logger:
+    """Get supervisor logger that shares one handler per process and log destination.
+    If a log collector address is given, records are sent to the collector. Otherwise,
+    records are written to log_path. Unlike create_supervisor_logger, the handler is
+    created once and reused, so there is no per-client setup or teardown."""
+    key = str(collector_address or log_path)
+    with _supervisor_handler_lock:
+        if (os.getpid(), key) not in _supervisor_handler_ids:
+            if collector_address is not None:
+                sink = _LogCollectorSink(
+                    collector_address, authkey=collector_authkey, log_path=log_path
+                )
+            else:
+                sink = log_path
+            _supervisor_handler_ids[(os.getpid(), key)] = logger.add(
+                sink,
+                filter=lambda record: record["extra"].get("supervisor") == key,
+                format=formatter,
+                enqueue=collector_address is None,
+            )
+    return logger.bind(supervisor=key)
+
+
+def _varint(value: int) -> bytes:
+    """Encode non-negative integer as a protobuf base-128 varint."""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _length_delimited_key(field_number: int, length: int) -> bytes:
+    """Protobuf wire-format key and length prefix for a length-delimited field."""
+    return _varint((field_number << 3) | 2) + _varint(length)
+
+
+class CapturedMessage:
+    """Captured client—server message in protobuf wire format. Parameters.tensors are
+    kept as references to the original bytes instead of being copied into a protobuf
+    message, and are streamed to disk in chunks between the rest of the message's
+    fields. The written bytes are identical to SerializeToString of the full message,
+    but peak memory does not double and messages larger than protobuf's 2 GB limit
+    can be captured. Compressed Parameters also have a raw size, the size of the
+    message with each tensor replaced by its uncompressed tensor."""
+
+    chunk_size = 64 * 1024 * 1024
+
+    def __init__(self, dataclass_obj, proto_fn: Callable[..., Message]) -> None:
+        parameters: Optional[Parameters] = getattr(dataclass_obj, "parameters", None)
+        if parameters is None:
+            self.head = proto_fn(dataclass_obj)
+            self.tail = None
+            self.tensors = None
+            self.raw_tensor_sizes = None
+            return
+
+        # Build the protobuf message without any tensor data
+        message = proto_fn(
+            dataclasses.replace(
+                dataclass_obj,
+                parameters=Parameters(tensors=[], tensor_type=parameters.tensor_type),
+            )
+        )
+        self.parameters_field_number = message.DESCRIPTOR.fields_by_name[
+            "parameters"
+        ].number
+        self.tensors_field_number = message.parameters.DESCRIPTOR.fields_by_name[
+            "tensors"
+        ].number
+        # Remaining Parameters fields (tensor_type), which come after the tensors
+        self.parameters_rest = message.parameters.SerializeToString()
+        message.ClearField("parameters")
+        # Split remaining fields around the parameters field to match field order of
+        # the full serialized message
+        self.head, self.tail = type(message)(), type(message)()
+        self.head.CopyFrom(message)
+        self.tail.CopyFrom(message)
+        for field in message.DESCRIPTOR.fields:
+            if field.number < self.parameters_field_number:
+                self.tail.ClearField(field.name)
+            else:
+                self.head.ClearField(field.name)
+        self.tensors: Optional[List[bytes]] = list(parameters.tensors)
+        self.raw_tensor_sizes: Optional[List[int]] = raw_tensor_sizes(parameters)
+
+    def _parameters_size(self, tensor_sizes: Optional[List[int]] = None) -> int:
+        if tensor_sizes is None:
+            tensor_sizes = [len(tensor) for tensor in self.tensors]
+        return (
+            sum(
+                len(_length_delimited_key(self.tensors_field_number, size)) + size
+                for size in tensor_sizes
+            )
+            + len(self.parameters_rest)
+        )
+
+    def byte_size(self, raw: bool = False) -> int:
+        """Exact size of the serialized message, without serializing it. If raw is
+        True, the size with uncompressed tensors."""
+        if self.tensors is None:
+            return self.head.ByteSize()
+        parameters_size = self._parameters_size(self.raw_tensor_sizes if raw else None)
+        return (
+            self.head.ByteSize()
+            + len(_length_delimited_key(self.parameters_field_number, parameters_size))
+            + parameters_size
+            + self.tail.ByteSize()
+        )
+
+    def write_to(self, fp):
+        """Write serialized message to file object."""
+        fp.write(self.head.SerializeToString())
+        if self.tensors is None:
+            return
+        fp.write(
+            _length_delimited_key(self.parameters_field_number, self._parameters_size())
+        )
+        for tensor in self.tensors:
+            fp.write(_length_delimited_key(self.tensors_field_number, len(tensor)))
+            view = memoryview(tensor)
+            for start in range(0, len(view), self.chunk_size):
+                fp.write(view[start : start + self.chunk_size])
+        fp.write(self.parameters_rest)
+        fp.write(self.tail.SerializeToString())
+
+
+class CaptureWriter:
+    """Background writer for captured client—server communications. Serialization and
+    disk writes happen on a separate thread so that they overlap with client compute.
+    The queue is bounded, so producers block when the writer falls behind instead of
+    holding an unbounded number of payloads in memory."""
+
+    def __init__(self, max_queue_size: int = 8) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(
+            target=self._run, name="supervisor-capture-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if self._error is None:
+                    self._write(*job)
+            except BaseException as exc:
+                self._error = exc
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _write(
+        path: Path,
+        message: CapturedMessage,
+        write_payload: bool,
+        manifest_path: Optional[Path],
+        manifest_record: Optional[dict],
+    ):
+        write_start = time.time()
+        write_timer = time.perf_counter()
+        num_bytes = message.byte_size()
+        raw_num_bytes = message.byte_size(raw=True)
+        if write_payload:
+            with path.open("wb") as fp:
+                message.write_to(fp)
+        if manifest_path is not None:
+            record = dict(
+                manifest_record or {},
+                path=path.name,
+                num_bytes=num_bytes,
+                raw_num_bytes=raw_num_bytes,
+                write_start=write_start,
+                write_seconds=time.perf_counter() - write_timer,
+            )
+            # Single small append per record, so concurrent writers don't interleave
+            with manifest_path.open("a") as fp:
+                fp.write(json.dumps(record) + "\n")
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(
+        self,
+        path: Path,
+        message: CapturedMessage,
+        write_payload: bool = True,
+        manifest_path: Optional[Path] = None,
+        manifest_record: Optional[dict] = None,
+    ):
+        """Queue a captured message to be serialized and written to path. Blocks if
+        the queue is full. If write_payload is False, only the serialized size is
+        computed. If manifest_path is given, a record with the serialized size is
+        appended to it."""
+        self._raise_error()
+        self._queue.put((path, message, write_payload, manifest_path, manifest_record))
+
+    def flush(self):
+        """Block until all queued messages have been written."""
+        self._queue.join()
+        self._raise_error()
+
+
+_capture_writer: Optional[CaptureWriter] = None
+_capture_writer_pid: Optional[int] = None
+_capture_writer_lock = threading.Lock()
+
+
+def get_capture_writer() -> CaptureWriter:
+    """Get the capture writer for this process, starting it if necessary. Each Ray
+    worker process gets its own writer thread."""
+    global _capture_writer, _capture_writer_pid
+    with _capture_writer_lock:
+        if _capture_writer is None or _capture_writer_pid != os.getpid():
+            _capture_writer = CaptureWriter(
+                max_queue_size=int(os.environ.get("SUPERVISOR_CAPTURE_QUEUE_SIZE", 8))
+            )
+            _capture_writer_pid = os.getpid()
+            atexit.register(_capture_writer.flush)
+        return _capture_writer
+
+
+def flush_capture_writer():
+    """Block until all captured communications in this process are on disk."""
+    if _capture_writer is not None and _capture_writer_pid == os.getpid():
+        _capture_writer.flush()
+
+
+def get_available_memory_fraction() -> Optional[float]:
+    """Fraction of total memory that is available, from /proc/meminfo. Returns None if
+    it can't be read."""
+    meminfo = {}
+    try:
+        with open("/proc/meminfo", "r") as fp:
+            for line in fp:
+                key, value = line.split(":", 1)
+                meminfo[key] = int(value.split()[0])
+        return meminfo["MemAvailable"] / meminfo["MemTotal"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class ClientInstanceCache:
+    """Least-recently-used cache of solution client instances in this process. Lets
+    multi-round simulations create each solution client, including loading its data,
+    once per stage instead of every time Flower calls client_fn. Cached instances are
+    evicted, oldest first, when the available memory fraction falls below
+    min_available_memory."""
+
+    def __init__(self, max_size: int, min_available_memory: float = 0.2):
+        self.max_size = max_size
+        self.min_available_memory = min_available_memory
+        self.instances: "OrderedDict[Tuple[str, str, str], fl.client.Client]" = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+        # Held while an instance is looked up and created, per key
+        self.key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+    def get_or_create(
+        self, key: Tuple[str, str, str], create: Callable[[], fl.client.Client]
+    ) -> Tuple[fl.client.Client, bool]:
+        """Return the cached instance for key, creating it if necessary. Also returns
+        whether the instance was taken from the cache. Concurrent calls for the same
+        key create one instance, while instances for different keys are created
+        concurrently."""
+        if self.max_size <= 0:
+            return create(), False
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                if key in self.instances:
+                    self.instances.move_to_end(key)
+                    return self.instances[key], True
+            instance = create()
+            with self.lock:
+                self.instances[key] = instance
+                self.instances.move_to_end(key)
+                while len(self.instances) > self.max_size:
+                    self.instances.popitem(last=False)
+        self.evict_if_low_memory()
+        return instance, False
+
+    def evict_if_low_memory(self):
+        """Evict cached instances, oldest first, while available memory is low. The most
+        recently used instance is kept because it is in use."""
+        with self.lock:
+            while len(self.instances) > 1:
+                available = get_available_memory_fraction()
+                if available is None or available >= self.min_available_memory:
+                    break
+                self.instances.popitem(last=False)
+                gc.collect()
+
+    def clear(self):
+        with self.lock:
+            self.instances.clear()
+
+
+_client_instance_cache: Optional[ClientInstanceCache] = None
+_client_instance_cache_pid: Optional[int] = None
+_client_instance_cache_lock = threading.Lock()
+
+
+def get_client_instance_cache() -> ClientInstanceCache:
+    """Get the client instance cache for this process. Disabled unless
+    SUPERVISOR_CLIENT_CACHE_SIZE is set to the maximum number of cached instances.
+    Each Ray worker process gets its own cache."""
+    global _client_instance_cache, _client_instance_cache_pid
+    with _client_instance_cache_lock:
+        if _client_instance_cache is None or _client_instance_cache_pid != os.getpid():
+            _client_instance_cache = ClientInstanceCache(
+                max_size=int(os.environ.get("SUPERVISOR_CLIENT_CACHE_SIZE", 0)),
+                min_available_memory=float(
+                    os.environ.get("SUPERVISOR_CLIENT_CACHE_MIN_AVAILABLE_MEMORY", 0.2)
+                ),
+            )
+            _client_instance_cache_pid = os.getpid()
+        return _client_instance_cache
+
+
 class FederatedSupervisor:
     """Class that does client and filesystem path bookkeeping for the simulation."""
 
     base_storage_dir = Path("/code_execution/submission")
+    # Columnar copies of data files, created on first use. Outside of the submission
+    # directory, and removed by entrypoint.sh after each scenario.
+    data_cache_dir = Path("/code_execution/cache/data")
+    # "full" writes captured communications to disk. "accounting" only records their
+    # serialized sizes in the capture manifest.
+    capture_modes = ("full", "accounting")
 
     def __init__(self, partition_config_path: Union[str, Path]) -> None:
         # Set up paths
@@ -83,6 +567,12 @@ class FederatedSupervisor:
             self.base_storage_dir / "captured" / scenario_name / stage
         )
         self.base_captured_dir.mkdir(exist_ok=True, parents=True)
+        self.capture_mode = os.environ.get("SUPERVISOR_CAPTURE_MODE", "full")
+        if self.capture_mode not in self.capture_modes:
+            raise ValueError(
+                f"SUPERVISOR_CAPTURE_MODE must be one of {self.capture_modes}, "
+                f"got {self.capture_mode}"
+            )
 
         # State directory for saving client and server state
         self.base_state_dir = self.base_storage_dir / "state" / scenario_name
@@ -101,6 +591,34 @@ class FederatedSupervisor:
         self.supervisor_log_path = (
             self.base_storage_dir / f"{scenario_name}-{stage}.log"
         )
+        self.log_collector: Optional[SupervisorLogCollector] = None
+        self.log_collector_address: Optional[str] = None
+        self.log_collector_authkey: Optional[bytes] = None
+
+    def __getstate__(self):
+        # Collector lives in the main process only. Ray workers just need its address.
+        state = self.__dict__.copy()
+        state["log_collector"] = None
+        return state
+
+    def start_log_collector(self):
+        """Start collecting supervisor log records from all processes of the
+        simulation. Should be called in the main process before the simulation."""
+        self.log_collector = SupervisorLogCollector(self.supervisor_log_path)
+        self.log_collector_address = self.log_collector.address
+        self.log_collector_authkey = self.log_collector.authkey
+
+    def stop_log_collector(self):
+        if self.log_collector is not None:
+            self.log_collector.stop()
+
+    def get_supervisor_logger(self, logger: Logger) -> Logger:
+        return get_shared_supervisor_logger(
+            logger,
+            log_path=self.supervisor_log_path,
+            collector_address=self.log_collector_address,
+            collector_authkey=self.log_collector_authkey,
+        )
 
     def get_client_ids(self):
         return list(self.partition_config.keys())
@@ -117,6 +635,9 @@ class FederatedSupervisor:
             / f"{timestamp}-{cid}-{counter:02d}-{method}.{dataclass}.pb"
         )
 
+    def get_captured_manifest_path(self):
+        return self.base_captured_dir / "manifest.jsonl"
+
     def get_client_state_dir(self, cid: str):
         client_state_dir = self.base_state_dir / cid
         client_state_dir.mkdir(exist_ok=True)
@@ -129,7 +650,9 @@ class FederatedSupervisor:
 
     def get_data_paths(self, cid: str) -> Dict[str, Path]:
         return {
-            k: self.get_client_data_dir(cid) / v
+            k: CachedDataPath(
+                self.get_client_data_dir(cid) / v, cache_dir=self.data_cache_dir
+            )
             for k, v in self.partition_config[cid].items()
         }
 
@@ -148,6 +671,42 @@ class FederatedSupervisor:
         return self.base_predictions_dir / f"{cid}.csv"
 
 
+class CallMeasurement:
+    """Measures the wall time, CPU time, and growth of the process's peak RSS during a
+    call. CPU time is per process, so that it includes the threads that the call's
+    libraries start, e.g., BLAS or torch thread pools. Like peak RSS, it is only
+    attributable to the call if no other call ran in the same process at the same
+    time, so both are left out for calls that overlapped another measured call, e.g.,
+    of concurrent in-process clients."""
+
+    _lock = threading.Lock()
+    _active: Set["CallMeasurement"] = set()
+
+    def __init__(self):
+        with self._lock:
+            self.overlapped = bool(self._active)
+            for other in self._active:
+                other.overlapped = True
+            self._active.add(self)
+        self.rusage = resource.getrusage(resource.RUSAGE_SELF)
+        self.maxrss = self.rusage.ru_maxrss
+        self.wall = time.perf_counter()
+
+    def finish(self) -> Dict[str, float]:
+        wall = time.perf_counter()
+        rusage = resource.getrusage(resource.RUSAGE_SELF)
+        with self._lock:
+            self._active.discard(self)
+        if self.overlapped:
+            return {"wall_time": wall - self.wall}
+        return {
+            "wall_time": wall - self.wall,
+            "user_cpu_time": rusage.ru_utime - self.rusage.ru_utime,
+            "system_cpu_time": rusage.ru_stime - self.rusage.ru_stime,
+            "peak_rss_delta_kb": rusage.ru_maxrss - self.maxrss,
+        }
+
+
 def wrap_client_method(ins_proto_fn, res_proto_fn):
     """Decorator factory for wrapping client methods. Requires input and output
     protobuf conversion functions to be specified."""
@@ -165,14 +724,24 @@ def wrap_client_method(ins_proto_fn, res_proto_fn):
                 method=method.__name__
             ).patch(lambda record: record.update(function=method.__name__))
             # Capture ins data
+            ins_counter = self._get_counter_value()
             ins_path = self.supervisor.get_client_captured_path(
                 cid=self.cid,
                 method=method.__name__,
                 dataclass=input_annotation.__name__,
-                counter=self._get_counter_value(),
+                counter=ins_counter,
+            )
+            # Convert to protobuf now as a snapshot, but serialize and write to disk
+            # in the background
+            ins_message = CapturedMessage(ins, ins_proto_fn)
+            request_bytes = ins_message.byte_size()
+            self._capture(
+                ins_path,
+                ins_message,
+                method=method.__name__,
+                dataclass=input_annotation.__name__,
+                counter=ins_counter,
             )
-            with ins_path.open("wb") as fp:
-                fp.write(ins_proto_fn(ins).SerializeToString())
             supervisor_logger.info(
                 f"Client {self.cid}: {method.__name__} start",
                 event="start",
@@ -181,23 +750,37 @@ def wrap_client_method(ins_proto_fn, res_proto_fn):
             )
 
             # Execute
-            res = getattr(self.solution_client, method.__name__)(ins)
+            measurement = CallMeasurement()
+            try:
+                res = getattr(self.solution_client, method.__name__)(ins)
+            finally:
+                call_metrics = measurement.finish()
 
             # Capture res data
+            res_counter = self._get_counter_value()
             res_path = self.supervisor.get_client_captured_path(
                 cid=self.cid,
                 method=method.__name__,
                 dataclass=return_annotation.__name__,
-                counter=self._get_counter_value(),
+                counter=res_counter,
             )
+            res_message = CapturedMessage(res, res_proto_fn)
             supervisor_logger.info(
                 f"Client {self.cid}: {method.__name__} end",
                 event="end",
                 captured_class=return_annotation.__name__,
                 captured_path=str(res_path),
+                request_bytes=request_bytes,
+                response_bytes=res_message.byte_size(),
+                **call_metrics,
+            )
+            self._capture(
+                res_path,
+                res_message,
+                method=method.__name__,
+                dataclass=return_annotation.__name__,
+                counter=res_counter,
             )
-            with res_path.open("wb") as fp:
-                fp.write(res_proto_fn(res).SerializeToString())
             return res
 
         return wrapped_method
@@ -221,10 +804,9 @@ class FederatedWrapperClient(fl.client.Client):
         self.solution_client = solution_client
         self.supervisor = supervisor
 
-        self.supervisor_logger, self.log_handler_id = create_supervisor_logger(
-            logger=root_logger, log_path=supervisor.supervisor_log_path
+        self.supervisor_logger = supervisor.get_supervisor_logger(root_logger).bind(
+            cid=cid
         )
-        self.supervisor_logger = self.supervisor_logger.bind(cid=cid)
         self.method_call_counter = 0
         self.supervisor_logger.info(
             f"Initializing Client {self.cid}.", method="__init__"
@@ -232,15 +814,37 @@ class FederatedWrapperClient(fl.client.Client):
         super().__init__()
 
     def __del__(self):
+        # Make sure captured communications are written before the client goes away
+        flush_capture_writer()
         self.supervisor_logger.info(f"Finalizing Client {self.cid}.", method="__del__")
-        self.supervisor_logger.complete()
-        self.supervisor_logger.remove(self.log_handler_id)
 
     def _get_counter_value(self):
         value = self.method_call_counter
         self.method_call_counter += 1
         return value
 
+    def _capture(
+        self,
+        path: Path,
+        message: CapturedMessage,
+        method: str,
+        dataclass: str,
+        counter: int,
+    ):
+        get_capture_writer().submit(
+            path,
+            message,
+            write_payload=self.supervisor.capture_mode == "full",
+            manifest_path=self.supervisor.get_captured_manifest_path(),
+            manifest_record={
+                "cid": self.cid,
+                "method": method,
+                "dataclass": dataclass,
+                "counter": counter,
+                "timestamp": time.time(),
+            },
+        )
+
     @wrap_client_method(
         ins_proto_fn=fl.common.serde.get_properties_ins_to_proto,
         res_proto_fn=fl.common.serde.get_properties_res_to_proto,
@@ -280,12 +884,26 @@ def wrap_train_client_factory(
     def wrapped_client_factory(cid):
         from loguru import logger
 
-        logger.info(f"Executing train_client_factory for Client {cid}...")
-        solution_client = solution_client_factory(
-            cid=cid,
-            **supervisor.get_data_paths(cid),
-            client_dir=supervisor.get_client_state_dir(cid),
+        def create_solution_client():
+            logger.info(f"Executing train_client_factory for Client {cid}...")
+            return solution_client_factory(
+                cid=cid,
+                **supervisor.get_data_paths(cid),
+                client_dir=supervisor.get_client_state_dir(cid),
+            )
+
+        # Optionally reuse the solution client from a previous round. The wrapper client
+        # is always new so that each call is supervised separately.
+        solution_client, cached = get_client_instance_cache().get_or_create(
+            key=(
+                solution_client_factory.__module__,
+                solution_client_factory.__qualname__,
+                cid,
+            ),
+            create=create_solution_client,
         )
+        if cached:
+            logger.info(f"Reusing cached train_client_factory client for Client {cid}.")
         return FederatedWrapperClient(
             cid=cid,
             solution_client=fl.client.to_client(solution_client),
@@ -306,14 +924,28 @@ def wrap_test_client_factory(
     def wrapped_client_factory(cid):
         from loguru import logger
 
-        logger.info(f"Executing test_client_factory for Client {cid}...")
-        solution_client = solution_client_factory(
-            cid=cid,
-            **supervisor.get_data_paths(cid),
-            client_dir=supervisor.get_client_state_dir(cid),
-            preds_format_path=supervisor.get_predictions_format_path(cid),
-            preds_dest_path=supervisor.get_predictions_dest_path(cid),
+        def create_solution_client():
+            logger.info(f"Executing test_client_factory for Client {cid}...")
+            return solution_client_factory(
+                cid=cid,
+                **supervisor.get_data_paths(cid),
+                client_dir=supervisor.get_client_state_dir(cid),
+                preds_format_path=supervisor.get_predictions_format_path(cid),
+                preds_dest_path=supervisor.get_predictions_dest_path(cid),
+            )
+
+        # Optionally reuse the solution client from a previous round. The wrapper client
+        # is always new so that each call is supervised separately.
+        solution_client, cached = get_client_instance_cache().get_or_create(
+            key=(
+                solution_client_factory.__module__,
+                solution_client_factory.__qualname__,
+                cid,
+            ),
+            create=create_solution_client,
         )
+        if cached:
+            logger.info(f"Reusing cached test_client_factory client for Client {cid}.")
         return FederatedWrapperClient(
             cid=cid,
             solution_client=fl.client.to_client(solution_client),
@@ -328,14 +960,26 @@ def wrap_strategy_method(method: Callable):
     """Decorator that wraps strategy methods. Performs supervisor logging and captures
     serialized inputs and outputs."""
 
+    signature = inspect.signature(method)
+
     @functools.wraps(method)
     def wrapped_method(self, *args, **kwargs):
-        supervisor_logger = self.supervisor_logger.bind(method=method.__name__).patch(
-            lambda record: record.update(function=method.__name__)
+        # Server round, for methods that have one
+        server_round = (
+            signature.bind(self, *args, **kwargs).arguments.get("server_round")
         )
+        supervisor_logger = self.supervisor_logger.bind(
+            method=method.__name__, round=server_round
+        ).patch(lambda record: record.update(function=method.__name__))
         supervisor_logger.info(f"Strategy: {method.__name__} start", event="start")
-        out = getattr(self.solution_strategy, method.__name__)(*args, **kwargs)
-        supervisor_logger.info(f"Strategy: {method.__name__} end", event="end")
+        measurement = CallMeasurement()
+        try:
+            out = getattr(self.solution_strategy, method.__name__)(*args, **kwargs)
+        finally:
+            call_metrics = measurement.finish()
+        supervisor_logger.info(
+            f"Strategy: {method.__name__} end", event="end", **call_metrics
+        )
         return out
 
     return wrapped_method
@@ -356,10 +1000,9 @@ class FederatedWrapperStrategy(fl.server.strategy.Strategy):
 
         from loguru import logger
 
-        self.supervisor_logger, self.log_handler_id = create_supervisor_logger(
-            logger=logger, log_path=supervisor.supervisor_log_path
+        self.supervisor_logger = supervisor.get_supervisor_logger(logger).bind(
+            cid="server"
         )
-        self.supervisor_logger = self.supervisor_logger.bind(cid="server")
 
         self.supervisor_logger.info(
             f"Initialized strategy {type(solution_strategy).__name__}.",
@@ -369,7 +1012,6 @@ class FederatedWrapperStrategy(fl.server.strategy.Strategy):
 
     def __del__(self):
         self.supervisor_logger.info(f"Finalizing Strategy.", method="__del__")
-        self.supervisor_logger.complete()
 
     @wrap_strategy_method
     def initialize_parameters(
@@ -392,6 +1034,12 @@ class FederatedWrapperStrategy(fl.server.strategy.Strategy):
     ) -> Tuple[Optional[Parameters], Dict[str, Scalar]]:
         pass
 
+    @wrap_strategy_method
+    def accumulate_fit(
+        self, server_round: int, client_proxy: ClientProxy, fit_res: FitRes
+    ) -> None:
+        pass
+
     @wrap_strategy_method
     def configure_evaluate(
         self, server_round: int, parameters: Parameters, client_manager: ClientManager
@@ -419,6 +1067,8 @@ class CentralizedSupervisor:
 
     base_data_dir = Path("/code_execution/data/centralized")
     base_storage_dir = Path("/code_execution/submission")
+    # Columnar copies of data files, removed by entrypoint.sh after the test stage
+    data_cache_dir = Path("/code_execution/cache/data")
 
     def __init__(self, stage: str, root_logger: Logger) -> None:
         # Set up paths
@@ -448,7 +1098,10 @@ class CentralizedSupervisor:
         return self.model_state_dir
 
     def get_data_paths(self) -> Dict[str, Path]:
-        return {k: self.stage_data_dir / v for k, v in self.data_config.items()}
+        return {
+            k: CachedDataPath(self.stage_data_dir / v, cache_dir=self.data_cache_dir)
+            for k, v in self.data_config.items()
+        }
 
     def get_predictions_format_path(self):
         return self.stage_data_dir / "predictions_format.csv"
@@ -0,0 +1,83 @@
+from flwr.common.typing import Code, FitRes, Status
+import numpy as np
+import pytest
+
+from aggregation import (
+    ConcatAggregator,
+    FedAvgAggregator,
+    StreamingAggregator,
+    SumAggregator,
+)
+from parameters_codec import ndarrays_to_parameters
+
+
+def fit_res(ndarrays, num_examples, compression=None):
+    return FitRes(
+        status=Status(code=Code.OK, message=""),
+        parameters=ndarrays_to_parameters(ndarrays, compression=compression),
+        num_examples=num_examples,
+        metrics={},
+    )
+
+
+def test_fedavg():
+    """Test that the streaming mean equals the weighted mean of all results."""
+    rng = np.random.default_rng(0)
+    results = [
+        [rng.standard_normal((4, 3)).astype(np.float32), rng.integers(0, 10, 5)]
+        for _ in range(3)
+    ]
+    weights = [10, 20, 70]
+    aggregator = FedAvgAggregator()
+    for ndarrays, weight, compression in zip(results, weights, [None, "zlib", "auto"]):
+        aggregator.add_fit_res(fit_res(ndarrays, weight, compression))
+    means = aggregator.result()
+    assert [ndarray.dtype for ndarray in means] == [np.float32, np.float64]
+    for i, mean in enumerate(means):
+        expected = np.average([ndarrays[i] for ndarrays in results], 0, weights)
+        np.testing.assert_allclose(mean, expected, rtol=1e-6)
+    # Reset after the result
+    assert aggregator.num_results == 0
+    assert aggregator.result() == []
+
+
+def test_fedavg_zero_weight():
+    """Test that averaging with a total weight of zero raises."""
+    aggregator = FedAvgAggregator()
+    aggregator.add([np.ones(3)], weight=0)
+    with pytest.raises(ValueError):
+        aggregator.result()
+
+
+def test_sum_ignores_weights():
+    """Test that sums are unweighted and accumulated in 64-bit precision."""
+    aggregator = SumAggregator()
+    aggregator.add([np.full(2, 200, dtype=np.uint8)], weight=3)
+    aggregator.add([np.full(2, 100, dtype=np.uint8)], weight=5)
+    (total,) = aggregator.result()
+    assert total.dtype == np.int64
+    np.testing.assert_array_equal(total, [300, 300])
+
+
+def test_concat():
+    """Test that arrays are concatenated in the order of results."""
+    aggregator = ConcatAggregator()
+    aggregator.add([np.arange(3), np.zeros((3, 2))])
+    aggregator.add([np.arange(3, 5), np.ones((2, 2))])
+    indices, values = aggregator.result()
+    np.testing.assert_array_equal(indices, np.arange(5))
+    np.testing.assert_array_equal(values[:, 0], [0, 0, 0, 1, 1])
+    with pytest.raises(ValueError):
+        aggregator.add([np.arange(3)])
+        aggregator.add([np.arange(3), np.arange(3)])
+
+
+def test_incomplete_aggregator():
+    """Test that aggregators must implement the reduction to be instantiated."""
+
+    class MaxAggregator(StreamingAggregator):
+        def _add(self, ndarrays, weight):
+            pass
+
+    with pytest.raises(TypeError):
+        MaxAggregator()
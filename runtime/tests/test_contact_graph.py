@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from contact_graph import ContactGraph
+
+
+@pytest.fixture
+def network_df():
+    rng = np.random.default_rng(0)
+    size = 2000
+    return pd.DataFrame(
+        {
+            "pid1": rng.integers(0, 300, size) * 7,
+            "pid2": rng.integers(0, 300, size) * 7,
+            "lid": rng.integers(0, 10, size),
+            "duration": rng.random(size) * 3600,
+        }
+    )
+
+
+def dense_graph(network_df):
+    """Number of contacts and total duration of each pair of pids, by a loop."""
+    contacts = {}
+    for row in network_df.itertuples(index=False):
+        if row.pid1 == row.pid2:
+            continue
+        for pair in [(row.pid1, row.pid2), (row.pid2, row.pid1)]:
+            count, duration = contacts.get(pair, (0, 0.0))
+            contacts[pair] = (count + 1, duration + row.duration)
+    return contacts
+
+
+@pytest.mark.parametrize("chunk_size", [2000, 333, 1])
+def test_from_edges(network_df, chunk_size):
+    """Test that edges are aggregated per pair of people in both directions, for any
+    chunking of the contacts."""
+    chunks = (
+        network_df.iloc[start : start + chunk_size]
+        for start in range(0, len(network_df), chunk_size)
+    )
+    graph = ContactGraph.from_edges(chunks)
+    contacts = dense_graph(network_df)
+    assert graph.num_edges == len(contacts) // 2
+    assert graph.indices.dtype == np.int32
+    np.testing.assert_array_equal(
+        graph.pids, np.unique([pid for pair in contacts for pid in pair])
+    )
+    weights = graph.adjacency("weights").tocoo()
+    durations = graph.adjacency("durations").tocoo()
+    result = {
+        (graph.pids[i], graph.pids[j]): (count, duration)
+        for i, j, count, duration in zip(
+            weights.row, weights.col, weights.data, durations.data
+        )
+    }
+    assert result.keys() == contacts.keys()
+    for pair, (count, duration) in contacts.items():
+        assert result[pair][0] == count
+        assert result[pair][1] == pytest.approx(duration, rel=1e-6)
+
+
+def test_empty_graph():
+    """Test that a network without contacts between different people has no nodes."""
+    graph = ContactGraph.from_edges(
+        [pd.DataFrame({"pid1": [1, 2], "pid2": [1, 2], "duration": [1.0, 2.0]})]
+    )
+    assert graph.num_nodes == 0
+    np.testing.assert_array_equal(graph.node_index([1, 2]), [-1, -1])
+
+
+def test_invalid_pids():
+    """Test that pids that don't fit in edge keys are rejected."""
+    with pytest.raises(ValueError):
+        ContactGraph.from_edges(
+            [pd.DataFrame({"pid1": [-1], "pid2": [2], "duration": [1.0]})]
+        )
+
+
+def test_from_network_file_cache(network_df, tmp_path):
+    """Test that the graph of a network file is cached and memory-mapped."""
+    network_path = tmp_path / "network.csv"
+    network_df.to_csv(network_path, index=False)
+    graph = ContactGraph.from_network_file(network_path, cache_dir=tmp_path / "cache")
+    (graph_dir,) = (tmp_path / "cache").iterdir()
+    assert isinstance(graph.indices, np.memmap)
+    cached = ContactGraph.from_network_file(network_path, cache_dir=tmp_path / "cache")
+    assert list((tmp_path / "cache").iterdir()) == [graph_dir]
+    expected = ContactGraph.from_edges([network_df])
+    for name in ["pids", "indptr", "indices", "weights", "durations"]:
+        np.testing.assert_array_equal(getattr(cached, name), getattr(expected, name))
+
+
+def test_infected_contacts_by_day(network_df):
+    """Test that infected contacts are counted per person and day."""
+    graph = ContactGraph.from_edges([network_df])
+    rng = np.random.default_rng(1)
+    pids = np.arange(0, 300 * 7, 7)
+    disease_outcome_df = pd.DataFrame(
+        {
+            "day": np.repeat([1, 2, 3], len(pids)),
+            "pid": np.tile(pids, 3),
+            "state": rng.choice(["S", "I", "R"], 3 * len(pids)),
+        }
+    )
+    counts = graph.infected_contacts_by_day(disease_outcome_df)
+    contacts = dense_graph(network_df)
+    for day in [1, 2, 3]:
+        day_df = disease_outcome_df[disease_outcome_df["day"] == day]
+        infected = set(day_df.loc[day_df["state"] == "I", "pid"])
+        for pid in graph.pids[:20]:
+            expected = sum(1 for (a, b) in contacts if a == pid and b in infected)
+            assert counts.loc[pid, day] == expected
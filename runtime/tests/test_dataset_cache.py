@@ -0,0 +1,101 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_cache import CachedDataPath
+
+FILTERS = [
+    [("day", ">=", 5)],
+    [("state", "==", "I"), ("day", "<", 10)],
+    [("state", "in", ["S", "R"])],
+    [("state", "not in", ["S"])],
+    [[("state", "==", "I")], [("score", ">", 0.5)]],
+    [("state", "!=", "R")],
+]
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    rng = np.random.default_rng(0)
+    size = 1000
+    df = pd.DataFrame(
+        {
+            "pid": np.arange(size),
+            "day": rng.integers(0, 20, size),
+            "state": rng.choice(np.array(["S", "I", "R", None], dtype=object), size),
+            "score": np.where(rng.random(size) < 0.1, np.nan, rng.random(size)),
+            "date": pd.Timestamp("2022-01-01")
+            + pd.to_timedelta(rng.integers(0, 20, size), unit="D"),
+        }
+    )
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def expected_rows(path, columns, filters):
+    df = pd.read_csv(path)
+    if isinstance(filters[0], tuple):
+        filters = [filters]
+    mask = np.zeros(len(df), dtype=bool)
+    for conjunction in filters:
+        query = " and ".join(
+            f"{column} {op} {value!r}" for column, op, value in conjunction
+        )
+        # pandas query treats missing values as not in a list, like the filters
+        mask |= df.eval(query).fillna(False).to_numpy() & np.all(
+            [df[column].notna() for column, _, _ in conjunction], axis=0
+        )
+    return df.loc[mask, columns].reset_index(drop=True)
+
+
+def test_read_pandas_matches_read_csv(data_path, tmp_path):
+    """Test that cached reads have the same values and types as pandas.read_csv."""
+    path = CachedDataPath(data_path, cache_dir=tmp_path / "cache")
+    pd.testing.assert_frame_equal(path.read_pandas(), pd.read_csv(data_path))
+    assert path.cache_path.exists()
+    pd.testing.assert_frame_equal(
+        path.read_pandas(columns=["day"], index_col="pid"),
+        pd.read_csv(data_path, usecols=["pid", "day"], index_col="pid"),
+    )
+
+
+@pytest.mark.parametrize("cache", [True, False], ids=["cached", "csv"])
+@pytest.mark.parametrize("filters", FILTERS)
+def test_dataset_filters(data_path, tmp_path, cache, filters):
+    """Test that dataset handles read the rows that match filters, with only the
+    selected columns, also in batches."""
+    path = CachedDataPath(data_path, cache_dir=tmp_path / "cache" if cache else None)
+    dataset = path.dataset()
+    assert dataset.cached == cache
+    columns = ["pid", "score"]
+    expected = expected_rows(data_path, columns, filters)
+    pd.testing.assert_frame_equal(dataset.read(columns, filters), expected)
+    batches = list(dataset.iter_batches(columns, filters, batch_size=128))
+    assert all(len(batch) <= 128 for batch in batches)
+    pd.testing.assert_frame_equal(
+        pd.concat(batches, ignore_index=True), expected, check_index_type=False
+    )
+
+
+def test_dataset_filters_skip_empty_batches(data_path, tmp_path):
+    """Test that batches without matching rows are skipped, unless there are no
+    filters."""
+    dataset = CachedDataPath(data_path, cache_dir=tmp_path).dataset()
+    batches = list(dataset.iter_batches(filters=[("pid", ">=", 900)], batch_size=100))
+    assert len(batches) == 1
+    assert len(list(dataset.iter_batches(batch_size=100))) == 10
+    with pytest.raises(ValueError):
+        dataset.read(filters=[("pid", "~", 1)])
+
+
+def test_cached_data_path_is_a_path(data_path, tmp_path):
+    """Test that cached data paths pickle with their cache directory, and that derived
+    paths have none."""
+    path = CachedDataPath(data_path, cache_dir=tmp_path / "cache")
+    assert path == data_path
+    assert pickle.loads(pickle.dumps(path)).cache_dir == tmp_path / "cache"
+    assert path.parent.cache_dir is None
+    assert not path.with_name("other.csv").dataset().cached
@@ -0,0 +1,134 @@
+import math
+
+import numpy as np
+import pytest
+from scipy import integrate, optimize, stats
+
+from differential_privacy import (
+    PrivacyAccountant,
+    add_discrete_gaussian_noise,
+    add_gaussian_noise,
+    clip_update,
+    clipped_sum_per_example,
+    discrete_gaussian,
+    gaussian_rdp,
+    global_norm,
+    rdp_to_epsilon,
+)
+
+
+def test_clip_update():
+    """Test that updates are scaled down to the norm bound and small ones are kept."""
+    rng = np.random.default_rng(0)
+    update = [rng.standard_normal((10, 5)).astype(np.float32), rng.standard_normal(7)]
+    norm = math.sqrt(sum(np.sum(np.square(a, dtype=np.float64)) for a in update))
+    clipped, clipped_norm = clip_update(update, max_norm=1.0)
+    assert clipped_norm == pytest.approx(norm)
+    assert global_norm(clipped) == pytest.approx(1.0, rel=1e-6)
+    assert [a.dtype for a in clipped] == [np.float32, np.float64]
+    np.testing.assert_allclose(clipped[1], update[1] / norm)
+    kept, _ = clip_update(update, max_norm=2 * norm)
+    assert all(a is b for a, b in zip(kept, update))
+
+
+def test_clipped_sum_per_example():
+    """Test that per-example clipping equals clipping each example separately."""
+    rng = np.random.default_rng(0)
+    batch = [rng.standard_normal((16, 4, 3)), rng.standard_normal((16, 2)) * 0.1]
+    sums, norms = clipped_sum_per_example(batch, max_norm=1.0)
+    expected = [0.0, 0.0]
+    for i in range(16):
+        clipped, norm = clip_update([a[i] for a in batch], max_norm=1.0)
+        assert norms[i] == pytest.approx(norm)
+        expected = [e + c for e, c in zip(expected, clipped)]
+    for result, e in zip(sums, expected):
+        np.testing.assert_allclose(result, e)
+
+
+def test_gaussian_noise():
+    """Test that noise has the requested scale and keeps shapes and float dtypes."""
+    rng = np.random.default_rng(0)
+    ndarrays = [np.zeros((300, 300), dtype=np.float32), np.ones(50_000), np.arange(3)]
+    noisy = add_gaussian_noise(ndarrays, stddev=0.5, rng=rng)
+    assert [a.shape for a in noisy] == [a.shape for a in ndarrays]
+    assert [a.dtype for a in noisy] == [np.float32, np.float64, np.float64]
+    assert np.std(noisy[0]) == pytest.approx(0.5, rel=0.01)
+    assert np.mean(noisy[1]) == pytest.approx(1.0, abs=0.01)
+    assert np.all(ndarrays[0] == 0)
+
+
+@pytest.mark.parametrize("sigma", [0.5, 1.0, 3.3])
+def test_discrete_gaussian(sigma):
+    """Test that discrete Gaussian samples have the distribution's probabilities."""
+    samples = discrete_gaussian(200_000, sigma, np.random.default_rng(0))
+    assert samples.dtype == np.int64
+    support = np.arange(-int(10 * sigma) - 1, int(10 * sigma) + 2)
+    probabilities = np.exp(-(support**2) / (2 * sigma**2))
+    probabilities /= probabilities.sum()
+    frequencies = np.array([np.mean(samples == k) for k in support])
+    np.testing.assert_allclose(frequencies, probabilities, atol=0.005)
+
+
+def test_discrete_gaussian_noise_is_on_the_grid():
+    """Test that values with discrete Gaussian noise are multiples of the grid."""
+    rng = np.random.default_rng(0)
+    ndarrays = [rng.standard_normal(1000), rng.standard_normal((20, 5))]
+    noisy = add_discrete_gaussian_noise(ndarrays, 0.1, granularity=2**-8, rng=rng)
+    for ndarray, result in zip(ndarrays, noisy):
+        steps = result * 2**8
+        np.testing.assert_array_equal(steps, np.round(steps))
+        assert np.std(result - ndarray) == pytest.approx(0.1, rel=0.1)
+
+
+@pytest.mark.parametrize("sampling_rate", [1.0, 0.1, 0.01])
+@pytest.mark.parametrize("order", [2, 3, 8, 32])
+def test_gaussian_rdp(sampling_rate, order):
+    """Test the subsampled Gaussian RDP against numerical integration of the Rényi
+    divergence between the mixture and the base Gaussian."""
+    sigma = 2.0
+    rdp = gaussian_rdp(sigma, sampling_rate, orders=[order])[0]
+
+    def integrand(z):
+        log_ratio = np.logaddexp(
+            math.log1p(-sampling_rate) if sampling_rate < 1 else -np.inf,
+            math.log(sampling_rate) + (2 * z - 1) / (2 * sigma**2),
+        )
+        return math.exp(stats.norm.logpdf(z, scale=sigma) + order * log_ratio)
+
+    # The integrand peaks between 0 and order, and vanishes 20 sigmas beyond
+    moment, _ = integrate.quad(
+        integrand, -20 * sigma, order + 20 * sigma, points=[0, order], epsrel=1e-10
+    )
+    assert rdp == pytest.approx(math.log(moment) / (order - 1), rel=1e-6)
+
+
+def test_rdp_to_epsilon():
+    """Test the RDP conversion against a value by hand and the exact epsilon of the
+    Gaussian mechanism (Balle and Wang, 2018), which it must not undercut."""
+    # 1 + log(1/2) - (log(1e-5) + log(2)) / 1
+    assert rdp_to_epsilon(np.array([1.0]), 1e-5, orders=[2]) == pytest.approx(
+        1 - 2 * math.log(2) + 5 * math.log(10)
+    )
+    sigma, delta = 1.0, 1e-5
+
+    def exact_delta(epsilon):
+        return (
+            stats.norm.cdf(-epsilon * sigma + 1 / (2 * sigma))
+            - math.exp(epsilon) * stats.norm.cdf(-epsilon * sigma - 1 / (2 * sigma))
+            - delta
+        )
+
+    exact = optimize.brentq(exact_delta, 0.1, 20)
+    epsilon = rdp_to_epsilon(gaussian_rdp(sigma), delta)
+    assert exact <= epsilon <= 1.2 * exact
+
+
+def test_privacy_accountant():
+    """Test that rounds compose and that epsilon grows with every round."""
+    accountant = PrivacyAccountant(delta=1e-5)
+    for _ in range(5):
+        accountant.step(noise_multiplier=1.1, sampling_rate=0.1, steps=10)
+    assert np.all(np.diff(accountant.epsilons) > 0)
+    expected = rdp_to_epsilon(50 * gaussian_rdp(1.1, 0.1), 1e-5)
+    assert accountant.epsilon == pytest.approx(expected)
+    assert PrivacyAccountant(delta=1e-5).step(0.0) == math.inf
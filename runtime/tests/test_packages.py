@@ -30,6 +30,56 @@ def test_supervisor_import():
     importlib.import_module("supervisor")
 
 
+def test_simulation_import():
+    """Test that simulation module is importable."""
+    importlib.import_module("simulation")
+
+
+def test_dataset_cache_import():
+    """Test that dataset_cache module is importable."""
+    importlib.import_module("dataset_cache")
+
+
+def test_resource_monitor_import():
+    """Test that resource_monitor module is importable."""
+    importlib.import_module("resource_monitor")
+
+
+def test_trace_export_import():
+    """Test that trace_export module is importable."""
+    importlib.import_module("trace_export")
+
+
+def test_contact_graph_import():
+    """Test that contact_graph module is importable."""
+    importlib.import_module("contact_graph")
+
+
+def test_parameters_codec_import():
+    """Test that parameters_codec module is importable."""
+    importlib.import_module("parameters_codec")
+
+
+def test_update_compression_import():
+    """Test that update_compression module is importable."""
+    importlib.import_module("update_compression")
+
+
+def test_aggregation_import():
+    """Test that aggregation module is importable."""
+    importlib.import_module("aggregation")
+
+
+def test_secure_aggregation_import():
+    """Test that secure_aggregation module is importable."""
+    importlib.import_module("secure_aggregation")
+
+
+def test_differential_privacy_import():
+    """Test that differential_privacy module is importable."""
+    importlib.import_module("differential_privacy")
+
+
 def test_gpu_packages():
     try:
         subprocess.check_call(["nvidia-smi"])
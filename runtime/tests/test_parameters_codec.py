@@ -0,0 +1,88 @@
+import flwr as fl
+import numpy as np
+import pytest
+
+from parameters_codec import (
+    CODECS,
+    COMPRESSED_TENSOR_TYPE,
+    bytes_to_ndarray,
+    compress_ndarray,
+    decompress_ndarray,
+    ndarray_to_bytes,
+    ndarrays_to_parameters,
+    npy_size,
+    parameters_to_ndarrays,
+    raw_tensor_sizes,
+    varint_decode,
+    varint_encode,
+)
+
+rng = np.random.default_rng(0)
+ARRAYS = [
+    rng.standard_normal((3, 4)).astype(np.float32),
+    np.asfortranarray(rng.standard_normal((5, 2))),
+    rng.standard_normal((6, 8))[::2, 1:],  # non-contiguous
+    np.arange(-50, 50, dtype=np.int64).reshape(10, 10),
+    np.sort(rng.integers(0, 2**40, 100)),
+    np.array(7, dtype=np.int16),
+    np.zeros((0, 3), dtype=np.float64),
+    np.array([True, False, True]),
+]
+
+
+def assert_identical(result: np.ndarray, expected: np.ndarray):
+    assert result.dtype == expected.dtype
+    assert result.shape == expected.shape
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("ndarray", ARRAYS)
+def test_tensor_round_trip(ndarray):
+    """Test that tensors decode to the same array and are compatible with Flower."""
+    tensor = ndarray_to_bytes(ndarray)
+    assert_identical(bytes_to_ndarray(tensor), ndarray)
+    assert_identical(fl.common.bytes_to_ndarray(tensor), ndarray)
+    assert_identical(bytes_to_ndarray(fl.common.ndarray_to_bytes(ndarray)), ndarray)
+    assert not bytes_to_ndarray(tensor).flags.writeable
+    assert bytes_to_ndarray(tensor, writable=True).flags.writeable
+
+
+@pytest.mark.parametrize("ndarray", ARRAYS)
+@pytest.mark.parametrize("compression", ["auto", *CODECS])
+def test_compressed_tensor_round_trip(ndarray, compression):
+    """Test that every codec that accepts an array decodes it losslessly."""
+    if compression != "auto" and not CODECS[compression].accepts(ndarray):
+        with pytest.raises(ValueError):
+            compress_ndarray(ndarray, compression)
+        return
+    tensor = compress_ndarray(ndarray, compression)
+    assert_identical(decompress_ndarray(tensor), ndarray)
+    assert decompress_ndarray(tensor, writable=True).flags.writeable
+
+
+def test_auto_compression_is_no_larger():
+    """Test that auto compression keeps the smallest encoding."""
+    for ndarray in ARRAYS:
+        tensor = compress_ndarray(ndarray, "auto")
+        assert len(tensor) <= len(compress_ndarray(ndarray, "none"))
+
+
+@pytest.mark.parametrize("compression", [None, "none", "zlib", "auto"])
+def test_parameters_round_trip(compression):
+    """Test that Parameters decode to the same arrays and record raw sizes."""
+    parameters = ndarrays_to_parameters(ARRAYS, compression=compression)
+    if compression is not None:
+        assert parameters.tensor_type == COMPRESSED_TENSOR_TYPE
+    for result, expected in zip(parameters_to_ndarrays(parameters), ARRAYS):
+        assert_identical(result, expected)
+    assert raw_tensor_sizes(parameters) == [npy_size(ndarray) for ndarray in ARRAYS]
+
+
+def test_varint_round_trip():
+    """Test that varint encoding is the identity for the whole uint64 range."""
+    values = np.array([0, 1, 127, 128, 300, 2**35, 2**63, 2**64 - 1], dtype=np.uint64)
+    encoded = varint_encode(values)
+    assert len(encoded) == sum([1, 1, 1, 2, 2, 6, 10, 10])
+    np.testing.assert_array_equal(varint_decode(encoded), values)
+    with pytest.raises(ValueError):
+        varint_decode(encoded[:-1])
@@ -0,0 +1,157 @@
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+import numpy as np
+import pytest
+
+from secure_aggregation import (
+    FRACTIONAL_BITS,
+    KEY_SIZE,
+    SEED_SIZE,
+    SecAggClient,
+    SecAggServer,
+    _agree,
+    _mask_info,
+    _masking_public_key,
+    combined_mask,
+    _public_bytes,
+    decode_fixed_point,
+    encode_fixed_point,
+    pack_messages,
+    shamir_combine,
+    shamir_split,
+    unpack_messages,
+)
+
+
+def setup_clients(cids, threshold, num_rounds):
+    clients = {cid: SecAggClient(cid, num_rounds=num_rounds) for cid in cids}
+    server = SecAggServer(threshold)
+    public_keys = server.collect_public_keys(
+        unpack_messages(
+            pack_messages({cid: client.advertise() for cid, client in clients.items()})
+        )
+    )
+    routed = server.route_shares(
+        {
+            cid: unpack_messages(pack_messages(client.share(public_keys, threshold)))
+            for cid, client in clients.items()
+        }
+    )
+    for cid, client in clients.items():
+        client.receive(routed[cid])
+    return clients, server
+
+
+def run_round(clients, server, secagg_round, updates, like):
+    for cid, update in updates.items():
+        server.add_masked(cid, clients[cid].mask(update, secagg_round))
+    request = server.unmask_request()
+    revealed = {
+        cid: clients[cid].reveal(secagg_round, **request)
+        for cid in request["survivors"]
+    }
+    return server.unmask(secagg_round, revealed, like), revealed
+
+
+def test_fixed_point_round_trip():
+    """Test that encoding and decoding gives back values on the fixed-point grid."""
+    rng = np.random.default_rng(0)
+    ndarrays = [rng.standard_normal((3, 4)), rng.standard_normal(5).astype(np.float32)]
+    decoded = decode_fixed_point(encode_fixed_point(ndarrays), ndarrays)
+    for ndarray, result in zip(ndarrays, decoded):
+        assert result.shape == ndarray.shape
+        assert result.dtype == ndarray.dtype
+        np.testing.assert_allclose(result, ndarray, atol=2.0**-FRACTIONAL_BITS)
+    with pytest.raises(OverflowError):
+        encode_fixed_point([np.array([np.inf])])
+
+
+def test_shamir_threshold():
+    """Test that any threshold shares recover the secret and fewer don't."""
+    secret = bytes(range(KEY_SIZE))
+    xs = [1, 2, 3, 4, 5]
+    shares = dict(zip(xs, shamir_split(secret, xs, threshold=3)))
+    for subset in ([1, 2, 3], [2, 4, 5], xs):
+        assert shamir_combine({x: shares[x] for x in subset}, KEY_SIZE) == secret
+    with pytest.raises(OverflowError):
+        # Two shares interpolate to an unrelated field element
+        shamir_combine({x: shares[x] for x in [1, 2]}, KEY_SIZE)
+
+
+def test_unmask_with_dropouts_over_rounds():
+    """Test that sums are unmasked exactly when clients drop out in some rounds."""
+    rng = np.random.default_rng(0)
+    cids = ["a", "b", "c", "d"]
+    clients, server = setup_clients(cids, threshold=3, num_rounds=3)
+    like = [np.zeros((2, 3), dtype=np.float32), np.zeros(4)]
+    for secagg_round, survivors in enumerate([cids, ["a", "b", "d"], ["b", "c", "d"]]):
+        updates = {
+            cid: [rng.standard_normal(ndarray.shape) for ndarray in like]
+            for cid in survivors
+        }
+        result, _ = run_round(clients, server, secagg_round, updates, like)
+        for i, ndarray in enumerate(result):
+            expected = sum(update[i] for update in updates.values())
+            np.testing.assert_allclose(ndarray, expected, atol=1e-6)
+
+
+def test_dropout_reveals_only_its_round():
+    """Test that the server can't unmask the vector of a client that survives one round
+    and drops out of the next."""
+    cids = ["a", "b", "c"]
+    clients, server = setup_clients(cids, threshold=2, num_rounds=2)
+    like = [np.zeros(8)]
+    updates = {cid: [np.full(8, i + 1.0)] for i, cid in enumerate(cids)}
+    masked_c = clients["c"].mask(updates["c"], 0)
+    server.add_masked("c", masked_c)
+    for cid in ["a", "b"]:
+        server.add_masked(cid, clients[cid].mask(updates[cid], 0))
+    revealed_0 = {
+        cid: clients[cid].reveal(0, **server.unmask_request()) for cid in cids
+    }
+    server.unmask(0, revealed_0, like)
+    del updates["c"]
+    _, revealed_1 = run_round(clients, server, 1, updates, like)
+
+    # Everything the server learned about c: its round 0 self-mask seed and the
+    # masking key it revealed in round 1
+    points = {"a": 1, "b": 2, "c": 3}
+    self_seed = shamir_combine(
+        {points[cid]: shares["c"] for cid, shares in revealed_0.items()}, SEED_SIZE
+    )
+    masking_key = X25519PrivateKey.from_private_bytes(
+        shamir_combine(
+            {points[cid]: shares["c"] for cid, shares in revealed_1.items()}, KEY_SIZE
+        )
+    )
+    public_keys = server.public_keys
+    assert _public_bytes(masking_key) == _masking_public_key(public_keys["c"], 1)
+    seeds = [self_seed] + [
+        _agree(masking_key, _masking_public_key(public_keys[cid], 0), _mask_info(0))
+        for cid in ["a", "b"]
+    ]
+    attempt = masked_c - combined_mask(seeds, [1, -1, -1], len(masked_c))
+    assert not np.allclose(decode_fixed_point(attempt, like)[0], 3.0)
+
+
+def test_reveal_checks():
+    """Test that clients refuse requests that would expose a client's update."""
+    cids = ["a", "b", "c"]
+    clients, _ = setup_clients(cids, threshold=2, num_rounds=2)
+    with pytest.raises(ValueError):
+        clients["a"].reveal(0, survivors=["a", "b"], dropped=["b", "c"])
+    with pytest.raises(ValueError):
+        clients["a"].reveal(0, survivors=["a"], dropped=["b", "c"])
+    clients["a"].reveal(0, survivors=["a", "b"], dropped=["c"])
+    with pytest.raises(ValueError):
+        clients["a"].reveal(0, survivors=["a", "b", "c"], dropped=[])
+    assert len(clients["a"].reveal(1, survivors=cids, dropped=[])["b"]) > SEED_SIZE
+
+
+@pytest.mark.parametrize("like", [[], [np.zeros((0, 3))]], ids=["no arrays", "empty"])
+def test_empty_update(like):
+    """Test that updates without values are masked and unmasked."""
+    cids = ["a", "b", "c"]
+    clients, server = setup_clients(cids, threshold=2, num_rounds=1)
+    updates = {cid: [np.zeros_like(ndarray) for ndarray in like] for cid in cids[:2]}
+    result, _ = run_round(clients, server, 0, updates, like)
+    assert [ndarray.shape for ndarray in result] == [ndarray.shape for ndarray in like]
@@ -0,0 +1,98 @@
+import flwr as fl
+from flwr.common import FitIns, ndarrays_to_parameters, parameters_to_ndarrays
+from flwr.server.client_manager import SimpleClientManager
+import numpy as np
+import pytest
+
+from aggregation import FedAvgAggregator
+from simulation import InProcessClientProxy, StreamingServer, accumulates_fit
+
+
+class Client(fl.client.NumPyClient):
+    def __init__(self, cid):
+        self.cid = cid
+
+    def fit(self, parameters, config):
+        if self.cid == "failing":
+            raise RuntimeError("Client failed.")
+        value = float(self.cid)
+        return [parameters[0] + value], int(self.cid), {"cid": self.cid}
+
+
+class Strategy(fl.server.strategy.Strategy):
+    def __init__(self):
+        self.aggregator = FedAvgAggregator()
+        self.accumulated = []
+        self.aggregated = None
+
+    def initialize_parameters(self, client_manager):
+        return None
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        fit_ins = FitIns(ndarrays_to_parameters([np.zeros(3)]), {})
+        return [(client, fit_ins) for client in client_manager.all().values()]
+
+    def aggregate_fit(self, server_round, results, failures):
+        self.aggregated = (results, failures)
+        if self.accumulated:
+            ndarrays = self.aggregator.result()
+        else:
+            for _, fit_res in results:
+                self.aggregator.add_fit_res(fit_res)
+            ndarrays = self.aggregator.result()
+        return ndarrays_to_parameters(ndarrays), {}
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        return []
+
+    def aggregate_evaluate(self, server_round, results, failures):
+        return None, {}
+
+    def evaluate(self, server_round, parameters):
+        return None
+
+
+class AccumulatingStrategy(Strategy):
+    def accumulate_fit(self, server_round, client_proxy, fit_res):
+        self.accumulated.append(client_proxy.cid)
+        self.aggregator.add_fit_res(fit_res)
+
+
+class WrapperStrategy(Strategy):
+    def __init__(self, solution_strategy):
+        super().__init__()
+        self.solution_strategy = solution_strategy
+
+
+def run_fit_round(strategy, cids, max_workers=2):
+    server = StreamingServer(client_manager=SimpleClientManager(), strategy=strategy)
+    server.set_max_workers(max_workers)
+    for cid in cids:
+        server.client_manager().register(InProcessClientProxy(Client, cid))
+    return server.fit_round(server_round=1, timeout=None)
+
+
+@pytest.mark.parametrize("strategy_class", [Strategy, AccumulatingStrategy])
+def test_fit_round(strategy_class):
+    """Test that rounds aggregate the same parameters with and without accumulate_fit,
+    and that accumulated results are passed to aggregate_fit without parameters."""
+    strategy = strategy_class()
+    cids = ["1", "2", "3", "failing"]
+    parameters, _, (results, failures) = run_fit_round(strategy, cids)
+    (mean,) = parameters_to_ndarrays(parameters)
+    np.testing.assert_allclose(mean, np.full(3, (1 + 4 + 9) / 6))
+    assert sorted(client.cid for client, _ in results) == ["1", "2", "3"]
+    assert len(failures) == 1
+    assert strategy.aggregated == (results, failures)
+    if strategy_class is AccumulatingStrategy:
+        assert sorted(strategy.accumulated) == ["1", "2", "3"]
+        assert all(not fit_res.parameters.tensors for _, fit_res in results)
+    assert all(fit_res.metrics["cid"] == client.cid for client, fit_res in results)
+
+
+def test_accumulates_fit_looks_through_wrappers():
+    """Test that wrapper strategies accumulate if the strategy they wrap does."""
+    assert accumulates_fit(AccumulatingStrategy())
+    assert not accumulates_fit(Strategy())
+    assert accumulates_fit(WrapperStrategy(AccumulatingStrategy()))
+    assert not accumulates_fit(WrapperStrategy(Strategy()))
@@ -0,0 +1,85 @@
+import concurrent.futures
+import functools
+import threading
+
+import pandas as pd
+
+from post_federated import summarize_calls
+from supervisor import CallMeasurement, ClientInstanceCache
+
+
+def test_call_measurement_overlap():
+    """Test that process-wide measurements are only kept for calls that didn't overlap
+    another call."""
+    alone = CallMeasurement().finish()
+    assert set(alone) == {
+        "wall_time",
+        "user_cpu_time",
+        "system_cpu_time",
+        "peak_rss_delta_kb",
+    }
+    first = CallMeasurement()
+    second = CallMeasurement()
+    assert list(second.finish()) == ["wall_time"]
+    # Overlapped by the second call, although the second call has finished
+    assert list(first.finish()) == ["wall_time"]
+    assert len(CallMeasurement().finish()) == 4
+
+
+def test_summarize_calls():
+    """Test that measurements are only summarized if every call has them."""
+    calls_df = pd.DataFrame(
+        {
+            "cid": ["a", "a", "b"],
+            "method": ["fit", "fit", "fit"],
+            "round": [1, 2, 1],
+            "wall_time": [1.0, 2.0, 3.0],
+            "user_cpu_time": [0.5, None, 1.0],
+            "system_cpu_time": [0.1, None, 0.2],
+            "peak_rss_delta_kb": [10, None, 20],
+            "request_bytes": [100, 200, 300],
+            "response_bytes": [None, None, None],
+        }
+    )
+    summary = summarize_calls(calls_df)
+    assert summary["a"]["fit"] == {
+        "num_calls": 2,
+        "wall_time": 3.0,
+        "request_bytes": 300.0,
+        "wall_time_by_round": {"1": 1.0, "2": 2.0},
+    }
+    assert summary["b"]["fit"]["user_cpu_time"] == 1.0
+    assert summary["b"]["fit"]["max_peak_rss_delta_kb"] == 20.0
+
+
+def test_client_instance_cache_concurrent():
+    """Test that concurrent calls for a key create one instance, and that instances for
+    different keys are created concurrently."""
+    cache = ClientInstanceCache(max_size=10)
+    created = []
+    # Creating an instance waits for the creation of another instance
+    barrier = threading.Barrier(2, timeout=5)
+
+    def create(cid):
+        created.append(cid)
+        barrier.wait()
+        return object()
+
+    cids = ["a", "b"] * 4
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(cids)) as executor:
+        futures = [
+            executor.submit(
+                cache.get_or_create,
+                (cid, "train", "fit"),
+                functools.partial(create, cid),
+            )
+            for cid in cids
+        ]
+        results = [future.result() for future in futures]
+    assert sorted(created) == ["a", "b"]
+    for cid in ["a", "b"]:
+        assert (
+            len({id(instance) for c, (instance, _) in zip(cids, results) if c == cid})
+            == 1
+        )
+    assert sum(cached for _, cached in results) == len(cids) - 2
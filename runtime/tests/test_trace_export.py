@@ -0,0 +1,51 @@
+import json
+
+from trace_export import build_trace_events
+
+
+def write_jsonl(path, records):
+    with path.open("w") as fp:
+        for record in records:
+            fp.write(json.dumps(record) + "\n")
+
+
+def test_numeric_cids(tmp_path):
+    """Test that client IDs that look like numbers get their own tracks, including
+    clients that only appear in the capture manifest."""
+    log = []
+    for i, (cid, method) in enumerate(
+        [("server", "configure_fit"), ("0", "fit"), ("01", "fit")]
+    ):
+        for event, timestamp in [("start", i), ("end", i + 0.5)]:
+            log.append(
+                {"timestamp": timestamp, "cid": cid, "method": method, "event": event}
+            )
+    log[0]["round"] = 1
+    manifest = [
+        {
+            "cid": cid,
+            "method": "fit",
+            "dataclass": "FitRes",
+            "timestamp": 1.0,
+            "path": f"{cid}.pb",
+            "num_bytes": 10,
+            "write_start": 1.1,
+            "write_seconds": 0.1,
+        }
+        for cid in ["0", "7"]
+    ]
+    write_jsonl(tmp_path / "train.log", log)
+    write_jsonl(tmp_path / "manifest.jsonl", manifest)
+
+    events = build_trace_events(tmp_path / "train.log", tmp_path / "manifest.jsonl")
+    tracks = {
+        event["args"]["name"]: event["tid"]
+        for event in events
+        if event["name"] == "thread_name"
+    }
+    assert list(tracks) == ["server", "0", "0 capture", "01", "7", "7 capture"]
+    spans = {(event["name"], event["tid"]) for event in events if event["ph"] == "X"}
+    assert ("fit", tracks["0"]) in spans
+    assert ("fit", tracks["01"]) in spans
+    assert ("capture fit FitRes", tracks["0 capture"]) in spans
+    assert ("capture fit FitRes", tracks["7 capture"]) in spans
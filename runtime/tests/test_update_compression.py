@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from parameters_codec import frame_tensor, ndarrays_to_parameters, npy_size
+from update_compression import (
+    LowRankCodec,
+    QuantizeCodec,
+    TopKCodec,
+    UpdateEncoder,
+    aggregate,
+    decode_parameters,
+    decode_tensor,
+)
+
+CODECS = [
+    QuantizeCodec(bits=8, block_size=64, seed=0),
+    QuantizeCodec(bits=4, block_size=64, seed=0),
+    TopKCodec(fraction=0.1),
+    LowRankCodec(rank=4, seed=0),
+]
+
+
+def encode(codec, ndarray):
+    return frame_tensor(codec, npy_size(ndarray), codec.encode(ndarray))
+
+
+@pytest.mark.parametrize("bits", [8, 4])
+def test_quantize_error_and_bias(bits):
+    """Test that quantized values are within one level and unbiased on average."""
+    rng = np.random.default_rng(0)
+    ndarray = rng.standard_normal((40, 30)).astype(np.float32)
+    codec = QuantizeCodec(bits=bits, block_size=100, seed=0)
+    blocks = ndarray.reshape(-1, 100)
+    levels = (blocks.max(axis=1) - blocks.min(axis=1)) / (2**bits - 1)
+    decoded = [decode_tensor(encode(codec, ndarray)) for _ in range(200)]
+    assert decoded[0].shape == ndarray.shape
+    assert decoded[0].dtype == ndarray.dtype
+    assert (np.abs(decoded[0] - ndarray).reshape(-1, 100) <= levels[:, None]).all()
+    np.testing.assert_allclose(
+        np.mean(decoded, axis=0), ndarray, atol=0.25 * levels.max()
+    )
+
+
+def test_topk_keeps_largest_values():
+    """Test that top-k keeps the largest values by magnitude and zeros the rest."""
+    ndarray = np.array([0.1, -5.0, 0.2, 3.0, -0.3, 0.0, 4.0, 0.05, -0.01, 0.02])
+    decoded = decode_tensor(encode(TopKCodec(fraction=0.3), ndarray))
+    np.testing.assert_array_equal(decoded, np.where(np.abs(ndarray) >= 3, ndarray, 0))
+
+
+def test_lowrank_is_exact_for_low_rank_matrices():
+    """Test that matrices of rank at most the codec's rank are recovered."""
+    rng = np.random.default_rng(0)
+    ndarray = (rng.standard_normal((50, 3)) @ rng.standard_normal((3, 40))).astype(
+        np.float32
+    )
+    decoded = decode_tensor(encode(LowRankCodec(rank=3, seed=0), ndarray))
+    np.testing.assert_allclose(decoded, ndarray, atol=1e-4)
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_aggregate_matches_decoded_mean(codec):
+    """Test that vectorized aggregation equals the weighted mean of decoded arrays,
+    also when mixed with uncompressed and losslessly compressed arrays."""
+    rng = np.random.default_rng(0)
+    updates = [rng.standard_normal((32, 48)).astype(np.float32) for _ in range(4)]
+    weights = [1.0, 2.0, 3.0, 4.0]
+    encoder = UpdateEncoder(codec, error_feedback=False, min_size=0)
+    parameters_list = [encoder.encode([update]) for update in updates[:3]]
+    parameters_list.append(ndarrays_to_parameters(updates[3:], compression="zlib"))
+    decoded = [decode_parameters(parameters)[0] for parameters in parameters_list]
+    expected = sum(w * d.astype(np.float64) for w, d in zip(weights, decoded))
+    result = aggregate(parameters_list, weights)[0]
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, expected / sum(weights), rtol=1e-5, atol=1e-5)
+
+
+def test_error_feedback(tmp_path):
+    """Test that error feedback carries the compression error into the next update,
+    through saved residuals, and that small arrays are sent losslessly."""
+    rng = np.random.default_rng(0)
+    updates = [rng.standard_normal(1000) for _ in range(5)]
+    small = np.arange(10, dtype=np.float32)
+    total_sent = 0.0
+    for update in updates:
+        encoder = UpdateEncoder(TopKCodec(fraction=0.05), min_size=100)
+        encoder.load_residuals(tmp_path / "residuals.npz")
+        sent, sent_small = decode_parameters(encoder.encode([update, small]))
+        encoder.save_residuals(tmp_path / "residuals.npz")
+        np.testing.assert_array_equal(sent_small, small)
+        total_sent = total_sent + sent
+    np.testing.assert_allclose(
+        total_sent + encoder.residuals[0], sum(updates), atol=1e-12
+    )
@@ -0,0 +1,172 @@
+"""Export a federated run's supervisor log as a Chrome trace.
+
+The trace has one track per client and one for the server strategy, with a span for
+each supervised method call, instant markers at the start of each server round, and,
+if the capture manifest is given, a track per client with the spans of writing its
+captured communications to disk. Open it in Perfetto (https://ui.perfetto.dev) or
+chrome://tracing:
+
+    python trace_export.py scenario01-train.log --manifest manifest.jsonl \\
+        --output scenario01-train-trace.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+from resource_monitor import CALL_METRIC_FIELDS, load_supervisor_calls
+
+SERVER_CID = "server"
+
+
+def _microseconds(seconds: float) -> float:
+    return seconds * 1e6
+
+
+def build_trace_events(
+    log_path: Path, manifest_path: Optional[Path] = None, process_name: str = ""
+) -> List[dict]:
+    """Chrome trace events for the calls in a supervisor log and, optionally, the
+    capture writes in a capture manifest."""
+    calls_df = load_supervisor_calls(log_path)
+    manifest_df = None
+    if manifest_path is not None and Path(manifest_path).exists():
+        manifest_df = pd.read_json(
+            manifest_path, lines=True, convert_dates=False, dtype={"cid": str}
+        )
+        if "write_start" not in manifest_df:
+            # Manifest from before capture writes were timed
+            manifest_df = None
+
+    # Server track first, then client tracks in order of first appearance in the log
+    # and then in the manifest, since clients whose calls weren't logged (e.g., a
+    # truncated log) may still have written captures. Capture tracks come right after
+    # their client's track.
+    all_cids = calls_df["cid"]
+    if manifest_df is not None:
+        all_cids = pd.concat([all_cids, manifest_df["cid"]])
+    cids = [SERVER_CID] + [
+        cid for cid in all_cids.drop_duplicates() if cid != SERVER_CID
+    ]
+    track_ids = {}
+    events = [
+        {
+            "ph": "M",
+            "name": "process_name",
+            "pid": 1,
+            "args": {"name": process_name or Path(log_path).stem},
+        }
+    ]
+    for cid in cids:
+        tracks = [(cid, cid)]
+        if manifest_df is not None and (manifest_df["cid"] == cid).any():
+            tracks.append(((cid, "capture"), f"{cid} capture"))
+        for key, name in tracks:
+            track_ids[key] = len(track_ids) + 1
+            events.append(
+                {
+                    "ph": "M",
+                    "name": "thread_name",
+                    "pid": 1,
+                    "tid": track_ids[key],
+                    "args": {"name": name},
+                }
+            )
+            events.append(
+                {
+                    "ph": "M",
+                    "name": "thread_sort_index",
+                    "pid": 1,
+                    "tid": track_ids[key],
+                    "args": {"sort_index": track_ids[key]},
+                }
+            )
+
+    for call in calls_df.itertuples(index=False):
+        args = {
+            field: float(getattr(call, field))
+            for field in CALL_METRIC_FIELDS
+            if pd.notna(getattr(call, field))
+        }
+        if pd.notna(call.round):
+            args["round"] = int(call.round)
+        events.append(
+            {
+                "ph": "X",
+                "name": call.method,
+                "cat": "server" if call.cid == SERVER_CID else "client",
+                "pid": 1,
+                "tid": track_ids[call.cid],
+                "ts": _microseconds(call.start),
+                "dur": _microseconds(call.end - call.start),
+                "args": args,
+            }
+        )
+
+    # Mark the start of each round at the first strategy call for that round
+    server_calls = calls_df[(calls_df["cid"] == SERVER_CID) & calls_df["round"].notna()]
+    for server_round, start in server_calls.groupby("round")["start"].min().items():
+        events.append(
+            {
+                "ph": "i",
+                "s": "g",
+                "name": f"Round {int(server_round)}",
+                "cat": "round",
+                "pid": 1,
+                "tid": track_ids[SERVER_CID],
+                "ts": _microseconds(start),
+            }
+        )
+
+    if manifest_df is not None:
+        for record in manifest_df.itertuples(index=False):
+            events.append(
+                {
+                    "ph": "X",
+                    "name": f"capture {record.method} {record.dataclass}",
+                    "cat": "capture",
+                    "pid": 1,
+                    "tid": track_ids[(record.cid, "capture")],
+                    "ts": _microseconds(record.write_start),
+                    "dur": _microseconds(record.write_seconds),
+                    "args": {
+                        "path": record.path,
+                        "num_bytes": int(record.num_bytes),
+                        "raw_num_bytes": int(
+                            getattr(record, "raw_num_bytes", record.num_bytes)
+                        ),
+                        "queued_seconds": float(record.write_start - record.timestamp),
+                    },
+                }
+            )
+    return events
+
+
+def export_trace(
+    log_path: Path,
+    output_path: Path,
+    manifest_path: Optional[Path] = None,
+    process_name: str = "",
+):
+    """Write the Chrome trace of a supervisor log to output_path."""
+    events = build_trace_events(
+        log_path, manifest_path=manifest_path, process_name=process_name
+    )
+    with Path(output_path).open("w") as fp:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log_path", type=Path, help="Federated supervisor log")
+    parser.add_argument("--manifest", type=Path, help="Capture manifest")
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+    export_trace(args.log_path, args.output, manifest_path=args.manifest)
+
+
+if __name__ == "__main__":
+    main()
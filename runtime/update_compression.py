@@ -0,0 +1,493 @@
+"""Lossy compression of model updates sent in FitRes, with vectorized server-side
+decoding and aggregation.
+
+Clients encode the arrays they return from fit with an UpdateEncoder and one of the
+lossy codecs, usually as the difference to the parameters that they received:
+
+    encoder = UpdateEncoder(QuantizeCodec(bits=8))
+    parameters = encoder.encode(new_weights, reference=received_weights)
+
+The codecs are stochastic quantization to 8 or 4 bits (QuantizeCodec), the k largest
+values by magnitude (TopKCodec), and a randomized low-rank sketch of matrices
+(LowRankCodec). The encoder keeps the compression error of each array and adds it to
+the next update that it encodes (error feedback), so that no part of an update is
+lost for good. Small and non-float arrays are sent with lossless compression.
+
+Encoded tensors use the compressed tensor format of parameters_codec, so the capture
+manifest reports their uncompressed size as raw_num_bytes. On the server, aggregate
+computes the weighted mean of encoded updates without decoding each client's arrays
+separately, and CompressedFedAvg is FedAvg for clients that send encoded updates.
+"""
+
+import math
+from pathlib import Path
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import flwr as fl
+from flwr.common.typing import FitRes, Parameters, Scalar
+from flwr.server.client_proxy import ClientProxy
+import numpy as np
+
+from parameters_codec import (
+    COMPRESSED_TENSOR_TYPE,
+    Buffers,
+    Codec,
+    NDArrays,
+    compress_ndarray,
+    decompress_ndarray,
+    frame_tensor,
+    ndarrays_to_parameters,
+    npy_header,
+    npy_size,
+    parameters_to_ndarrays,
+    read_frame,
+    read_npy_header,
+    varint_decode,
+    varint_encode,
+)
+
+# Number of values dequantized at once when aggregating quantized updates
+AGGREGATION_CHUNK_SIZE = 1 << 22
+
+
+def _read_struct(payload: memoryview, offset: int, fmt: struct.Struct):
+    return fmt.unpack(payload[offset : offset + fmt.size]), offset + fmt.size
+
+
+def _read_array(payload: memoryview, offset: int, dtype, count: int):
+    array = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+    return array, offset + array.nbytes
+
+
+class LossyCodec(Codec):
+    """Lossy encoding of float arrays. aggregate computes the weighted sum of several
+    encoded arrays with the same shape."""
+
+    def accepts(self, ndarray: np.ndarray) -> bool:
+        return ndarray.dtype.kind == "f"
+
+    def aggregate(
+        self, payloads: Sequence[memoryview], weights: np.ndarray
+    ) -> np.ndarray:
+        return sum(
+            weight * self.decode(payload).astype(np.float64)
+            for payload, weight in zip(payloads, weights)
+        )
+
+
+class QuantizeCodec(LossyCodec):
+    """Stochastic uniform quantization to 8 or 4 bits per value. Each block of
+    block_size values has its own range. Values are rounded up or down at random,
+    in proportion to their distance to the two nearest levels, so that decoded values
+    are unbiased."""
+
+    name = "quantize"
+    params = struct.Struct("<BI")
+
+    def __init__(
+        self, bits: int = 8, block_size: int = 1024, seed: Optional[int] = None
+    ):
+        if bits not in (4, 8):
+            raise ValueError(f"Quantization bits must be 4 or 8, got {bits}.")
+        if block_size % 2 != 0:
+            raise ValueError("Quantization block size must be even.")
+        self.bits = bits
+        self.block_size = block_size
+        self.rng = np.random.default_rng(seed)
+
+    def encode(self, ndarray: np.ndarray) -> Buffers:
+        values = ndarray.ravel(order="A").astype(np.float32)
+        num_blocks = math.ceil(len(values) / self.block_size)
+        levels = 2**self.bits - 1
+        # Pad with the last value, which doesn't change the last block's range
+        blocks = np.pad(
+            values, (0, num_blocks * self.block_size - len(values)), mode="edge"
+        ).reshape(num_blocks, self.block_size)
+        mins = blocks.min(axis=1)
+        scales = (blocks.max(axis=1) - mins) / levels
+        scales[scales == 0] = 1.0
+        blocks -= mins[:, None]
+        blocks /= scales[:, None]
+        blocks += self.rng.random(blocks.shape, dtype=np.float32)
+        codes = np.clip(np.floor(blocks), 0, levels).astype(np.uint8).ravel()
+        if self.bits == 4:
+            codes = codes[0::2] | (codes[1::2] << 4)
+        return [
+            npy_header(ndarray),
+            self.params.pack(self.bits, self.block_size),
+            mins,
+            scales.astype(np.float32),
+            codes,
+        ]
+
+    def _read(self, payload: memoryview):
+        shape, fortran_order, dtype, offset = read_npy_header(payload)
+        (bits, block_size), offset = _read_struct(payload, offset, self.params)
+        num_blocks = math.ceil(math.prod(shape) / block_size)
+        mins, offset = _read_array(payload, offset, np.float32, num_blocks)
+        scales, offset = _read_array(payload, offset, np.float32, num_blocks)
+        num_codes = num_blocks * block_size * bits // 8
+        codes, _ = _read_array(payload, offset, np.uint8, num_codes)
+        return (shape, fortran_order, dtype, bits, block_size), mins, scales, codes
+
+    @staticmethod
+    def _unpack(codes: np.ndarray, bits: int) -> np.ndarray:
+        """Codes as one uint8 per value. codes has one row per encoded array."""
+        if bits == 8:
+            return codes
+        unpacked = np.empty(codes.shape[:-1] + (2 * codes.shape[-1],), np.uint8)
+        unpacked[..., 0::2] = codes & 0x0F
+        unpacked[..., 1::2] = codes >> 4
+        return unpacked
+
+    def decode(self, payload: memoryview) -> np.ndarray:
+        layout, mins, scales, codes = self._read(payload)
+        shape, fortran_order, dtype, bits, block_size = layout
+        blocks = self._unpack(codes, bits).reshape(len(mins), block_size)
+        values = (blocks * scales[:, None] + mins[:, None]).ravel()
+        return (
+            values[: math.prod(shape)]
+            .astype(dtype)
+            .reshape(shape, order="F" if fortran_order else "C")
+        )
+
+    def aggregate(
+        self, payloads: Sequence[memoryview], weights: np.ndarray
+    ) -> np.ndarray:
+        reads = [self._read(payload) for payload in payloads]
+        layout = reads[0][0]
+        if any(read[0] != layout for read in reads):
+            # Arrays quantized with different settings
+            return super().aggregate(payloads, weights)
+        shape, fortran_order, _, bits, block_size = layout
+        # sum_i w_i * (codes_i * scales_i + mins_i), dequantizing a chunk of blocks of
+        # one client at a time into a buffer, so memory use doesn't grow with the
+        # number of clients
+        num_blocks = len(reads[0][1])
+        codes_per_block = block_size * bits // 8
+        chunk_blocks = max(1, AGGREGATION_CHUNK_SIZE // block_size)
+        buffer = np.empty((min(chunk_blocks, num_blocks), block_size), np.float32)
+        total = np.zeros((num_blocks, block_size), dtype=np.float32)
+        for (_, mins, scales, codes), weight in zip(reads, weights):
+            weighted_scales = (weight * scales).astype(np.float32)
+            for start in range(0, num_blocks, chunk_blocks):
+                stop = min(start + chunk_blocks, num_blocks)
+                chunk_codes = self._unpack(
+                    codes[start * codes_per_block : stop * codes_per_block], bits
+                ).reshape(stop - start, block_size)
+                chunk = buffer[: stop - start]
+                np.multiply(chunk_codes, weighted_scales[start:stop, None], out=chunk)
+                total[start:stop] += chunk
+        total += sum(
+            weight * read[1].astype(np.float64) for read, weight in zip(reads, weights)
+        ).astype(np.float32)[:, None]
+        return total.ravel()[: math.prod(shape)].reshape(
+            shape, order="F" if fortran_order else "C"
+        )
+
+
+class TopKCodec(LossyCodec):
+    """The k values with the largest magnitudes, with k the given fraction of the
+    array's size, and zeros elsewhere. Positions are delta- and varint-encoded."""
+
+    name = "topk"
+    params = struct.Struct("<QQ")
+
+    def __init__(self, fraction: float = 0.01):
+        if not 0 < fraction <= 1:
+            raise ValueError(f"Top-k fraction must be in (0, 1], got {fraction}.")
+        self.fraction = fraction
+
+    def encode(self, ndarray: np.ndarray) -> Buffers:
+        values = ndarray.ravel(order="A")
+        k = min(len(values), math.ceil(self.fraction * len(values)))
+        start = len(values) - k
+        positions = np.sort(np.argpartition(np.abs(values), start)[start:])
+        encoded_positions = varint_encode(
+            np.diff(positions, prepend=0).astype(np.uint64)
+        )
+        return [
+            npy_header(ndarray),
+            self.params.pack(k, len(encoded_positions)),
+            np.ascontiguousarray(values[positions]),
+            encoded_positions,
+        ]
+
+    def _read(self, payload: memoryview):
+        shape, fortran_order, dtype, offset = read_npy_header(payload)
+        (k, positions_size), offset = _read_struct(payload, offset, self.params)
+        values, offset = _read_array(payload, offset, dtype, k)
+        encoded_positions, _ = _read_array(payload, offset, np.uint8, positions_size)
+        positions = np.cumsum(varint_decode(encoded_positions)).astype(np.intp)
+        return shape, fortran_order, dtype, values, positions
+
+    def decode(self, payload: memoryview) -> np.ndarray:
+        shape, fortran_order, dtype, values, positions = self._read(payload)
+        dense = np.zeros(math.prod(shape), dtype=dtype)
+        dense[positions] = values
+        return dense.reshape(shape, order="F" if fortran_order else "C")
+
+    def aggregate(
+        self, payloads: Sequence[memoryview], weights: np.ndarray
+    ) -> np.ndarray:
+        reads = [self._read(payload) for payload in payloads]
+        shape, fortran_order = reads[0][:2]
+        # Scatter-add the weighted values of all clients at once
+        total = np.bincount(
+            np.concatenate([read[4] for read in reads]),
+            weights=np.concatenate(
+                [
+                    weight * read[3].astype(np.float64)
+                    for read, weight in zip(reads, weights)
+                ]
+            ),
+            minlength=math.prod(shape),
+        )
+        return total.reshape(shape, order="F" if fortran_order else "C")
+
+
+class LowRankCodec(LossyCodec):
+    """Rank-r approximation Q @ B of an array as a matrix with one row per index of
+    its first axis, from a randomized range sketch with power iterations. Only arrays
+    whose factors are smaller than the array are accepted."""
+
+    name = "lowrank"
+    params = struct.Struct("<QQQ")
+
+    def __init__(
+        self, rank: int = 4, power_iterations: int = 1, seed: Optional[int] = None
+    ):
+        self.rank = rank
+        self.power_iterations = power_iterations
+        self.rng = np.random.default_rng(seed)
+
+    def _matrix_shape(self, ndarray: np.ndarray) -> Tuple[int, int]:
+        return ndarray.shape[0], math.prod(ndarray.shape[1:])
+
+    def accepts(self, ndarray: np.ndarray) -> bool:
+        if not super().accepts(ndarray) or ndarray.ndim < 2:
+            return False
+        m, n = self._matrix_shape(ndarray)
+        return min(self.rank, m, n) * (m + n) < m * n
+
+    def encode(self, ndarray: np.ndarray) -> Buffers:
+        ndarray = np.ascontiguousarray(ndarray)
+        m, n = self._matrix_shape(ndarray)
+        matrix = ndarray.reshape(m, n).astype(np.float32, copy=False)
+        rank = min(self.rank, m, n)
+        sketch = matrix @ self.rng.standard_normal((n, rank), dtype=np.float32)
+        basis, _ = np.linalg.qr(sketch)
+        for _ in range(self.power_iterations):
+            basis, _ = np.linalg.qr(matrix @ (matrix.T @ basis))
+        coefficients = basis.T @ matrix
+        return [
+            npy_header(ndarray),
+            self.params.pack(m, n, rank),
+            np.ascontiguousarray(basis, dtype=np.float32),
+            np.ascontiguousarray(coefficients, dtype=np.float32),
+        ]
+
+    def _read(self, payload: memoryview):
+        shape, _, dtype, offset = read_npy_header(payload)
+        (m, n, rank), offset = _read_struct(payload, offset, self.params)
+        basis, offset = _read_array(payload, offset, np.float32, m * rank)
+        coefficients, _ = _read_array(payload, offset, np.float32, rank * n)
+        return shape, dtype, basis.reshape(m, rank), coefficients.reshape(rank, n)
+
+    def decode(self, payload: memoryview) -> np.ndarray:
+        shape, dtype, basis, coefficients = self._read(payload)
+        return (basis @ coefficients).astype(dtype).reshape(shape)
+
+    def aggregate(
+        self, payloads: Sequence[memoryview], weights: np.ndarray
+    ) -> np.ndarray:
+        reads = [self._read(payload) for payload in payloads]
+        # sum_i w_i Q_i B_i as one product of the stacked factors
+        weighted_bases = np.hstack(
+            [
+                weight * read[2].astype(np.float64)
+                for read, weight in zip(reads, weights)
+            ]
+        )
+        coefficients = np.vstack([read[3] for read in reads])
+        return (weighted_bases @ coefficients).reshape(reads[0][0])
+
+
+# Encoded arrays are self-describing, so any instance of a codec decodes them
+LOSSY_CODECS: Dict[str, LossyCodec] = {
+    codec.name: codec for codec in [QuantizeCodec(), TopKCodec(), LowRankCodec()]
+}
+
+
+class UpdateEncoder:
+    """Client-side encoder of the arrays returned from fit with a lossy codec.
+
+    Arrays that the codec doesn't accept, or that have fewer than min_size values, are
+    compressed with the lossless compression instead. With error_feedback, the
+    difference between each array and its decoded value is added to the array at the
+    same position in the next call to encode. Clients that aren't kept between rounds
+    can persist this state with save_residuals and load_residuals.
+    """
+
+    def __init__(
+        self,
+        codec: LossyCodec,
+        error_feedback: bool = True,
+        min_size: int = 1024,
+        compression: str = "none",
+    ):
+        self.codec = codec
+        self.error_feedback = error_feedback
+        self.min_size = min_size
+        self.compression = compression
+        self.residuals: Dict[int, np.ndarray] = {}
+
+    def encode_ndarray(self, ndarray: np.ndarray, position: int = 0) -> bytes:
+        ndarray = np.asanyarray(ndarray)
+        if ndarray.size < self.min_size or not self.codec.accepts(ndarray):
+            return compress_ndarray(ndarray, self.compression)
+        if self.error_feedback and position in self.residuals:
+            ndarray = ndarray + self.residuals[position]
+        tensor = frame_tensor(self.codec, npy_size(ndarray), self.codec.encode(ndarray))
+        if self.error_feedback:
+            self.residuals[position] = ndarray - decode_tensor(tensor)
+        return tensor
+
+    def encode(
+        self, ndarrays: NDArrays, reference: Optional[NDArrays] = None
+    ) -> Parameters:
+        """Encode arrays as Parameters. If reference is given, the differences between
+        the arrays and the reference arrays are encoded instead."""
+        if reference is not None:
+            ndarrays = [
+                np.subtract(ndarray, reference_ndarray)
+                for ndarray, reference_ndarray in zip(ndarrays, reference)
+            ]
+        tensors = [
+            self.encode_ndarray(ndarray, position)
+            for position, ndarray in enumerate(ndarrays)
+        ]
+        return Parameters(tensors=tensors, tensor_type=COMPRESSED_TENSOR_TYPE)
+
+    def save_residuals(self, path: Path):
+        np.savez(path, **{str(position): r for position, r in self.residuals.items()})
+
+    def load_residuals(self, path: Path):
+        """Load residuals saved by save_residuals, if path exists."""
+        if Path(path).exists():
+            with np.load(path) as residuals:
+                self.residuals = {int(key): residuals[key] for key in residuals.files}
+
+
+def decode_tensor(tensor: bytes) -> np.ndarray:
+    """Decode a compressed tensor, lossy or lossless."""
+    name, _, payload = read_frame(tensor)
+    if name in LOSSY_CODECS:
+        return LOSSY_CODECS[name].decode(payload)
+    return decompress_ndarray(tensor)
+
+
+def decode_parameters(parameters: Parameters) -> NDArrays:
+    """Convert Parameters, with or without lossy or lossless compression, to NumPy
+    arrays."""
+    if parameters.tensor_type != COMPRESSED_TENSOR_TYPE:
+        return parameters_to_ndarrays(parameters)
+    return [decode_tensor(tensor) for tensor in parameters.tensors]
+
+
+def aggregate(
+    parameters_list: Sequence[Parameters], weights: Sequence[float]
+) -> NDArrays:
+    """Weighted mean of the arrays of several Parameters, which may be encoded with
+    any codec. Encoded arrays of the same lossy codec are aggregated together without
+    decoding each of them."""
+    weights = np.asarray(weights, dtype=np.float64)
+    total_weight = weights.sum()
+    if total_weight == 0:
+        raise ValueError("Can't aggregate with a total weight of zero.")
+    num_tensors = {len(parameters.tensors) for parameters in parameters_list}
+    if len(num_tensors) != 1:
+        raise ValueError("All parameters must have the same number of tensors.")
+    means = []
+    for position in range(num_tensors.pop()):
+        groups: Dict[str, Tuple[List[memoryview], List[float]]] = {}
+        others = []
+        for parameters, weight in zip(parameters_list, weights):
+            tensor = parameters.tensors[position]
+            if parameters.tensor_type == COMPRESSED_TENSOR_TYPE:
+                name, _, payload = read_frame(tensor)
+                if name in LOSSY_CODECS:
+                    payloads, group_weights = groups.setdefault(name, ([], []))
+                    payloads.append(payload)
+                    group_weights.append(weight)
+                    continue
+                ndarray = decompress_ndarray(tensor)
+            else:
+                ndarray = parameters_to_ndarrays(
+                    Parameters(tensors=[tensor], tensor_type=parameters.tensor_type)
+                )[0]
+            others.append((ndarray, weight))
+        total = 0.0
+        for name, (payloads, group_weights) in groups.items():
+            total = total + LOSSY_CODECS[name].aggregate(
+                payloads, np.asarray(group_weights)
+            )
+        for ndarray, weight in others:
+            total = total + weight * ndarray.astype(np.float64)
+        dtype = (
+            others[0][0].dtype
+            if others
+            else read_npy_header(next(iter(groups.values()))[0][0])[2]
+        )
+        means.append((total / total_weight).astype(dtype))
+    return means
+
+
+def aggregate_fit_results(results: List[Tuple[ClientProxy, FitRes]]) -> NDArrays:
+    """Mean of the arrays of fit results, weighted by their numbers of examples."""
+    return aggregate(
+        [fit_res.parameters for _, fit_res in results],
+        [fit_res.num_examples for _, fit_res in results],
+    )
+
+
+class CompressedFedAvg(fl.server.strategy.FedAvg):
+    """FedAvg for clients that return their update, the difference between their
+    trained parameters and the parameters that they received, encoded with an
+    UpdateEncoder. The new global parameters are the previous ones plus the weighted
+    mean update. Global parameters are sent with the given lossless compression."""
+
+    def __init__(self, *args, compression: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compression = compression
+        self.current_ndarrays: Optional[NDArrays] = None
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        self.current_ndarrays = decode_parameters(parameters)
+        if self.compression is not None:
+            parameters = ndarrays_to_parameters(
+                self.current_ndarrays, compression=self.compression
+            )
+        return super().configure_fit(server_round, parameters, client_manager)
+
+    def aggregate_fit(
+        self,
+        server_round: int,
+        results: List[Tuple[ClientProxy, FitRes]],
+        failures: List[Union[Tuple[ClientProxy, FitRes], BaseException]],
+    ) -> Tuple[Optional[Parameters], Dict[str, Scalar]]:
+        if not results:
+            return None, {}
+        if not self.accept_failures and failures:
+            return None, {}
+        mean_update = aggregate_fit_results(results)
+        ndarrays = [
+            (current + update).astype(current.dtype)
+            for current, update in zip(self.current_ndarrays, mean_update)
+        ]
+        metrics_aggregated = {}
+        if self.fit_metrics_aggregation_fn:
+            fit_metrics = [(res.num_examples, res.metrics) for _, res in results]
+            metrics_aggregated = self.fit_metrics_aggregation_fn(fit_metrics)
+        return ndarrays_to_parameters(ndarrays), metrics_aggregated